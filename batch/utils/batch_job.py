@@ -0,0 +1,22 @@
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from core.workspace import set_workspace
+from core.config_utils import set_job_config
+from batch.utils import job_ledger
+
+# One batch task, run in a fresh spawned process. Nothing from the pipeline is imported at the top:
+# step modules resolve their paths on import, so they may only be loaded once the workspace is set.
+
+def run_job(job_id, video_file, dubbing, is_retry, workspace, job_config, overrides, save_dir, error_dir, slots=None,
+            usage_log=None, ledger_file=job_ledger.LEDGER_FILE):
+    set_workspace(workspace)
+    set_job_config(job_config, overrides)
+    from core.pipeline import add_step_listener
+    from core.pipeline_scheduler import share_resources
+    from batch.utils.video_processor import process_video
+    if slots is not None:
+        share_resources(slots, usage_log)
+    # steps are prepared and finished in this process, record each of them in the ledger
+    ledger = job_ledger.connect(ledger_file)
+    add_step_listener(lambda step, status, **info: job_ledger.record_step(ledger, job_id, step, status, **info))
+    return process_video(video_file, dubbing, is_retry, save_dir, error_dir)
@@ -0,0 +1,171 @@
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from batch.utils.batch_job import run_job
+from batch.utils import job_ledger
+from core.config_utils import load_key
+from core.model_server import start_model_server, stop_model_server
+from rich.console import Console
+from rich.panel import Panel
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import json
+import shutil
+import socket
+import threading
+import time
+
+# A worker claims jobs from the ledger and runs each one in its own process and workspace, writing the
+# results to batch/output/task_<id>. Workers on several machines can serve one batch when batch/ (input,
+# workspaces, output and jobs.db) is on shared storage: every running job carries a heartbeat, and a job
+# whose worker stopped sending them is handed to the next worker asking for work, which resumes it from
+# its workspace. `python batch/utils/batch_worker.py` starts a worker on this machine.
+
+WORKSPACE_DIR = 'batch/workspaces'
+SAVE_DIR = 'batch/output'
+ERROR_OUTPUT_DIR = 'batch/output/ERROR'
+
+console = Console()
+
+def workspace_of(job_id):
+    return os.path.join(WORKSPACE_DIR, f"task_{job_id}")
+
+def job_config_of(job_id):
+    return workspace_of(job_id) + "_config.json"
+
+def save_dir_of(job_id):
+    return os.path.join(SAVE_DIR, f"task_{job_id}")
+
+def error_dir_of(job_id):
+    return os.path.join(ERROR_OUTPUT_DIR, f"task_{job_id}")
+
+def task_overrides(source_language, target_language):
+    overrides = {}
+    if source_language:
+        overrides['whisper.language'] = source_language
+    if target_language:
+        overrides['target_language'] = target_language
+    return overrides
+
+def restore_error_folder(job_id, video_file, workspace):
+    # Restore files from batch/output/ERROR to the task's workspace
+    error_dir = error_dir_of(job_id)
+    folders = [os.path.join(error_dir, name) for name in os.listdir(error_dir)] if os.path.isdir(error_dir) else []
+    # batches before per-job results kept the failed run under the video name
+    legacy_folder = os.path.join(ERROR_OUTPUT_DIR, os.path.splitext(video_file)[0])
+    if not folders and os.path.isdir(legacy_folder):
+        folders = [legacy_folder]
+    if folders:
+        # Move (not copy) the failed run back, the step manifest decides what has to run again
+        if os.path.exists(workspace):
+            shutil.rmtree(workspace)
+        shutil.move(folders[0], workspace)
+        shutil.rmtree(error_dir, ignore_errors=True)
+        console.print(f"[green]Restored files from ERROR folder for {video_file}")
+    elif os.path.exists(workspace):
+        # the worker that ran it last died, its workspace is as far as it got
+        console.print(f"[yellow]Resuming {video_file} from its workspace")
+    else:
+        console.print(f"[yellow]Warning: Error folder not found: {error_dir}")
+
+def run_task(*job_args):
+    """Run one task in a fresh process, its step modules must not outlive the workspace they were imported for"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_job, *job_args).result()
+
+def keep_alive(ledger_file, job_id, worker, stop, interval):
+    """Heartbeat `job_id` every `interval` seconds until `stop` is set"""
+    ledger = job_ledger.connect(ledger_file)
+    while not stop.wait(interval):
+        if not job_ledger.heartbeat(ledger, job_id, worker):
+            console.print(f"[yellow]⚠️ Task {job_id} was handed to another worker, {worker} missed its heartbeats")
+            return
+
+def run_tasks(worker, slots=None, usage_log=None, ledger_file=job_ledger.LEDGER_FILE):
+    """Claim jobs from the ledger and run them until no job is pending or running, called by every worker thread"""
+    settings = load_key("batch_queue")
+    ledger = job_ledger.connect(ledger_file)
+    while True:
+        job = job_ledger.claim_job(ledger, worker, settings["stale_seconds"])
+        if job is None:
+            if not job_ledger.has_running(ledger):
+                break
+            # a job running elsewhere comes back to the queue if its worker dies
+            time.sleep(settings["heartbeat_seconds"])
+            continue
+        job_id, video_file = job['id'], job['video_file']
+        is_retry = job['attempts'] > 1
+        workspace, job_config = workspace_of(job_id), job_config_of(job_id)
+        if is_retry:
+            console.print(Panel(f"Retrying task: {video_file}\nTask {job_id}, attempt {job['attempts']}, worker {worker}",
+                             title="[bold yellow]Retry Task", expand=False))
+            restore_error_folder(job_id, video_file, workspace)
+        else:
+            console.print(Panel(f"Now processing task: {video_file}\nTask {job_id}, worker {worker}",
+                             title="[bold blue]Current Task", expand=False))
+            # a new run must not inherit what an earlier run of this row detected
+            if os.path.exists(job_config):
+                os.remove(job_config)
+
+        overrides = task_overrides(job['source_language'], job['target_language'])
+        stop = threading.Event()
+        threading.Thread(target=keep_alive, args=(ledger_file, job_id, worker, stop, settings["heartbeat_seconds"]),
+                         daemon=True).start()
+        try:
+            status, error_step, error_message = run_task(job_id, video_file, job['dubbing'], is_retry, workspace, job_config,
+                                                         overrides, save_dir_of(job_id), error_dir_of(job_id),
+                                                         slots, usage_log, ledger_file)
+            error = None if status else f"{error_step} - {error_message}"
+            if status and os.path.exists(job_config):
+                os.remove(job_config)
+        except Exception as e:
+            error = f"Unhandled exception - {str(e)}"
+            console.print(f"[bold red]Error processing {video_file}: {error}")
+        finally:
+            stop.set()
+        if not job_ledger.finish_job(ledger, job_id, error, worker):
+            console.print(f"[yellow]⚠️ Task {job_id} belongs to another worker now, its outcome here is dropped")
+
+def report_utilization(usage_log, limits, start, end, report_file):
+    # imported here, the pipeline resolves its paths on import and this module is re-imported by every job process
+    from core.pipeline_scheduler import utilization_report, print_utilization
+    report = utilization_report(list(usage_log), limits, start, end)
+    print_utilization(report, end - start)
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump({"wall_seconds": round(end - start, 1), "resources": report, "steps": list(usage_log)}, f, indent=4, ensure_ascii=False)
+
+def run_workers(workers, report_file, ledger_file=job_ledger.LEDGER_FILE):
+    """Run `workers` worker threads sharing this machine's step slots and model server"""
+    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+    from core.pipeline_scheduler import resource_limits
+    limits = resource_limits()
+    manager = multiprocessing.get_context("spawn").Manager()
+    slots = {resource: manager.BoundedSemaphore(limit) for resource, limit in limits.items()}
+    usage_log = manager.list()
+    # started before the tasks so their processes inherit its address
+    server = start_model_server() if load_key("model_server.enabled") else None
+    start = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            names = [f"{socket.gethostname()}:{os.getpid()}:{n}" for n in range(workers)]
+            for future in [pool.submit(run_tasks, name, slots, usage_log, ledger_file) for name in names]:
+                future.result()
+        report_utilization(usage_log, limits, start, time.time(), report_file)
+    finally:
+        if server is not None:
+            stop_model_server(server)
+        manager.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run batch jobs from a ledger shared with other workers")
+    parser.add_argument("--workers", type=int, default=load_key("batch_workers"), help="jobs this machine runs at once")
+    parser.add_argument("--ledger", default=job_ledger.LEDGER_FILE, help="job ledger, on storage all workers share")
+    args = parser.parse_args()
+    report_file = os.path.join(SAVE_DIR, f"resource_utilization_{socket.gethostname()}_{os.getpid()}.json")
+    run_workers(max(1, args.workers), report_file, args.ledger)
+    console.print(Panel(f"No jobs left in {args.ledger}\nCheck out in `batch/output`!",
+                        title="[bold green]Worker Done", expand=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os, sys, time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+import sqlite3
+from typing import Optional
+import pandas as pd
+from rich import print as rprint
+
+# The batch keeps its jobs in a SQLite ledger instead of rewriting tasks_setting.xlsx after every task:
+# one row per job with its status, attempts, timing and error, one row per job and pipeline step with
+# the same for that step. Workers claim jobs inside a write transaction, so no job is handed out twice.
+# tasks_setting.xlsx stays the way to define jobs and to look at their status: it is imported when a batch
+# starts and exported when it ends, or any time with `python batch/utils/job_ledger.py export`.
+# Workers on several machines can share one ledger file: a running job carries the heartbeat of its worker
+# and is handed out again once the heartbeat is older than `stale_seconds`. The rollback journal is kept
+# (no WAL), WAL does not work on network filesystems.
+
+LEDGER_FILE = 'batch/jobs.db'
+SETTINGS_FILE = 'batch/tasks_setting.xlsx'
+
+PENDING, RUNNING, DONE, ERROR = "pending", "running", "done", "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    video_file TEXT NOT NULL,
+    source_language TEXT,
+    target_language TEXT,
+    dubbing INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    error TEXT,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_steps (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    step TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL,
+    seconds REAL,
+    error TEXT,
+    PRIMARY KEY (job_id, step)
+);
+"""
+
+def connect(path: str = LEDGER_FILE) -> sqlite3.Connection:
+    """One connection per thread or process, transactions are explicit"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    # ledgers created before heartbeats
+    if "heartbeat_at" not in [column['name'] for column in conn.execute("PRAGMA table_info(jobs)")]:
+        conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+    return conn
+
+def _cell(value):
+    return None if pd.isna(value) else value
+
+def import_xlsx(conn: sqlite3.Connection, xlsx: str = SETTINGS_FILE):
+    """Add the rows of `xlsx` as jobs, the ledger keeps the status of jobs it already knows.
+    Job ids are the 1-based row numbers, a row whose video changed starts over as a new job."""
+    df = pd.read_excel(xlsx)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for index, row in df.iterrows():
+            job_id, video_file = index + 1, row['Video File']
+            status, error = PENDING, None
+            sheet_status = _cell(row.get('Status'))
+            if sheet_status is not None and 'Error' in str(sheet_status):
+                status, error = ERROR, str(sheet_status)
+            elif sheet_status is not None and not str(sheet_status).startswith("Running"):
+                status = DONE
+            known = conn.execute("SELECT video_file FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if known is not None and known['video_file'] != video_file:
+                conn.execute("DELETE FROM job_steps WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                known = None
+            dubbing = 0 if pd.isna(row['Dubbing']) else int(row['Dubbing'])
+            if known is None:
+                conn.execute("INSERT INTO jobs (id, video_file, source_language, target_language, dubbing, status, error) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (job_id, video_file, _cell(row['Source Language']), _cell(row['Target Language']), dubbing, status, error))
+            else:
+                conn.execute("UPDATE jobs SET source_language = ?, target_language = ?, dubbing = ? WHERE id = ?",
+                             (_cell(row['Source Language']), _cell(row['Target Language']), dubbing, job_id))
+                if sheet_status is None:
+                    # a cleared Status cell runs the row again from scratch, running jobs are left to their worker
+                    conn.execute("UPDATE jobs SET status = ?, worker = NULL, error = NULL, attempts = 0 WHERE id = ? AND status != ?",
+                                 (PENDING, job_id, RUNNING))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def sheet_status(job: sqlite3.Row) -> Optional[str]:
+    """The Status column as the batch used to write it"""
+    if job['status'] == DONE:
+        return "Done"
+    if job['status'] == ERROR:
+        return job['error'] if str(job['error']).startswith("Error") else f"Error: {job['error']}"
+    if job['status'] == RUNNING:
+        return f"Running ({job['worker']})"
+    return None
+
+def export_xlsx(conn: sqlite3.Connection, xlsx: str = SETTINGS_FILE):
+    jobs = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+    df = pd.DataFrame([{
+        'Video File': job['video_file'], 'Source Language': job['source_language'], 'Target Language': job['target_language'],
+        'Dubbing': job['dubbing'], 'Status': sheet_status(job),
+    } for job in jobs])
+    df.to_excel(xlsx, index=False)
+
+def requeue(conn: sqlite3.Connection, statuses=(ERROR,)):
+    """Hand jobs in `statuses` out again, failed jobs are retried once per batch run like before"""
+    placeholders = ", ".join("?" * len(statuses))
+    conn.execute(f"UPDATE jobs SET status = ?, worker = NULL WHERE status IN ({placeholders})", (PENDING, *statuses))
+
+def reset_job(conn: sqlite3.Connection, job_id: int):
+    """Run a job again in the next batch, whatever its status"""
+    conn.execute("UPDATE jobs SET status = ?, worker = NULL, error = NULL WHERE id = ?", (PENDING, job_id))
+
+def requeue_stale(conn: sqlite3.Connection, stale_seconds: float) -> int:
+    """Hand out again the running jobs whose worker stopped sending heartbeats, returns how many"""
+    cursor = conn.execute("UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?",
+                          (PENDING, RUNNING, time.time() - stale_seconds))
+    if cursor.rowcount:
+        rprint(f"[yellow]♻️ Requeued {cursor.rowcount} job(s) of workers without a heartbeat for {stale_seconds}s[/yellow]")
+    return cursor.rowcount
+
+def claim_job(conn: sqlite3.Connection, worker: str, stale_seconds: float = None) -> Optional[sqlite3.Row]:
+    """Atomically take the next pending job, None when there is none left"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if stale_seconds:
+            requeue_stale(conn, stale_seconds)
+        job = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+        if job is not None:
+            now = time.time()
+            conn.execute("UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?, "
+                         "finished_at = NULL WHERE id = ?", (RUNNING, worker, now, now, job['id']))
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job['id'],)).fetchone()
+        conn.execute("COMMIT")
+        return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def heartbeat(conn: sqlite3.Connection, job_id: int, worker: str) -> bool:
+    """Keep `job_id` claimed by `worker`, False when it was handed to another worker meanwhile"""
+    cursor = conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                          (time.time(), job_id, worker, RUNNING))
+    return cursor.rowcount == 1
+
+def has_running(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (RUNNING,)).fetchone() is not None
+
+def finish_job(conn: sqlite3.Connection, job_id: int, error: str = None, worker: str = None) -> bool:
+    """Record the outcome, with `worker` only while the job is still claimed by it"""
+    query = "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?"
+    params = [ERROR if error else DONE, error, time.time(), job_id]
+    if worker is not None:
+        query += " AND worker = ?"
+        params.append(worker)
+    return conn.execute(query, params).rowcount == 1
+
+def record_step(conn: sqlite3.Connection, job_id: int, step: str, status: str, seconds: float = None, error: str = None):
+    now = time.time()
+    if status == "running":
+        conn.execute("INSERT INTO job_steps (job_id, step, status, attempts, started_at) VALUES (?, ?, ?, 1, ?) "
+                     "ON CONFLICT (job_id, step) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                     "started_at = excluded.started_at, finished_at = NULL, seconds = NULL, error = NULL",
+                     (job_id, step, status, now))
+    else:
+        conn.execute("INSERT INTO job_steps (job_id, step, status, finished_at, seconds, error) VALUES (?, ?, ?, ?, ?, ?) "
+                     "ON CONFLICT (job_id, step) DO UPDATE SET status = excluded.status, finished_at = excluded.finished_at, "
+                     "seconds = excluded.seconds, error = excluded.error",
+                     (job_id, step, status, now, seconds, error))
+
+def print_status(conn: sqlite3.Connection):
+    for job in conn.execute("SELECT * FROM jobs ORDER BY id").fetchall():
+        rprint(f"[bold]#{job['id']} {job['video_file']}[/bold] {job['status']} (attempts {job['attempts']}"
+               f"{', ' + job['worker'] if job['worker'] else ''}){': ' + job['error'] if job['error'] else ''}")
+        for step in conn.execute("SELECT * FROM job_steps WHERE job_id = ? ORDER BY started_at", (job['id'],)).fetchall():
+            seconds = f" {step['seconds']:.1f}s" if step['seconds'] is not None else ""
+            print(f"    {step['step']:<20} {step['status']:<8}{seconds}{'  ' + step['error'] if step['error'] else ''}")
+
+if __name__ == "__main__":
+    # python batch/utils/job_ledger.py [status|import|export|retry <job id> ...]
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    ledger = connect()
+    if command == "import":
+        import_xlsx(ledger)
+    elif command == "export":
+        export_xlsx(ledger)
+    elif command == "retry":
+        for arg in sys.argv[2:]:
+            reset_job(ledger, int(arg))
+    print_status(ledger)
@@ -2,7 +2,10 @@ import os, sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from st_components.imports_and_utils import *
 from core.onekeycleanup import cleanup
+from core.workspace import out
 from core.config_utils import load_key
+from core.pipeline import TEXT_STEPS, DUBBING_STEPS
+from core.pipeline_scheduler import run_graph
 import shutil
 from functools import partial
 from rich.panel import Panel
@@ -11,34 +14,23 @@ from rich.console import Console
 console = Console()
 
 INPUT_DIR = 'batch/input'
-OUTPUT_DIR = 'output'
+OUTPUT_DIR = out()
 SAVE_DIR = 'batch/output'
 ERROR_OUTPUT_DIR = 'batch/output/ERROR'
 YTB_RESOLUTION_KEY = "ytb_resolution"
 
-def process_video(file, dubbing=False, is_retry=False):
+def process_video(file, dubbing=False, is_retry=False, save_dir=SAVE_DIR, error_dir=ERROR_OUTPUT_DIR):
     if not is_retry:
         prepare_output_folder(OUTPUT_DIR)
     
+    # one dependency graph for all steps, e.g. the subtitle video is encoded while the dub is generated.
+    # Steps are skipped when their inputs and settings match the manifest, so a retry resumes where it failed
+    pipeline_steps = TEXT_STEPS + (DUBBING_STEPS if dubbing else [])
     text_steps = [
         ("🎥 Processing input file", partial(process_input_file, file)),
-        ("🎙️ Transcribing with Whisper", partial(step2_whisperX.transcribe)),
-        ("✂️ Splitting sentences", split_sentences),
-        ("📝 Summarizing and translating", summarize_and_translate),
-        ("⚡ Processing and aligning subtitles", process_and_align_subtitles),
-        ("🎬 Merging subtitles to video", step7_merge_sub_to_vid.merge_subtitles_to_video),
+        ("🎙️ Transcribing, translating and " + ("dubbing" if dubbing else "subtitling"), partial(run_graph, pipeline_steps)),
     ]
     
-    if dubbing:
-        dubbing_steps = [
-            ("🔊 Generating audio tasks", gen_audio_tasks),
-            ("🎵 Extracting reference audio", step9_extract_refer_audio.extract_refer_audio_main),
-            ("🗣️ Generating audio", step10_gen_audio.gen_audio),
-            ("🔄 Merging full audio", step11_merge_full_audio.merge_full_audio),
-            ("🎞️ Merging dubbing to video", step12_merge_dub_to_vid.merge_video_audio),
-        ]
-        text_steps.extend(dubbing_steps)
-    
     current_step = ""
     for step_name, step_func in text_steps:
         current_step = step_name
@@ -50,7 +42,8 @@ def process_video(file, dubbing=False, is_retry=False):
                     border_style="blue"
                 ))
                 result = step_func()
-                if result is not None:
+                # run_graph returns its timeline, only process_input_file hands on variables
+                if isinstance(result, dict):
                     globals().update(result)
                 break
             except Exception as e:
@@ -60,7 +53,7 @@ def process_video(file, dubbing=False, is_retry=False):
                         border_style="red"
                     )
                     console.print(error_panel)
-                    cleanup(ERROR_OUTPUT_DIR)
+                    cleanup(error_dir)
                     return False, current_step, str(e)
                 console.print(Panel(
                     f"[yellow]Attempt {attempt + 1} failed. Retrying...[/]",
@@ -68,7 +61,7 @@ def process_video(file, dubbing=False, is_retry=False):
                 ))
     
     console.print(Panel("[bold green]All steps completed successfully! 🎉[/]", border_style="green"))
-    cleanup(SAVE_DIR)
+    cleanup(save_dir)
     return True, "", ""
 
 def prepare_output_folder(output_folder):
@@ -83,22 +76,14 @@ def process_input_file(file):
     else:
         input_file = os.path.join('batch', 'input', file)
         output_file = os.path.join(OUTPUT_DIR, file)
-        shutil.copy(input_file, output_file)
+        # a resumed task already has the video, copying it again would only cost time
+        if not _same_file(input_file, output_file):
+            shutil.copy2(input_file, output_file)
         video_file = output_file
     return {'video_file': video_file}
 
-def split_sentences():
-    step3_1_spacy_split.split_by_spacy()
-    step3_2_splitbymeaning.split_sentences_by_meaning()
-
-def summarize_and_translate():
-    step4_1_summarize.get_summary()
-    step4_2_translate_all.translate_all()
-
-def process_and_align_subtitles():
-    step5_splitforsub.split_for_sub_main()
-    step6_generate_final_timeline.align_timestamp_main()
-
-def gen_audio_tasks():
-    step8_1_gen_audio_task.gen_audio_task_main()
-    step8_2_gen_dub_chunks.gen_dub_chunks()
+def _same_file(src, dst):
+    if not os.path.exists(dst):
+        return False
+    src_stat, dst_stat = os.stat(src), os.stat(dst)
+    return src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime)
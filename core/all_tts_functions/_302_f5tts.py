@@ -3,13 +3,14 @@ import json
 import os, sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from core.config_utils import load_key
+from core.workspace import out
 from rich import print as rprint
 from pydub import AudioSegment
 from core.all_whisper_methods.audio_preprocess import normalize_audio_volume
 import requests
 
 API_KEY = load_key("f5tts.302_api")
-AUDIO_REFERS_DIR = "output/audio/refers"
+AUDIO_REFERS_DIR = out("audio/refers")
 UPLOADED_REFER_URL = None
 
 def upload_file_to_302(file_path):
@@ -8,6 +8,7 @@ import time
 import requests
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from core.config_utils import load_key
+from core.workspace import out
 
 def check_lang(text_lang, prompt_lang):
     # only support zh and en
@@ -89,7 +90,7 @@ def gpt_sovits_tts_for_videolingo(text, save_as, number, task_df):
         prompt_text = content
     elif REFER_MODE in [2, 3]:
         # Check if the reference audio file exists
-        ref_audio_path = current_dir / ("output/audio/refers/1.wav" if REFER_MODE == 2 else f"output/audio/refers/{number}.wav")
+        ref_audio_path = current_dir / (out("audio/refers/1.wav") if REFER_MODE == 2 else out(f"audio/refers/{number}.wav"))
         if not ref_audio_path.exists():
             # If the file does not exist, try to extract the reference audio
             try:
@@ -105,7 +106,7 @@ def gpt_sovits_tts_for_videolingo(text, save_as, number, task_df):
     success = gpt_sovits_tts(text, TARGET_LANGUAGE, save_as, ref_audio_path, prompt_lang, prompt_text)
     if not success and REFER_MODE == 3:
         rprint(f"[bold red]TTS request failed, switching back to mode 2 and retrying[/bold red]")
-        ref_audio_path = current_dir / "output/audio/refers/1.wav"
+        ref_audio_path = current_dir / out("audio/refers/1.wav")
         gpt_sovits_tts(text, TARGET_LANGUAGE, save_as, ref_audio_path, prompt_lang, prompt_text)
 
 
@@ -126,7 +127,6 @@ def find_and_check_config_path(dubbing_character):
     return gpt_sovits_dir, config_path
 
 def start_gpt_sovits_server():
-    current_dir = Path(__file__).resolve().parent.parent.parent
     # Check if port 9880 is already in use
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     result = sock.connect_ex(('127.0.0.1', 9880))
@@ -148,20 +148,18 @@ def start_gpt_sovits_server():
     # Find and check config path
     gpt_sovits_dir, config_path = find_and_check_config_path(load_key("gpt_sovits.character"))
 
-    # Change to the GPT-SoVITS-v2 directory
-    os.chdir(gpt_sovits_dir)
-
     # Start the GPT-SoVITS server
     if sys.platform == "win32":
         cmd = [
-            "runtime\\python.exe",
+            str(gpt_sovits_dir / "runtime" / "python.exe"),
             "api_v2.py",
             "-a", "127.0.0.1",
             "-p", "9880",
             "-c", str(config_path)
         ]
-        # Open the command in a new window on Windows
-        process = subprocess.Popen(cmd, creationflags=subprocess.CREATE_NEW_CONSOLE)
+        # Open the command in a new window on Windows, run from the GPT-SoVITS-v2 directory without
+        # changing ours, other jobs in this process resolve their paths against it
+        process = subprocess.Popen(cmd, cwd=gpt_sovits_dir, creationflags=subprocess.CREATE_NEW_CONSOLE)
     elif sys.platform == "darwin":  # macOS
         print("Please manually start the GPT-SoVITS server at http://127.0.0.1:9880, refer to api_v2.py.")
         while True:
@@ -174,9 +172,6 @@ def start_gpt_sovits_server():
     else:
         raise OSError("Unsupported operating system. Only Windows and macOS are supported.")
 
-    # Change back to the original directory
-    os.chdir(current_dir)
-
     # Wait for the server to start (max 30 seconds)
     start_time = time.time()
     while time.time() - start_time < 50:
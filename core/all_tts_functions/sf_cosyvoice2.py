@@ -5,6 +5,7 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from core.config_utils import load_key
+from core.workspace import out
 
 def wav_to_base64(wav_file_path):
     with open(wav_file_path, 'rb') as audio_file:
@@ -20,11 +21,11 @@ def cosyvoice_tts_for_videolingo(text, save_as, number, task_df):
     API_KEY = load_key("sf_cosyvoice2.api_key")
     # 设置参考音频路径
     current_dir = Path.cwd()
-    ref_audio_path = current_dir / f"output/audio/refers/{number}.wav"
+    ref_audio_path = current_dir / out(f"audio/refers/{number}.wav")
     
     # 如果参考音频不存在，使用第一个音频作为备选
     if not ref_audio_path.exists():
-        ref_audio_path = current_dir / "output/audio/refers/1.wav"
+        ref_audio_path = current_dir / out("audio/refers/1.wav")
         if not ref_audio_path.exists():
             try:
                 from core.step9_extract_refer_audio import extract_refer_audio_main
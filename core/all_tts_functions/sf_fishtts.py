@@ -6,6 +6,7 @@ import uuid
 from typing import List, Tuple
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from core.config_utils import load_key, update_key
+from core.workspace import out
 from core.step1_ytdlp import find_video_files
 from core.all_whisper_methods.audio_preprocess import get_audio_duration
 import hashlib
@@ -18,7 +19,7 @@ from rich.text import Text
 API_URL_SPEECH = "https://api.siliconflow.cn/v1/audio/speech"
 API_URL_VOICE = "https://api.siliconflow.cn/v1/uploads/audio/voice"
 
-AUDIO_REFERS_DIR = "output/audio/refers"
+AUDIO_REFERS_DIR = out("audio/refers")
 MODEL_NAME = "fishaudio/fish-speech-1.4"
 REFER_MAX_LENGTH = 90
 
@@ -245,7 +246,7 @@ def siliconflow_fish_tts_for_videolingo(text, save_as, number, task_df):
 
 if __name__ == '__main__':
     pass
-    # create_custom_voice("output/audio/refers/1.wav", "Okay folks, welcome back. This is price action model number four, position trading.")
+    # create_custom_voice(out("audio/refers/1.wav"), "Okay folks, welcome back. This is price action model number four, position trading.")
     siliconflow_fish_tts("가을 나뭇잎이 부드럽게 떨어지는 생생한 색깔을 주목하지 않을 수 없었다", "preset_test.wav", mode="preset", check_duration=True)
     # siliconflow_fish_tts("使用客制化音色测试", "custom_test.wav", mode="custom", voice_id="speech:your-voice-name:cm04pf7az00061413w7kz5qxs:mjtkgbyuunvtybnsvbxd")
-    # siliconflow_fish_tts("使用动态音色测试", "dynamic_test.wav", mode="dynamic", ref_audio="output/audio/refers/1.wav", ref_text="Okay folks, welcome back. This is price action model number four, position trading.")
\ No newline at end of file
+    # siliconflow_fish_tts("使用动态音色测试", "dynamic_test.wav", mode="dynamic", ref_audio=out("audio/refers/1.wav"), ref_text="Okay folks, welcome back. This is price action model number four, position trading.")
\ No newline at end of file
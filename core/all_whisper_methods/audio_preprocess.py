@@ -3,13 +3,17 @@ import pandas as pd
 from typing import Dict, List, Tuple
 from rich import print
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from core.config_utils import update_key
+from core.config_utils import update_key, load_key
+from core.workspace import out
+from core.all_whisper_methods.pcm_cache import RAW_PCM_FILE, decode_to_pcm, load_pcm, pcm_duration, export_pcm
+from core.all_whisper_methods.silence_map import load_silence_map, silence_ends_between
+from core.artifact_store import write_artifact
 from pydub import AudioSegment
 from rich import print as rprint
 
-AUDIO_DIR = "output/audio"
-RAW_AUDIO_FILE = "output/audio/raw.mp3"
-CLEANED_CHUNKS_EXCEL_PATH = "output/log/cleaned_chunks.xlsx"
+AUDIO_DIR = out("audio")
+RAW_AUDIO_FILE = out("audio/raw.mp3")
+CLEANED_CHUNKS_PATH = out("log/cleaned_chunks.parquet")
 
 def normalize_audio_volume(audio_path: str, output_path: str, target_db: float = -20.0, format: str = "wav"):
     audio = AudioSegment.from_file(audio_path)
@@ -21,30 +25,13 @@ def normalize_audio_volume(audio_path: str, output_path: str, target_db: float =
 
 def convert_video_to_audio(video_file: str):
     os.makedirs(AUDIO_DIR, exist_ok=True)
-    if not os.path.exists(RAW_AUDIO_FILE):
-        rprint(f"[blue]🎬➡️🎵 Converting to high quality audio with FFmpeg ......[/blue]")
-        subprocess.run([
-            'ffmpeg', '-y', '-i', video_file, '-vn',
-            '-c:a', 'libmp3lame', '-b:a', '128k',
-            '-ar', '16000',
-            '-ac', '1', 
-            '-metadata', 'encoding=UTF-8', RAW_AUDIO_FILE
-        ], check=True, stderr=subprocess.PIPE)
-        rprint(f"[green]🎬➡️🎵 Converted <{video_file}> to <{RAW_AUDIO_FILE}> with FFmpeg\n[/green]")
-
-def _detect_silence(audio_file: str, start: float, end: float) -> List[float]:
-    """Detect silence points in the given audio segment"""
-    cmd = ['ffmpeg', '-y', '-i', audio_file, 
-           '-ss', str(start), '-to', str(end),
-           '-af', 'silencedetect=n=-30dB:d=0.5', 
-           '-f', 'null', '-']
-    
-    output = subprocess.run(cmd, capture_output=True, text=True, 
-                          encoding='utf-8').stderr
-    
-    return [float(line.split('silence_end: ')[1].split(' ')[0])
-            for line in output.split('\n')
-            if 'silence_end' in line]
+    if not os.path.exists(RAW_PCM_FILE):
+        rprint(f"[blue]🎬➡️🎵 Decoding audio with FFmpeg ......[/blue]")
+        # decoded straight from the video, no lossy mp3 in between
+        decode_to_pcm(video_file, RAW_PCM_FILE)
+        rprint(f"[green]🎬➡️🎵 Converted <{video_file}> to <{RAW_PCM_FILE}> with FFmpeg\n[/green]")
+    if load_key("save_mp3_audio") and not os.path.exists(RAW_AUDIO_FILE):
+        export_pcm(load_pcm(RAW_PCM_FILE), RAW_AUDIO_FILE)
 
 def get_audio_duration(audio_file: str) -> float:
     """Get the duration of an audio file using ffmpeg."""
@@ -66,7 +53,9 @@ def split_audio(audio_file: str, target_len: int = 20*60, win: int = 60) -> List
     # 20 min 16000 Hz 128kbps ~ 20MB < 25MB required by whisper
     rprint("[bold blue]🔪 Starting audio segmentation...[/bold blue]")
     
-    duration = get_audio_duration(audio_file)
+    duration = pcm_duration(audio_file)
+    # one pass over the whole track, every window below only reads from it
+    silence_db = load_silence_map(audio_file)
     
     segments = []
     pos = 0
@@ -76,7 +65,7 @@ def split_audio(audio_file: str, target_len: int = 20*60, win: int = 60) -> List
             break
         win_start = pos + target_len - win
         win_end = min(win_start + 2 * win, duration)
-        silences = _detect_silence(audio_file, win_start, win_end)
+        silences = silence_ends_between(silence_db, win_start, win_end)
     
         if silences:
             target_pos = target_len - (win_start - pos)
@@ -143,7 +132,7 @@ def process_transcription(result: Dict) -> pd.DataFrame:
     return pd.DataFrame(all_words)
 
 def save_results(df: pd.DataFrame):
-    os.makedirs('output/log', exist_ok=True)
+    os.makedirs(out('log'), exist_ok=True)
 
     # Remove rows where 'text' is empty
     initial_rows = len(df)
@@ -158,9 +147,8 @@ def save_results(df: pd.DataFrame):
         rprint(f"[yellow]⚠️ Warning: Detected {len(long_words)} word(s) longer than 20 characters. These will be removed.[/yellow]")
         df = df[df['text'].str.len() <= 20]
     
-    df['text'] = df['text'].apply(lambda x: f'"{x}"')
-    df.to_excel(CLEANED_CHUNKS_EXCEL_PATH, index=False)
-    rprint(f"[green]📊 Excel file saved to {CLEANED_CHUNKS_EXCEL_PATH}[/green]")
+    write_artifact(df, CLEANED_CHUNKS_PATH)
+    rprint(f"[green]📊 Transcription saved to {CLEANED_CHUNKS_PATH}[/green]")
 
 def save_language(language: str):
     update_key("whisper.detected_language", language)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import io
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import requests
+import soundfile as sf
+from requests.adapters import HTTPAdapter
+from rich import print as rprint
+from core.config_utils import load_key
+from core.workspace import out
+from core.all_whisper_methods.pcm_cache import SAMPLE_RATE, load_pcm, slice_pcm
+
+CACHE_DIR = out("log/transcribe_cache")
+
+_hash_cache = {}
+_audio_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+def load_audio_once(audio_path: str) -> Tuple[np.ndarray, str]:
+    """Memory-mapped samples from the shared PCM cache and their content hash, every segment slices this array"""
+    with _audio_lock:
+        y = load_pcm(audio_path)
+        key = (audio_path, len(y), os.path.getmtime(y.filename))
+        if key not in _hash_cache:
+            _hash_cache[key] = hashlib.sha1(y).hexdigest()
+        return y, _hash_cache[key]
+
+def slice_audio(y: np.ndarray, start: float, end: float) -> np.ndarray:
+    """Zero-copy view of [start, end) seconds"""
+    return slice_pcm(y, start, end)
+
+def encode_audio(y_slice: np.ndarray, codec: str = "flac") -> Tuple[io.BytesIO, str, str]:
+    """Encode a slice in memory, returns (buffer, file name, mime type). Opus falls back to FLAC if libsndfile lacks it"""
+    buffer = io.BytesIO()
+    if codec == "opus" and 'OPUS' in sf.available_subtypes('OGG'):
+        sf.write(buffer, y_slice, SAMPLE_RATE, format='OGG', subtype='OPUS')
+        name, mime = 'audio_slice.ogg', 'audio/ogg'
+    else:
+        sf.write(buffer, y_slice, SAMPLE_RATE, format='FLAC', subtype='PCM_16')
+        name, mime = 'audio_slice.flac', 'audio/flac'
+    buffer.seek(0)
+    return buffer, name, mime
+
+def get_session() -> requests.Session:
+    """Shared HTTP session so concurrent uploads reuse pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = max(4, load_key("max_workers"))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def _cache_path(runtime: str, audio_hash: str, start: float, end: float, language: str) -> str:
+    key = hashlib.sha1(f"{audio_hash}:{start:.3f}:{end:.3f}:{language}".encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{runtime}_{key}.json")
+
+def load_cached_result(runtime: str, audio_hash: str, start: float, end: float, language: str):
+    path = _cache_path(runtime, audio_hash, start, end, language)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+def save_cached_result(runtime: str, audio_hash: str, start: float, end: float, language: str, result: Dict):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(runtime, audio_hash, start, end, language)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+
+def transcribe_segments_parallel(transcribe_fn: Callable, raw_audio_path: str, vocal_audio_path: str,
+                                 segments: List[Tuple[float, float]]) -> List[Dict]:
+    """Run `transcribe_fn` for every segment concurrently, results come back in segment order"""
+    load_audio_once(vocal_audio_path)  # decode before the threads start
+    max_workers = min(load_key("max_workers"), len(segments)) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(transcribe_fn, raw_audio_path, vocal_audio_path, start, end) for start, end in segments]
+        return [future.result() for future in futures]
@@ -1,20 +1,38 @@
-import os, sys
+import os, sys, json, subprocess
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 import torch
+import numpy as np
 from rich.console import Console
 from rich import print as rprint
+from rich.progress import Progress
 from demucs.pretrained import get_model
-from demucs.audio import save_audio
+from demucs.audio import convert_audio
 from torch.cuda import is_available as is_cuda_available
-from typing import Optional
+from typing import Callable, Optional, Tuple
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
 from demucs.api import Separator
 from demucs.apply import BagOfModels
 import gc
+from core.config_utils import load_key
+from core.workspace import out
+from core import artifact_cache, model_server
+from core.all_whisper_methods.pcm_cache import RAW_PCM_FILE, VOCAL_PCM_FILE, SAMPLE_RATE, \
+    load_pcm, pcm_writer, commit_pcm, normalize_pcm_file, export_pcm
 
-AUDIO_DIR = "output/audio"
+AUDIO_DIR = out("audio")
 RAW_AUDIO_FILE = os.path.join(AUDIO_DIR, "raw.mp3")
 BACKGROUND_AUDIO_FILE = os.path.join(AUDIO_DIR, "background.mp3")
 VOCAL_AUDIO_FILE = os.path.join(AUDIO_DIR, "vocal.mp3")
+# Vocals exactly as separated, before loudness normalization, the background is rendered as source - stem
+VOCAL_STEM_PCM_FILE = os.path.join(AUDIO_DIR, "vocal_stem.npy")
+SEPARATION_TIER_FILE = os.path.join(AUDIO_DIR, "separation_tier.txt")
+# `fast` tier vocals to plan speech trimming from while htdemucs still separates in the background
+QUICK_VOCAL_STEM_PCM_FILE = os.path.join(AUDIO_DIR, "vocal_quick_stem.npy")
+QUICK_VOCAL_PCM_FILE = os.path.join(AUDIO_DIR, "vocal_quick.npy")
+
+# none: transcribe the raw track, fast: NumPy/SciPy spectral mask on CPU, htdemucs: full Demucs model
+SEPARATION_TIERS = ["none", "fast", "htdemucs"]
 
 class PreloadedSeparator(Separator):
     def __init__(self, model: BagOfModels, shifts: int = 1, overlap: float = 0.25,
@@ -22,38 +40,192 @@ class PreloadedSeparator(Separator):
         self._model, self._audio_channels, self._samplerate = model, model.audio_channels, model.samplerate
         device = "cuda" if is_cuda_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         self.update_parameter(device=device, shifts=shifts, overlap=overlap, split=split,
-                            segment=segment, jobs=jobs, progress=True, callback=None, callback_arg=None)
+                            segment=segment, jobs=jobs, progress=False, callback=None, callback_arg=None)
 
-def demucs_main():
-    if os.path.exists(VOCAL_AUDIO_FILE) and os.path.exists(BACKGROUND_AUDIO_FILE):
-        rprint(f"[yellow]⚠️ {VOCAL_AUDIO_FILE} and {BACKGROUND_AUDIO_FILE} already exist, skip Demucs processing.[/yellow]")
-        return
-    
+def _crossfade_weights(length: int, fade_in: int, fade_out: int) -> np.ndarray:
+    """Linear ramps at the chunk edges, overlapping ramps of two neighbours sum to 1"""
+    weights = np.ones(length, dtype=np.float32)
+    if fade_in:
+        weights[:fade_in] = np.linspace(0, 1, fade_in + 2, dtype=np.float32)[1:-1]
+    if fade_out:
+        weights[length - fade_out:] = np.linspace(1, 0, fade_out + 2, dtype=np.float32)[1:-1]
+    return weights
+
+def _htdemucs_separator():
     console = Console()
-    os.makedirs(AUDIO_DIR, exist_ok=True)
-    
     console.print("🤖 Loading <htdemucs> model...")
     model = get_model('htdemucs')
     separator = PreloadedSeparator(model=model, shifts=1, overlap=0.25)
-    
-    console.print("🎵 Separating audio...")
-    _, outputs = separator.separate_audio_file(RAW_AUDIO_FILE)
-    
-    kwargs = {"samplerate": model.samplerate, "bitrate": 128, "preset": 2, 
-             "clip": "rescale", "as_float": False, "bits_per_sample": 16}
-    
+
+    def separate(samples: np.ndarray) -> np.ndarray:
+        wav = torch.from_numpy(np.array(samples, dtype=np.float32)).unsqueeze(0)
+        _, outputs = separator.separate_tensor(wav, SAMPLE_RATE)
+        # two stems: only the vocals are kept, the background is rendered later as source - vocals
+        vocals = convert_audio(outputs['vocals'].cpu(), separator.samplerate, SAMPLE_RATE, 1)[0].numpy()
+        return np.pad(vocals, (0, max(0, len(samples) - len(vocals))))[:len(samples)]
+    return separate
+
+def get_separation_tier() -> str:
+    """`demucs` used to be a bool, true/false map onto htdemucs/none"""
+    tier = load_key("demucs")
+    if isinstance(tier, bool):
+        return "htdemucs" if tier else "none"
+    if tier not in SEPARATION_TIERS:
+        raise ValueError(f"Unsupported demucs tier: {tier}, choose from {SEPARATION_TIERS}")
+    return tier
+
+def separation_settings() -> dict:
+    """`demucs_settings`, chunks must advance, so the overlap has to stay below the chunk length"""
+    settings = load_key("demucs_settings")
+    if not 0 <= settings["chunk_overlap"] < settings["chunk_seconds"]:
+        raise ValueError(f"Invalid demucs_settings: chunk_overlap ({settings['chunk_overlap']}) must be at least 0 "
+                         f"and less than chunk_seconds ({settings['chunk_seconds']})")
+    return settings
+
+def load_separator(tier: str) -> Callable[[np.ndarray], np.ndarray]:
+    """A function turning a 16 kHz mono chunk into its vocals for the given tier"""
+    if tier == "htdemucs":
+        return _htdemucs_separator()
+    if tier == "fast":
+        from core.all_whisper_methods.vocal_isolation import enhance_vocals
+        return enhance_vocals
+    return lambda samples: np.array(samples, dtype=np.float32)
+
+def separate_vocals_chunked(separate: Callable[[np.ndarray], np.ndarray], raw: np.ndarray, output_file: str,
+                            chunk_sec: float, overlap_sec: float):
+    """Separate `raw` chunk by chunk and overlap-add the vocals straight into a memmap,
+    so peak memory depends on the chunk length and not on the video length"""
+    chunk, overlap = int(chunk_sec * SAMPLE_RATE), int(overlap_sec * SAMPLE_RATE)
+    step = chunk - overlap
+    vocals_out = pcm_writer(output_file, len(raw))
+    starts = list(range(0, max(len(raw) - overlap, 1), step))
+
+    with Progress() as progress:
+        task = progress.add_task("🎵 Separating audio...", total=len(starts))
+        for start in starts:
+            end = min(start + chunk, len(raw))
+            vocals = separate(raw[start:end])
+            fade_in = overlap if start > 0 else 0
+            fade_out = overlap if end < len(raw) else 0
+            vocals_out[start:end] += vocals * _crossfade_weights(end - start, min(fade_in, end - start), min(fade_out, end - start))
+            progress.update(task, advance=1)
+
+    vocals_out.flush()
+    del vocals_out
+    commit_pcm(output_file)
+
+def _read_tier_marker() -> Optional[str]:
+    if not os.path.exists(SEPARATION_TIER_FILE):
+        return None
+    with open(SEPARATION_TIER_FILE, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+def separation_ready(tier: str) -> bool:
+    return os.path.exists(VOCAL_STEM_PCM_FILE) and os.path.exists(VOCAL_PCM_FILE) and _read_tier_marker() == tier
+
+def demucs_main(tier: str = None):
+    """Isolate the vocals with the configured tier into vocal.npy, `none` still separates with htdemucs
+    when called for dubbing since the mix needs a background track"""
+    tier = tier or get_separation_tier()
+    if tier == "none":
+        tier = "htdemucs"
+    if separation_ready(tier):
+        rprint(f"[yellow]⚠️ {VOCAL_PCM_FILE} already exists, skip <{tier}> vocal separation.[/yellow]")
+        return
+
+    console = Console()
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    settings = separation_settings()
+
+    # the same audio separated with the same settings in an earlier job
+    params = {"tier": tier, "chunk_seconds": settings["chunk_seconds"], "chunk_overlap": settings["chunk_overlap"]}
+    cache_key = artifact_cache.cache_key(artifact_cache.audio_fingerprint(RAW_PCM_FILE), params) if artifact_cache.enabled() else None
+    cached_files = {"vocal_stem.npy": VOCAL_STEM_PCM_FILE, "vocal.npy": VOCAL_PCM_FILE}
+    if cache_key and artifact_cache.restore("separation", cache_key, cached_files) is not None:
+        _finish_separation(tier)
+        return
+
+    if tier == "htdemucs" and model_server.available():
+        # batch mode, the model server keeps htdemucs loaded between videos
+        model_server.request("separate", tier=tier, raw_file=os.path.abspath(RAW_PCM_FILE), output_file=os.path.abspath(VOCAL_STEM_PCM_FILE),
+                             chunk_seconds=settings["chunk_seconds"], chunk_overlap=settings["chunk_overlap"])
+    else:
+        if settings["cpu_threads"] > 0:
+            torch.set_num_threads(settings["cpu_threads"])
+        separate = load_separator(tier)
+        # read the shared PCM cache instead of decoding raw.mp3 again
+        separate_vocals_chunked(separate, load_pcm(RAW_PCM_FILE), VOCAL_STEM_PCM_FILE,
+                                settings["chunk_seconds"], settings["chunk_overlap"])
+        # Clean up memory
+        del separate
+        gc.collect()
+
     console.print("🎤 Saving vocals track...")
-    save_audio(outputs['vocals'].cpu(), VOCAL_AUDIO_FILE, **kwargs)
-    
-    console.print("🎹 Saving background music...")
-    background = sum(audio for source, audio in outputs.items() if source != 'vocals')
-    save_audio(background.cpu(), BACKGROUND_AUDIO_FILE, **kwargs)
-    
-    # Clean up memory
-    del outputs, background, model, separator
-    gc.collect()
-    
-    console.print("[green]✨ Audio separation completed![/green]")
+    normalize_pcm_file(VOCAL_STEM_PCM_FILE, VOCAL_PCM_FILE)
+    _finish_separation(tier)
+    if cache_key:
+        artifact_cache.store("separation", cache_key, cached_files, params)
+
+    console.print(f"[green]✨ Audio separation with <{tier}> completed![/green]")
+
+def _finish_separation(tier: str):
+    if load_key("save_mp3_audio"):
+        export_pcm(load_pcm(VOCAL_PCM_FILE), VOCAL_AUDIO_FILE)
+    # a background rendered from another tier's vocals is stale now
+    if os.path.exists(BACKGROUND_AUDIO_FILE):
+        os.remove(BACKGROUND_AUDIO_FILE)
+    with open(SEPARATION_TIER_FILE, 'w', encoding='utf-8') as f:
+        f.write(tier)
+
+def quick_vocals() -> str:
+    """Normalized vocals of the cheap `fast` tier in their own file, the full separation is left alone"""
+    settings = separation_settings()
+    separate_vocals_chunked(load_separator("fast"), load_pcm(RAW_PCM_FILE), QUICK_VOCAL_STEM_PCM_FILE,
+                            settings["chunk_seconds"], settings["chunk_overlap"])
+    normalize_pcm_file(QUICK_VOCAL_STEM_PCM_FILE, QUICK_VOCAL_PCM_FILE)
+    return QUICK_VOCAL_PCM_FILE
+
+def demucs_in_background(tier: str = None) -> Tuple[ProcessPoolExecutor, Future]:
+    """Run demucs_main in a separate process, the caller joins with future.result() and shuts the executor down"""
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return executor, executor.submit(demucs_main, tier)
+
+def _audio_format(video_file: str) -> Tuple[int, int, str]:
+    """Sample rate, channel count and layout of the first audio stream"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries', 'stream=sample_rate,channels,channel_layout',
+           '-of', 'json', video_file]
+    stream = json.loads(subprocess.run(cmd, capture_output=True, check=True).stdout)['streams'][0]
+    channels = int(stream['channels'])
+    return int(stream['sample_rate']), channels, stream.get('channel_layout') or f"{channels}c"
+
+def render_background(video_file: str):
+    """Write background.mp3 for the dubbing mix, only done when dubbing actually needs it.
+    The 16 kHz cache is for ASR: the vocals are resampled up and subtracted from every channel of the
+    source audio at its own sample rate, so the music bed keeps its bandwidth and stereo image."""
+    if os.path.exists(BACKGROUND_AUDIO_FILE):
+        return BACKGROUND_AUDIO_FILE
+    demucs_main()
+    rprint("[cyan]🎹 Rendering background music...[/cyan]")
+    sample_rate, channels, layout = _audio_format(video_file)
+    # after amerge the vocals are the last channel
+    subtract = "|".join(f"c{channel}=c{channel}-c{channels}" for channel in range(channels))
+    tmp_file = BACKGROUND_AUDIO_FILE + ".tmp.mp3"
+    cmd = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error', '-i', video_file,
+           '-f', 'f32le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-i', '-',
+           '-filter_complex', f'[1:a]aresample={sample_rate}[vocals];[0:a:0][vocals]amerge=inputs=2,pan={layout}|{subtract}[a]',
+           '-map', '[a]', '-c:a', 'libmp3lame', '-b:a', '192k', tmp_file]
+    # the vocals are streamed in blocks like export_pcm, the memory-mapped stem is never loaded whole
+    vocals = load_pcm(VOCAL_STEM_PCM_FILE)
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    block = 60 * SAMPLE_RATE
+    for start in range(0, len(vocals), block):
+        process.stdin.write(np.ascontiguousarray(vocals[start:start + block], dtype=np.float32).tobytes())
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+    os.replace(tmp_file, BACKGROUND_AUDIO_FILE)
+    rprint(f"[green]✅ Background music saved to {BACKGROUND_AUDIO_FILE}[/green]")
+    return BACKGROUND_AUDIO_FILE
 
 if __name__ == "__main__":
     demucs_main()
@@ -1,14 +1,13 @@
-import requests
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.config_utils import load_key
+from core.workspace import out
 from rich import print as rprint
 import json
-import tempfile
-import soundfile as sf
-import librosa
 import time
 from core.all_whisper_methods.audio_preprocess import save_language
+from core.all_whisper_methods.cloud_transcribe_utils import load_audio_once, slice_audio, encode_audio, get_session, \
+    load_cached_result, save_cached_result, transcribe_segments_parallel, SAMPLE_RATE
 
 # Language code mapping for ElevenLabs API
 LANGUAGE_CODE_MAPPING = {
@@ -71,98 +70,82 @@ def process_transcript(json_data, spacing_threshold=0.3):
     result = {"segments": segments}
     return result
 
+RUNTIME = "elevenlabs"
+
 def transcribe_audio_elevenlabs(raw_audio_path: str, vocal_audio_path: str, start: float = None, end: float = None):
     """
     Transcribe audio file to text using ElevenLabs API
     With support for partial audio transcription using start/end timestamps
     """
     rprint(f"[cyan]🎤 Processing audio transcription, file path: {vocal_audio_path}[/cyan]")
-    LOG_FILE = "output/log/elevenlabs_transcribe.json"
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    
-    # Load audio and process start/end parameters
-    y, sr = librosa.load(vocal_audio_path, sr=16000)
-    audio_duration = len(y) / sr
+    language_code = load_key("whisper.language")
+    if language_code not in LANGUAGE_CODE_MAPPING:
+        raise ValueError(f"Unsupported language code: {language_code}")
     
-    if not start or not end:
+    # Decode once per run and process start/end parameters
+    y, audio_hash = load_audio_once(vocal_audio_path)
+    if start is None or end is None:
         start = 0
-        end = audio_duration
+        end = len(y) / SAMPLE_RATE
     
-    # Slice audio based on start/end
-    start_sample = int(start * sr)
-    end_sample = int(end * sr)
-    y_slice = y[start_sample:end_sample]
+    # Each segment is cached on its own
+    cached = load_cached_result(RUNTIME, audio_hash, start, end, language_code)
+    if cached is not None:
+        rprint(f"[yellow]⚠️ Using cached transcription for segment {start:.2f}s to {end:.2f}s[/yellow]")
+        save_language(cached.get("language", language_code))
+        return cached
     
-    # Create temporary file for the sliced audio
-    with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-        temp_filepath = temp_file.name
-        sf.write(temp_filepath, y_slice, sr, format='MP3')
+    # Zero-copy slice, encoded in memory with a compact codec
+    audio_buffer, file_name, mime = encode_audio(slice_audio(y, start, end), codec="opus")
     
-    try:
-        api_key = load_key("whisper.elevenlabs_api_key")
-        base_url = "https://api.elevenlabs.io/v1/speech-to-text"
-        headers = {"xi-api-key": api_key}
-        
-        data = {
-            "model_id": "scribe_v1",
-            "timestamps_granularity": "word",
-            "diarize": True,
-            "num_speakers": None,
-            "tag_audio_events": False
-        }
-        
-        language_code = load_key("whisper.language")
-        if language_code not in LANGUAGE_CODE_MAPPING:
-            raise ValueError(f"Unsupported language code: {language_code}")
-        data["language_code"] = LANGUAGE_CODE_MAPPING.get(language_code)
-        
-        with open(temp_filepath, 'rb') as audio_file:
-            files = {
-                "file": (
-                    os.path.basename(temp_filepath),
-                    audio_file,
-                    'audio/mpeg'
-                )
-            }
-            
-            start_time = time.time()
-            response = requests.post(
-                base_url,
-                headers=headers,
-                data=data,
-                files=files
-            )
-            
-        rprint(f"[yellow]API request sent, status code: {response.status_code}[/yellow]")
-        
-        # Get the response JSON
-        result = response.json()
+    api_key = load_key("whisper.elevenlabs_api_key")
+    base_url = "https://api.elevenlabs.io/v1/speech-to-text"
+    headers = {"xi-api-key": api_key}
+    
+    data = {
+        "model_id": "scribe_v1",
+        "timestamps_granularity": "word",
+        "diarize": True,
+        "num_speakers": None,
+        "tag_audio_events": False,
+        "language_code": LANGUAGE_CODE_MAPPING.get(language_code)
+    }
+    files = {"file": (file_name, audio_buffer, mime)}
+    
+    start_time = time.time()
+    response = get_session().post(
+        base_url,
+        headers=headers,
+        data=data,
+        files=files
+    )
+    rprint(f"[yellow]API request sent, status code: {response.status_code}[/yellow]")
+    
+    # Get the response JSON
+    result = response.json()
 
-        # save detected language
-        language = LANGUAGE_CODE_MAPPING_REVERSE.get(result["language_code"])
-        save_language(language)
+    # save detected language
+    language = LANGUAGE_CODE_MAPPING_REVERSE.get(result["language_code"])
+    save_language(language)
+
+    # Adjust timestamps for all words by adding the start time
+    if 'words' in result:
+        for word in result['words']:
+            if 'start' in word:
+                word['start'] += start
+            if 'end' in word:
+                word['end'] += start
+    
+    rprint(f"[green]✓ Transcription completed in {time.time() - start_time:.2f} seconds[/green]")
+    # parse to whisper format
+    parsed_result = process_transcript(result)
+    parsed_result["language"] = language
+    save_cached_result(RUNTIME, audio_hash, start, end, language_code, parsed_result)
+    return parsed_result
 
-        # Adjust timestamps for all words by adding the start time
-        if start is not None and 'words' in result:
-            for word in result['words']:
-                if 'start' in word:
-                    word['start'] += start
-                if 'end' in word:
-                    word['end'] += start
-        
-        rprint(f"[green]✓ Transcription completed in {time.time() - start_time:.2f} seconds[/green]")
-        # parse to whisper format
-        parsed_result = process_transcript(result)
-        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump(parsed_result, f, indent=4, ensure_ascii=False)
-        return parsed_result
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
+def transcribe_segments_elevenlabs(raw_audio_path: str, vocal_audio_path: str, segments):
+    """Upload all segments concurrently"""
+    return transcribe_segments_parallel(transcribe_audio_elevenlabs, raw_audio_path, vocal_audio_path, segments)
 
 if __name__ == "__main__":
     file_path = input("Enter local audio file path (mp3 format): ")
@@ -171,5 +154,5 @@ if __name__ == "__main__":
     print(result)
     
     # Save result to file
-    with open("output/transcript.json", "w", encoding="utf-8") as f:
+    with open(out("transcript.json"), "w", encoding="utf-8") as f:
         json.dump(result, f, ensure_ascii=False, indent=4)
\ No newline at end of file
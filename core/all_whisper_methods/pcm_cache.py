@@ -0,0 +1,130 @@
+import os, sys, subprocess, threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.workspace import out
+from typing import Dict, Tuple
+import numpy as np
+from rich import print as rprint
+
+# Every audio source is decoded once into a 16 kHz mono float32 `.npy` next to it (raw.npy, vocal.npy).
+# Readers memory-map it, so slicing a segment by time is a zero-copy view and the OS page cache is
+# shared between steps and processes.
+
+SAMPLE_RATE = 16000
+AUDIO_DIR = out("audio")
+RAW_PCM_FILE = os.path.join(AUDIO_DIR, "raw.npy")
+VOCAL_PCM_FILE = os.path.join(AUDIO_DIR, "vocal.npy")
+
+_pcm_cache: Dict[str, Tuple[float, np.ndarray]] = {}
+_pcm_lock = threading.Lock()
+
+def pcm_path(audio_file: str) -> str:
+    """`output/audio/vocal.mp3` -> `output/audio/vocal.npy`"""
+    return os.path.splitext(audio_file)[0] + ".npy"
+
+def decode_to_pcm(source_file: str, pcm_file: str = None) -> str:
+    """Decode any ffmpeg-readable file (video or audio) into a 16 kHz mono float32 .npy"""
+    pcm_file = pcm_file or pcm_path(source_file)
+    rprint(f"[cyan]🎵 Decoding <{source_file}> into PCM cache <{pcm_file}> ...[/cyan]")
+    cmd = ['ffmpeg', '-nostdin', '-i', source_file, '-vn',
+           '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-']
+    process = subprocess.run(cmd, capture_output=True, check=True)
+    save_pcm(np.frombuffer(process.stdout, dtype=np.float32), pcm_file)
+    return pcm_file
+
+def _tmp_file(pcm_file: str) -> str:
+    return pcm_file + ".tmp.npy"
+
+def commit_pcm(pcm_file: str):
+    """Move a finished temp file in place, readers never see half a file"""
+    # drop our own mapping first, Windows refuses to replace a file that is still mapped
+    with _pcm_lock:
+        _pcm_cache.pop(pcm_file, None)
+    os.replace(_tmp_file(pcm_file), pcm_file)
+
+def save_pcm(samples: np.ndarray, pcm_file: str):
+    """Write 16 kHz mono samples to the cache"""
+    os.makedirs(os.path.dirname(pcm_file) or ".", exist_ok=True)
+    np.save(_tmp_file(pcm_file), np.ascontiguousarray(samples, dtype=np.float32))
+    commit_pcm(pcm_file)
+
+def pcm_writer(pcm_file: str, n_samples: int) -> np.ndarray:
+    """Zero-filled writable memmap for streaming output into `pcm_file`.
+    Flush and drop it, then call commit_pcm(pcm_file)."""
+    os.makedirs(os.path.dirname(pcm_file) or ".", exist_ok=True)
+    return np.lib.format.open_memmap(_tmp_file(pcm_file), mode='w+', dtype=np.float32, shape=(n_samples,))
+
+def load_pcm(audio_file: str) -> np.ndarray:
+    """Memory-mapped samples of `audio_file`, accepts either the .npy itself or the file it was decoded from.
+    The source is only decoded when no cache exists yet (mp3 copies are exported from the cache, not the other way round)."""
+    pcm_file = audio_file if audio_file.endswith(".npy") else pcm_path(audio_file)
+    if not os.path.exists(pcm_file):
+        if pcm_file == audio_file or not os.path.exists(audio_file):
+            raise FileNotFoundError(f"No PCM cache or source audio for {audio_file}")
+        decode_to_pcm(audio_file, pcm_file)
+
+    with _pcm_lock:
+        mtime = os.path.getmtime(pcm_file)
+        cached = _pcm_cache.get(pcm_file)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        samples = np.load(pcm_file, mmap_mode='r')
+        _pcm_cache[pcm_file] = (mtime, samples)
+        return samples
+
+def slice_pcm(samples: np.ndarray, start: float = None, end: float = None) -> np.ndarray:
+    """Zero-copy view of [start, end) seconds"""
+    start_sample = 0 if start is None else max(0, int(start * SAMPLE_RATE))
+    end_sample = len(samples) if end is None else int(end * SAMPLE_RATE)
+    return samples[start_sample:end_sample]
+
+def load_pcm_segment(audio_file: str, start: float = None, end: float = None) -> np.ndarray:
+    return slice_pcm(load_pcm(audio_file), start, end)
+
+def pcm_duration(audio_file: str) -> float:
+    return len(load_pcm(audio_file)) / SAMPLE_RATE
+
+def normalize_pcm(samples: np.ndarray, target_db: float = -20.0) -> np.ndarray:
+    """Same loudness target as normalize_audio_volume (dBFS relative to full scale), computed on the samples"""
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
+    if rms == 0:
+        return np.asarray(samples, dtype=np.float32)
+    current_db = 20 * np.log10(rms)
+    gain = 10 ** ((target_db - current_db) / 20)
+    rprint(f"[green]✅ Audio normalized from {current_db:.1f}dB to {target_db:.1f}dB[/green]")
+    return np.clip(samples * gain, -1.0, 1.0).astype(np.float32)
+
+def normalize_pcm_file(source_file: str, pcm_file: str, target_db: float = -20.0):
+    """normalize_pcm for a whole cached track, read and written in blocks so no full-length copy is made"""
+    samples = load_pcm(source_file)
+    block = 60 * SAMPLE_RATE
+    square_sum = sum(float(np.sum(np.square(samples[start:start + block], dtype=np.float64)))
+                     for start in range(0, len(samples), block))
+    rms = float(np.sqrt(square_sum / len(samples))) if len(samples) else 0.0
+    gain = 1.0
+    if rms > 0:
+        current_db = 20 * np.log10(rms)
+        gain = 10 ** ((target_db - current_db) / 20)
+        rprint(f"[green]✅ Audio normalized from {current_db:.1f}dB to {target_db:.1f}dB[/green]")
+    normalized = pcm_writer(pcm_file, len(samples))
+    for start in range(0, len(samples), block):
+        normalized[start:start + block] = np.clip(samples[start:start + block] * gain, -1.0, 1.0)
+    normalized.flush()
+    del normalized
+    commit_pcm(pcm_file)
+
+def export_pcm(samples: np.ndarray, output_file: str, bitrate: str = "128k"):
+    """Encode cached samples to a regular audio file (mp3/wav/...) for tools that need one, e.g. ffmpeg mixing"""
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    cmd = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error', '-f', 'f32le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-i', '-']
+    if output_file.endswith(".mp3"):
+        cmd += ['-c:a', 'libmp3lame', '-b:a', bitrate]
+    cmd += [output_file]
+    # streamed in blocks so a memory-mapped track is never loaded whole
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    block = 60 * SAMPLE_RATE
+    for start in range(0, len(samples), block):
+        process.stdin.write(np.ascontiguousarray(samples[start:start + block], dtype=np.float32).tobytes())
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+    return output_file
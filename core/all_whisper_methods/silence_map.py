@@ -0,0 +1,65 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from typing import List, Tuple
+import numpy as np
+from rich import print as rprint
+from core.all_whisper_methods.pcm_cache import SAMPLE_RATE, load_pcm, pcm_path
+
+# Energy of the whole track in 20 ms frames, computed once from the PCM cache and saved next to it
+# (`raw_silence.npy` for `raw.npy`). Cut points and speech regions are read from this map instead of
+# running ffmpeg silencedetect on every window.
+
+FRAME_SEC = 0.02
+FRAME_LEN = int(SAMPLE_RATE * FRAME_SEC)
+# frames per block when computing the map, bounds the temporary float64 copy to ~15 MB
+BLOCK_FRAMES = 6000
+SILENCE_DB = -30.0
+MIN_SILENCE = 0.5
+DB_FLOOR = -100.0
+
+def silence_map_file(audio_file: str) -> str:
+    return os.path.splitext(pcm_path(audio_file))[0] + "_silence.npy"
+
+def frame_rms_db(samples: np.ndarray) -> np.ndarray:
+    """RMS level in dBFS of every FRAME_LEN frame, the tail is zero-padded into a last frame"""
+    n_frames = -(-len(samples) // FRAME_LEN)
+    db = np.empty(n_frames, dtype=np.float32)
+    block = BLOCK_FRAMES * FRAME_LEN
+    for i, pos in enumerate(range(0, len(samples), block)):
+        chunk = np.asarray(samples[pos:pos + block], dtype=np.float64)
+        pad = -len(chunk) % FRAME_LEN
+        if pad:
+            chunk = np.concatenate((chunk, np.zeros(pad)))
+        rms = np.sqrt(np.mean(np.square(chunk.reshape(-1, FRAME_LEN)), axis=1))
+        db[i * BLOCK_FRAMES:i * BLOCK_FRAMES + len(rms)] = 20 * np.log10(np.maximum(rms, 10 ** (DB_FLOOR / 20)))
+    return db
+
+def load_silence_map(audio_file: str) -> np.ndarray:
+    """Per-frame dBFS of `audio_file`, computed on first use and reused while the PCM cache is unchanged"""
+    map_file = silence_map_file(audio_file)
+    samples = load_pcm(audio_file)
+    n_frames = -(-len(samples) // FRAME_LEN)
+    if os.path.exists(map_file) and os.path.getmtime(map_file) >= os.path.getmtime(samples.filename):
+        db = np.load(map_file)
+        if len(db) == n_frames:
+            return db
+    rprint(f"[cyan]📈 Building silence map for <{audio_file}> ...[/cyan]")
+    db = frame_rms_db(samples)
+    np.save(map_file, db)
+    return db
+
+def silence_runs(db: np.ndarray, threshold_db: float = SILENCE_DB, min_silence: float = MIN_SILENCE) -> Tuple[np.ndarray, np.ndarray]:
+    """(starts, ends) in seconds of every run of frames below `threshold_db` lasting at least `min_silence`"""
+    silent = np.concatenate(([False], db < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * FRAME_SEC >= min_silence
+    return starts[keep] * FRAME_SEC, ends[keep] * FRAME_SEC
+
+def silence_ends_between(db: np.ndarray, start: float, end: float, threshold_db: float = SILENCE_DB,
+                         min_silence: float = MIN_SILENCE) -> List[float]:
+    """Where speech resumes after a silence inside [start, end], like `silence_end` of ffmpeg silencedetect"""
+    # clip the map to the window so a silence straddling its edges is measured the same way ffmpeg would
+    first, last = int(start / FRAME_SEC), int(np.ceil(end / FRAME_SEC))
+    _, ends = silence_runs(db[first:last], threshold_db, min_silence)
+    return (ends + first * FRAME_SEC).tolist()
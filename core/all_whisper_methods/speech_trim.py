@@ -0,0 +1,100 @@
+import os, sys, json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from rich import print as rprint
+from core.all_whisper_methods.pcm_cache import AUDIO_DIR, SAMPLE_RATE, load_pcm, save_pcm
+from core.all_whisper_methods.silence_map import load_silence_map, silence_runs
+
+# Speech-activity trimming before ASR: long stretches without speech (music intros, gameplay, ...) are cut
+# out of the track, the speech regions are packed back to back with a short silent gap between them,
+# and the word timestamps of the transcription are mapped back to the original timeline afterwards.
+
+# Frames quieter than this count as non-speech, measured on the normalized vocals (quick fast-tier vocals while htdemucs still runs)
+SPEECH_DB = -45.0
+# Only non-speech stretches at least this long are cut, and this much context is kept on each side
+MIN_CUT = 2.0
+PAD = 0.5
+# Silence inserted between packed regions, long enough for the splitter and WhisperX's VAD to see a boundary
+PACK_GAP = 0.5
+# Not worth re-packing the track for less than this
+MIN_SAVED = 10.0
+
+SPEECH_RAW_FILE = os.path.join(AUDIO_DIR, "speech_raw.npy")
+SPEECH_VOCAL_FILE = os.path.join(AUDIO_DIR, "speech_vocal.npy")
+SPEECH_REGIONS_FILE = os.path.join(AUDIO_DIR, "speech_regions.json")
+
+def find_speech_regions(audio_file: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(starts, ends) in seconds of the regions to keep, read from the silence map of `audio_file`"""
+    duration = len(load_pcm(audio_file)) / SAMPLE_RATE
+    cut_starts, cut_ends = silence_runs(load_silence_map(audio_file), SPEECH_DB, MIN_CUT)
+    cut_ends = np.minimum(cut_ends, duration)
+    # keep some context around speech, except at the very start and end of the track
+    cut_starts = np.where(cut_starts > 0, cut_starts + PAD, cut_starts)
+    cut_ends = np.where(cut_ends < duration, cut_ends - PAD, cut_ends)
+    keep = cut_ends > cut_starts
+    cut_starts, cut_ends = cut_starts[keep], cut_ends[keep]
+
+    # speech regions are the complement of the cuts
+    starts = np.concatenate(([0.0], cut_ends))
+    ends = np.concatenate((cut_starts, [duration]))
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+def pack_regions(audio_file: str, starts: np.ndarray, ends: np.ndarray, output_file: str):
+    """Concatenate the regions of `audio_file` with PACK_GAP silence between them"""
+    samples = load_pcm(audio_file)
+    gap = np.zeros(int(PACK_GAP * SAMPLE_RATE), dtype=np.float32)
+    pieces = []
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if i:
+            pieces.append(gap)
+        # round the length once so every track packed with the same regions has the same length
+        first = int(round(start * SAMPLE_RATE))
+        pieces.append(samples[first:first + int(round((end - start) * SAMPLE_RATE))])
+    save_pcm(np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32), output_file)
+
+def plan_trim(audio_file: str) -> Optional[Dict]:
+    """Speech regions of `audio_file` and where they land once packed, None when there is too little to gain"""
+    starts, ends = find_speech_regions(audio_file)
+    duration = len(load_pcm(audio_file)) / SAMPLE_RATE
+    speech = float(np.sum(ends - starts))
+    saved = duration - speech - PACK_GAP * max(len(starts) - 1, 0)
+    if saved < MIN_SAVED:
+        rprint(f"[blue]ℹ️ Speech covers most of the track ({speech:.0f}s of {duration:.0f}s), transcribing it whole[/blue]")
+        return None
+
+    packed_starts = np.concatenate(([0.0], np.cumsum((ends - starts)[:-1] + PACK_GAP)))
+    regions = {'start': starts.tolist(), 'end': ends.tolist(), 'packed_start': packed_starts.tolist()}
+    with open(SPEECH_REGIONS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(regions, f)
+    rprint(f"[green]✂️ Kept {len(starts)} speech regions, ASR runs on {duration - saved:.0f}s instead of {duration:.0f}s "
+           f"({saved:.0f}s / {saved / duration:.0%} saved)[/green]")
+    return regions
+
+def pack_track(audio_file: str, regions: Dict, output_file: str) -> str:
+    """Pack `audio_file` along planned regions, every track packed with the same plan lines up sample for sample"""
+    pack_regions(audio_file, np.asarray(regions['start']), np.asarray(regions['end']), output_file)
+    return output_file
+
+def remap_times(times: np.ndarray, regions: Dict) -> np.ndarray:
+    """Map packed-track times back to the original timeline, times inside a gap stick to the nearest region edge"""
+    starts, ends = np.asarray(regions['start']), np.asarray(regions['end'])
+    packed_starts = np.asarray(regions['packed_start'])
+    idx = np.clip(np.searchsorted(packed_starts, times, side='right') - 1, 0, len(packed_starts) - 1)
+    offset = np.maximum(times - packed_starts[idx], 0)
+    return np.minimum(starts[idx] + offset, ends[idx])
+
+def remap_result(result: Dict, regions: Dict) -> Dict:
+    """Shift segment and word timestamps of a whisper-format result back to the original timeline"""
+    entries: List[Tuple[Dict, str]] = []
+    for segment in result['segments']:
+        entries += [(segment, key) for key in ('start', 'end') if key in segment]
+        for word in segment.get('words', []):
+            entries += [(word, key) for key in ('start', 'end') if key in word]
+    if not entries:
+        return result
+    remapped = remap_times(np.array([item[key] for item, key in entries], dtype=float), regions)
+    for (item, key), value in zip(entries, remapped):
+        item[key] = float(value)
+    return result
@@ -0,0 +1,73 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import numpy as np
+from scipy.ndimage import median_filter
+from scipy.signal import stft, istft
+from core.all_whisper_methods.pcm_cache import SAMPLE_RATE
+from core.workspace import out
+
+# Fast CPU vocal isolation: no model, a spectral mask on the 16 kHz mono track.
+# Sustained parts of the spectrum (music beds, hum, steady noise) are estimated with a median over time,
+# what rises above them inside the speech band is kept with a soft Wiener-style mask.
+
+N_FFT = 1024
+HOP = 256
+# ~0.8s of frames, longer than a syllable so speech does not leak into the background estimate
+BACKGROUND_FRAMES = 51
+SPEECH_BAND = (80.0, 7600.0)
+# Slope of the band edges in Hz, a hard cut sounds metallic
+BAND_ROLLOFF = 60.0
+MASK_POWER = 2.0
+
+def _band_weights(freqs: np.ndarray) -> np.ndarray:
+    low, high = SPEECH_BAND
+    rise = np.clip((freqs - (low - BAND_ROLLOFF)) / BAND_ROLLOFF, 0, 1)
+    fall = np.clip(((high + BAND_ROLLOFF) - freqs) / BAND_ROLLOFF, 0, 1)
+    return (rise * fall)[:, None]
+
+def enhance_vocals(samples: np.ndarray) -> np.ndarray:
+    """Estimate the vocals of a 16 kHz mono chunk, same length as the input"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) < N_FFT:
+        return samples.copy()
+    freqs, _, spec = stft(samples, fs=SAMPLE_RATE, nperseg=N_FFT, noverlap=N_FFT - HOP)
+    magnitude = np.abs(spec)
+    background = median_filter(magnitude, size=(1, BACKGROUND_FRAMES), mode='nearest')
+    foreground = np.maximum(magnitude - background, 0)
+    mask = foreground ** MASK_POWER / (foreground ** MASK_POWER + background ** MASK_POWER + 1e-10)
+    _, vocals = istft(spec * mask * _band_weights(freqs), fs=SAMPLE_RATE, nperseg=N_FFT, noverlap=N_FFT - HOP)
+    return np.pad(vocals, (0, max(0, len(samples) - len(vocals))))[:len(samples)].astype(np.float32)
+
+def benchmark_tiers(audio_file: str = out("audio/raw.npy"), seconds: float = 120.0, tiers=("none", "fast", "htdemucs")):
+    """Speed (seconds of audio per second) of each tier, and how well WhisperX aligns the same transcript on its vocals.
+    Alignment quality is the share of words that got a timestamp and their mean alignment score."""
+    import time
+    import whisperx
+    from core.all_whisper_methods.pcm_cache import load_pcm, normalize_pcm
+    from core.all_whisper_methods.demucs_vl import load_separator
+    from core.all_whisper_methods.whisperX_local import WhisperXTranscriber
+
+    raw = np.array(load_pcm(audio_file)[:int(seconds * SAMPLE_RATE)], dtype=np.float32)
+    duration = len(raw) / SAMPLE_RATE
+    transcriber = WhisperXTranscriber()
+    try:
+        # transcribe once on the raw track, only the alignment input changes between tiers
+        asr = transcriber.load_model().transcribe(raw, batch_size=transcriber.batch_size)
+        model_a, metadata = transcriber.load_align_model(asr["language"])
+        print(f"⏱️ {duration:.0f}s clip of {audio_file}")
+        for tier in tiers:
+            separate = load_separator(tier)
+            start = time.time()
+            vocals = separate(raw)
+            elapsed = max(time.time() - start, 1e-6)
+            aligned = whisperx.align(asr["segments"], model_a, metadata, normalize_pcm(vocals), transcriber.device, return_char_alignments=False)
+            words = [word for segment in aligned["segments"] for word in segment.get("words", [])]
+            timed = [word for word in words if 'start' in word]
+            coverage = len(timed) / len(words) if words else 0.0
+            score = float(np.mean([word.get("score", 0.0) for word in timed])) if timed else 0.0
+            print(f"  {tier:>9}: {duration / elapsed:8.1f}s audio/s, aligned words {coverage:.1%}, mean score {score:.3f}")
+    finally:
+        transcriber.release()
+
+if __name__ == "__main__":
+    benchmark_tiers()
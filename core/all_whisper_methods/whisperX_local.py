@@ -7,17 +7,25 @@ import whisperx
 import torch
 import time
 import subprocess
-from typing import Dict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
 from rich import print as rprint
-import librosa
 from core.config_utils import load_key
+from core.workspace import out
 from core.all_whisper_methods.audio_preprocess import save_language
+from core.all_whisper_methods.pcm_cache import load_pcm_segment
 import numpy as np
 
 MODEL_DIR = load_key("model_dir")
 
+_HF_MIRROR = None
+
 def check_hf_mirror() -> str:
-    """Check and return the fastest HF mirror"""
+    """Check and return the fastest HF mirror, the decision is remembered for the whole run"""
+    global _HF_MIRROR
+    if _HF_MIRROR is not None:
+        return _HF_MIRROR
     mirrors = {
         'Official': 'huggingface.co',
         'Mirror': 'hf-mirror.com'
@@ -44,79 +52,251 @@ def check_hf_mirror() -> str:
     if best_time == float('inf'):
         rprint("[yellow]⚠️ All mirrors failed, using default[/yellow]")
     rprint(f"[cyan]🚀 Selected mirror:[/cyan] {fastest_url} ({best_time:.2f}s)")
+    _HF_MIRROR = fastest_url
     return fastest_url
 
 def load_audio_segment(audio_file: str, start: float, end: float) -> np.ndarray:
-    """load audio segment from audio file"""
-    duration = end - start
-    audio, _ = librosa.load(
-        audio_file,
-        sr=16000,
-        offset=start,
-        duration=duration,
-        mono=True
-    )
-    return audio
+    """load audio segment from the shared PCM cache, a view into the memory-mapped samples"""
+    return load_pcm_segment(audio_file, start, end)
 
-def transcribe_audio(raw_audio_file: str, vocal_audio_file: str, start: float, end: float) -> Dict:
-    os.environ['HF_ENDPOINT'] = check_hf_mirror()
-    WHISPER_LANGUAGE = load_key("whisper.language")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    rprint(f"🚀 Starting WhisperX using device: {device} ...")
-    
-    if device == "cuda":
-        gpu_mem = torch.cuda.get_device_properties(0).total_memory / (1024**3)
-        batch_size = 16 if gpu_mem > 8 else 2
-        compute_type = "float16" if torch.cuda.is_bf16_supported() else "int8"
-        rprint(f"[cyan]🎮 GPU memory:[/cyan] {gpu_mem:.2f} GB, [cyan]📦 Batch size:[/cyan] {batch_size}, [cyan]⚙️ Compute type:[/cyan] {compute_type}")
-    else:
-        batch_size = 1
-        compute_type = "int8"
-        rprint(f"[cyan]📦 Batch size:[/cyan] {batch_size}, [cyan]⚙️ Compute type:[/cyan] {compute_type}")
-    rprint(f"[green]▶️ Starting WhisperX for segment {start:.2f}s to {end:.2f}s...[/green]")
-    
+def _windows_memory_status():
+    import ctypes
+    class MEMORYSTATUSEX(ctypes.Structure):
+        _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("sullAvailExtendedVirtual", ctypes.c_ulonglong)]
+    status = MEMORYSTATUSEX()
+    status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+    ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+    return status
+
+def free_ram_gb() -> float:
+    """Memory still available for new allocations in GB, 0 if it cannot be determined"""
+    try:
+        if os.name == 'nt':
+            return _windows_memory_status().ullAvailPhys / (1024**3)
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / (1024**2)
+    except (ValueError, OSError, AttributeError):
+        pass
+    return 0.0
+
+def resolve_cpu_profile(overrides: Dict = None, ram_gb: float = None) -> Dict:
+    """CPU inference settings, every `auto` in whisper.cpu_profile is picked from the core count and the
+    RAM still available (`ram_gb`, measured when not given), other jobs of a batch may hold the rest"""
+    profile = dict(load_key("whisper.cpu_profile"))
+    profile.update(overrides or {})
+    cores = os.cpu_count() or 1
+    ram_gb = free_ram_gb() if ram_gb is None else ram_gb
+
+    if profile["inter_threads"] == 'auto':
+        # torch inter-op threads only help the alignment / VAD models, a couple are enough
+        profile["inter_threads"] = 2 if cores >= 8 else 1
+    if profile["threads"] == 'auto':
+        profile["threads"] = max(1, cores - profile["inter_threads"] + 1) if cores > 2 else cores
+    if profile["compute_type"] == 'auto':
+        # int8 weights with float32 activations are more accurate and affordable with enough memory
+        profile["compute_type"] = "int8_float32" if ram_gb >= 16 else "int8"
+    if profile["batch_size"] == 'auto':
+        # roughly 2GB per batch item for large-v3 in int8 once ~4GB are left for the model itself,
+        # and a batch item per 4 cores keeps them busy
+        profile["batch_size"] = int(max(1, min(ram_gb // 2 - 2 if ram_gb else 1, cores // 4, 8)))
+    if profile["beam_size"] == 'auto':
+        # beam search multiplies decoding cost, greedy on small machines
+        profile["beam_size"] = 5 if cores >= 16 else 2 if cores >= 8 else 1
+    return profile
+
+def apply_torch_threads(profile: Dict):
+    torch.set_num_threads(profile["threads"])
+    try:
+        torch.set_num_interop_threads(profile["inter_threads"])
+    except RuntimeError:
+        pass  # can only be set once per process, before any inter-op work started
+
+# Forced alignment in a process pool: every worker loads one copy of the alignment model in its initializer
+_ALIGN_WORKER = {}
+
+def _peak_memory_mb() -> float:
+    """Peak resident memory of this process in MB, 0 where the platform does not report it"""
     try:
-        if WHISPER_LANGUAGE == 'zh':
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return 0.0
+
+def _init_align_worker(language: str, hf_endpoint: str, threads: int):
+    os.environ['HF_ENDPOINT'] = hf_endpoint
+    torch.set_num_threads(threads)
+    _ALIGN_WORKER["model"], _ALIGN_WORKER["metadata"] = whisperx.load_align_model(language_code=language, device="cpu")
+
+def _align_group(segments: List[Dict], vocal_audio_file: str, start: float, end: float):
+    """Align a group of first-pass segments on the same audio slice the serial path uses"""
+    began = time.time()
+    vocal_audio_segment = load_audio_segment(vocal_audio_file, start, end)
+    result = whisperx.align(segments, _ALIGN_WORKER["model"], _ALIGN_WORKER["metadata"], vocal_audio_segment, "cpu", return_char_alignments=False)
+    return result, time.time() - began, _peak_memory_mb()
+
+def _split_groups(segments: List[Dict], n_groups: int) -> List[List[Dict]]:
+    """Contiguous groups of roughly equal speech duration, so merging them keeps the original order"""
+    durations = np.array([segment['end'] - segment['start'] for segment in segments], dtype=float)
+    bounds = np.searchsorted(np.cumsum(durations), np.linspace(0, durations.sum(), n_groups + 1)[1:-1], side='right')
+    groups = [segments[i:j] for i, j in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(segments)])))]
+    return [group for group in groups if group]
+
+def accept_language(language: str, whisper_language: str):
+    """Record the language the first pass detected"""
+    save_language(language)
+    if language == 'zh' and whisper_language != 'zh':
+        raise ValueError("Please specify the transcription language as zh and try again!")
+
+class WhisperXTranscriber:
+    """Holds the ASR model and the alignment model for the whole run, so every segment reuses them"""
+
+    def __init__(self, whisper_language: str = None):
+        os.environ['HF_ENDPOINT'] = check_hf_mirror()
+        self.whisper_language = whisper_language or load_key("whisper.language")
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        rprint(f"🚀 Starting WhisperX using device: {self.device} ...")
+
+        if self.device == "cuda":
+            gpu_mem = torch.cuda.get_device_properties(0).total_memory / (1024**3)
+            self.batch_size = 16 if gpu_mem > 8 else 2
+            self.compute_type = "float16" if torch.cuda.is_bf16_supported() else "int8"
+            rprint(f"[cyan]🎮 GPU memory:[/cyan] {gpu_mem:.2f} GB, [cyan]📦 Batch size:[/cyan] {self.batch_size}, [cyan]⚙️ Compute type:[/cyan] {self.compute_type}")
+        else:
+            profile = resolve_cpu_profile()
+            self.batch_size, self.compute_type = profile["batch_size"], profile["compute_type"]
+            self.threads, self.beam_size = profile["threads"], profile["beam_size"]
+            apply_torch_threads(profile)
+            rprint(f"[cyan]🧵 Threads:[/cyan] {self.threads}, [cyan]📦 Batch size:[/cyan] {self.batch_size}, [cyan]🔦 Beam size:[/cyan] {self.beam_size}, [cyan]⚙️ Compute type:[/cyan] {self.compute_type}")
+
+        self.model = None
+        self.align_model = None
+        self.align_metadata = None
+        self.align_language = None
+        self.align_pool = None
+        self.align_pool_language = None
+        self.align_workers = self._resolve_align_workers()
+
+    def _resolve_align_workers(self) -> int:
+        """0 aligns in this process, the pool only pays off for the CPU alignment model"""
+        workers = load_key("whisper.align_workers")
+        if self.device != "cpu":
+            return 0
+        if workers == 'auto':
+            workers = min((os.cpu_count() or 1) // 2, 4)
+        return workers if workers > 1 else 0
+
+    def _model_name(self) -> str:
+        if self.whisper_language == 'zh':
             model_name = "Huan69/Belle-whisper-large-v3-zh-punct-fasterwhisper"
             local_model = os.path.join(MODEL_DIR, "Belle-whisper-large-v3-zh-punct-fasterwhisper")
         else:
             model_name = load_key("whisper.model")
             local_model = os.path.join(MODEL_DIR, model_name)
-            
+
         if os.path.exists(local_model):
             rprint(f"[green]📥 Loading local WHISPER model:[/green] {local_model} ...")
-            model_name = local_model
-        else:
-            rprint(f"[green]📥 Using WHISPER model from HuggingFace:[/green] {model_name} ...")
+            return local_model
+        rprint(f"[green]📥 Using WHISPER model from HuggingFace:[/green] {model_name} ...")
+        return model_name
 
-        vad_options = {"vad_onset": 0.500,"vad_offset": 0.363}
-        asr_options = {"temperatures": [0],"initial_prompt": "",}
-        whisper_language = None if 'auto' in WHISPER_LANGUAGE else WHISPER_LANGUAGE
-        rprint("[bold yellow] You can ignore warning of `Model was trained with torch 1.10.0+cu102, yours is 2.0.0+cu118...`[/bold yellow]")
-        model = whisperx.load_model(model_name, device, compute_type=compute_type, language=whisper_language, vad_options=vad_options, asr_options=asr_options, download_root=MODEL_DIR)
+    def load_model(self):
+        if self.model is None:
+            vad_options = {"vad_onset": 0.500,"vad_offset": 0.363}
+            asr_options = {"temperatures": [0],"initial_prompt": "",}
+            cpu_kwargs = {}
+            if self.device == "cpu":
+                asr_options["beam_size"] = self.beam_size
+                cpu_kwargs["threads"] = self.threads
+            whisper_language = None if 'auto' in self.whisper_language else self.whisper_language
+            rprint("[bold yellow] You can ignore warning of `Model was trained with torch 1.10.0+cu102, yours is 2.0.0+cu118...`[/bold yellow]")
+            self.model = whisperx.load_model(self._model_name(), self.device, compute_type=self.compute_type, language=whisper_language, vad_options=vad_options, asr_options=asr_options, download_root=MODEL_DIR, **cpu_kwargs)
+        return self.model
 
-        raw_audio_segment = load_audio_segment(raw_audio_file, start, end)
-        vocal_audio_segment = load_audio_segment(vocal_audio_file, start, end)
-        
-        rprint("[bold green]Note: You will see Progress if working correctly ↓[/bold green]")
-        result = model.transcribe(raw_audio_segment, batch_size=batch_size, print_progress=True)
+    def load_align_model(self, language: str):
+        # alignment models are per language, only reload when the detected language changes
+        if self.align_model is None or self.align_language != language:
+            self.release_align_model()
+            self.align_model, self.align_metadata = whisperx.load_align_model(language_code=language, device=self.device)
+            self.align_language = language
+        return self.align_model, self.align_metadata
 
-        # Free GPU resources
-        del model
-        torch.cuda.empty_cache()
+    def release_align_model(self):
+        if self.align_model is not None:
+            del self.align_model
+            self.align_model, self.align_metadata, self.align_language = None, None, None
+            torch.cuda.empty_cache()
 
-        # Save language
-        save_language(result['language'])
-        if result['language'] == 'zh' and WHISPER_LANGUAGE != 'zh':
-            raise ValueError("Please specify the transcription language as zh and try again!")
+    def get_align_pool(self, language: str) -> ProcessPoolExecutor:
+        if self.align_pool is None or self.align_pool_language != language:
+            self.release_align_pool()
+            threads = max(1, (os.cpu_count() or 1) // self.align_workers)
+            self.align_pool = ProcessPoolExecutor(max_workers=self.align_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                  initializer=_init_align_worker, initargs=(language, os.environ['HF_ENDPOINT'], threads))
+            self.align_pool_language = language
+        return self.align_pool
 
-        # Align timestamps using vocal audio
-        model_a, metadata = whisperx.load_align_model(language_code=result["language"], device=device)
-        result = whisperx.align(result["segments"], model_a, metadata, vocal_audio_segment, device, return_char_alignments=False)
+    def release_align_pool(self):
+        if self.align_pool is not None:
+            self.align_pool.shutdown(wait=True)
+            self.align_pool, self.align_pool_language = None, None
 
-        # Free GPU resources again
+    def release(self):
+        """Free the models once every segment is done"""
+        if self.model is not None:
+            del self.model
+            self.model = None
+        self.release_align_model()
+        self.release_align_pool()
         torch.cuda.empty_cache()
-        del model_a
+
+    def _align_parallel(self, result: Dict, vocal_audio_file: str, start: float, end: float) -> Dict:
+        """Fan groups of segments out to the alignment pool and merge them back in order"""
+        pool = self.get_align_pool(result["language"])
+        groups = _split_groups(result["segments"], self.align_workers * 4)
+        began = time.time()
+        futures = [pool.submit(_align_group, group, vocal_audio_file, start, end) for group in groups]
+        outputs = [future.result() for future in futures]
+        wall = time.time() - began
+
+        merged = {"segments": [], "word_segments": []}
+        for aligned, _, _ in outputs:
+            merged["segments"].extend(aligned["segments"])
+            merged["word_segments"].extend(aligned.get("word_segments", []))
+        busy = sum(elapsed for _, elapsed, _ in outputs)
+        peak = max(memory for _, _, memory in outputs)
+        rprint(f"[green]🧮 Aligned {len(groups)} groups on {self.align_workers} workers in {wall:.1f}s "
+               f"(speedup {busy / max(wall, 1e-6):.1f}x, peak memory per worker {peak:.0f} MB)[/green]")
+        return merged
+
+    def first_pass(self, raw_audio_file: str, start: float, end: float) -> Dict:
+        rprint(f"[green]▶️ Starting WhisperX for segment {start:.2f}s to {end:.2f}s...[/green]")
+        model = self.load_model()
+        raw_audio_segment = load_audio_segment(raw_audio_file, start, end)
+
+        rprint("[bold green]Note: You will see Progress if working correctly ↓[/bold green]")
+        return model.transcribe(raw_audio_segment, batch_size=self.batch_size, print_progress=True)
+
+    def asr(self, raw_audio_file: str, start: float, end: float) -> Dict:
+        """First pass on the raw track, only needs the ASR model so it can run while vocals are still being separated"""
+        result = self.first_pass(raw_audio_file, start, end)
+        accept_language(result['language'], self.whisper_language)
+        return result
+
+    def align(self, result: Dict, vocal_audio_file: str, start: float, end: float) -> Dict:
+        """Align the first-pass result on the vocal track and shift it to the timeline of the whole file"""
+        if self.align_workers and len(result["segments"]) > 1:
+            result = self._align_parallel(result, vocal_audio_file, start, end)
+        else:
+            vocal_audio_segment = load_audio_segment(vocal_audio_file, start, end)
+            model_a, metadata = self.load_align_model(result["language"])
+            result = whisperx.align(result["segments"], model_a, metadata, vocal_audio_segment, self.device, return_char_alignments=False)
 
         # Adjust timestamps
         for segment in result['segments']:
@@ -128,6 +308,59 @@ def transcribe_audio(raw_audio_file: str, vocal_audio_file: str, start: float, e
                 if 'end' in word:
                     word['end'] += start
         return result
-    except Exception as e:
-        rprint(f"[red]WhisperX processing error:[/red] {e}")
-        raise
\ No newline at end of file
+
+    def transcribe(self, raw_audio_file: str, vocal_audio_file: str, start: float, end: float) -> Dict:
+        try:
+            return self.align(self.asr(raw_audio_file, start, end), vocal_audio_file, start, end)
+        except Exception as e:
+            rprint(f"[red]WhisperX processing error:[/red] {e}")
+            raise
+
+def transcribe_audio(raw_audio_file: str, vocal_audio_file: str, start: float, end: float) -> Dict:
+    """One-off transcription of a single segment, prefer WhisperXTranscriber for several segments"""
+    transcriber = WhisperXTranscriber()
+    try:
+        return transcriber.transcribe(raw_audio_file, vocal_audio_file, start, end)
+    finally:
+        transcriber.release()
+
+def benchmark_cpu_profiles(audio_file: str = out("audio/raw.npy"), seconds: float = 120.0, profiles=None,
+                           output_file: str = out("log/cpu_profile_benchmark.json")):
+    """Real-time factor (processing time / audio time) of each CPU profile on the same reference clip"""
+    import json
+    if profiles is None:
+        cores = os.cpu_count() or 1
+        profiles = [
+            {"threads": 4, "batch_size": 1, "beam_size": 5, "compute_type": "int8"},  # previous hard-coded defaults
+            {},  # auto
+            {"threads": cores, "batch_size": 4, "beam_size": 1, "compute_type": "int8"},
+            {"threads": cores, "batch_size": 4, "beam_size": 1, "compute_type": "int8_float32"},
+        ]
+    clip = np.array(load_pcm_segment(audio_file, 0, seconds), dtype=np.float32)
+    duration = len(clip) / 16000
+    # measured once, every auto profile is picked from the same value
+    ram_gb = free_ram_gb()
+    results = []
+    for overrides in profiles:
+        transcriber = WhisperXTranscriber()
+        transcriber.device = "cpu"
+        profile = resolve_cpu_profile(overrides, ram_gb)
+        transcriber.batch_size, transcriber.compute_type = profile["batch_size"], profile["compute_type"]
+        transcriber.threads, transcriber.beam_size = profile["threads"], profile["beam_size"]
+        apply_torch_threads(profile)
+        try:
+            model = transcriber.load_model()
+            start = time.time()
+            model.transcribe(clip, batch_size=transcriber.batch_size)
+            rtf = (time.time() - start) / duration
+        finally:
+            transcriber.release()
+        results.append({**profile, "rtf": rtf})
+        rprint(f"[cyan]⏱️ {profile}[/cyan] → RTF {rtf:.3f}")
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"audio_seconds": duration, "cpu_count": os.cpu_count(), "free_ram_gb": ram_gb, "results": results}, f, indent=4)
+    return results
+
+if __name__ == "__main__":
+    benchmark_cpu_profiles()
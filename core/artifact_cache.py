@@ -0,0 +1,133 @@
+import os, sys, json, time, shutil, hashlib, threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from typing import Dict, Optional
+import numpy as np
+from rich import print as rprint
+from core.config_utils import load_key
+
+# Cross-job cache for outputs that only depend on the audio and the model settings (separated vocals,
+# transcription). Entries live outside `output/` so they survive onekeycleanup, are addressed by a hash of
+# the decoded PCM plus the parameters, and the least recently used ones are evicted past the size limit.
+#
+#   <dir>/<kind>/<key>/meta.json   parameters, extra values and last use
+#   <dir>/<kind>/<key>/<files>     copies of the cached outputs
+
+META_FILE = "meta.json"
+HASH_BLOCK = 16 * 1024 * 1024
+# Entries used this recently are never evicted, another job may be restoring them right now
+EVICT_GRACE_SECONDS = 300
+
+_fingerprints: Dict[tuple, str] = {}
+_fingerprint_lock = threading.Lock()
+
+def _settings():
+    settings = load_key("artifact_cache")
+    return settings["dir"], int(settings["max_size_gb"] * 1024 ** 3)
+
+def enabled() -> bool:
+    return _settings()[1] > 0
+
+def audio_fingerprint(pcm_file: str) -> str:
+    """sha1 of the decoded samples, so the same audio hits whatever file or job it came from"""
+    stat = os.stat(pcm_file)
+    key = (os.path.abspath(pcm_file), stat.st_size, stat.st_mtime)
+    with _fingerprint_lock:
+        if key not in _fingerprints:
+            samples = np.load(pcm_file, mmap_mode='r')
+            digest = hashlib.sha1()
+            step = HASH_BLOCK // samples.itemsize
+            for start in range(0, len(samples), step):
+                digest.update(np.ascontiguousarray(samples[start:start + step]))
+            _fingerprints[key] = digest.hexdigest()
+        return _fingerprints[key]
+
+def cache_key(audio_hash: str, params: Dict) -> str:
+    return hashlib.sha1(json.dumps({"audio": audio_hash, "params": params}, sort_keys=True).encode()).hexdigest()
+
+def _entry_dir(kind: str, key: str) -> str:
+    return os.path.join(_settings()[0], kind, key)
+
+def _write_meta(entry: str, meta: Dict):
+    # replaced whole, a concurrent reader never sees half a file
+    tmp_path = os.path.join(entry, f"{META_FILE}.tmp{os.getpid()}.{threading.get_ident()}")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(entry, META_FILE))
+
+def restore(kind: str, key: str, files: Dict[str, str]) -> Optional[Dict]:
+    """Copy a cached entry back to `files` ({name: destination}), returns its extra values or None on a miss"""
+    if not enabled():
+        return None
+    entry = _entry_dir(kind, key)
+    meta_path = os.path.join(entry, META_FILE)
+    if not os.path.exists(meta_path) or not all(os.path.exists(os.path.join(entry, name)) for name in files):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # marked as used before copying, so eviction leaves it alone meanwhile
+        meta["last_used"] = time.time()
+        _write_meta(entry, meta)
+        for name, dest in files.items():
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            shutil.copy2(os.path.join(entry, name), dest)
+    except (OSError, ValueError):
+        # evicted or replaced by another job while we read it, a miss then
+        for dest in files.values():
+            if os.path.exists(dest):
+                os.remove(dest)
+        return None
+    rprint(f"[green]♻️ Restored {kind} outputs from the artifact cache ({key[:12]})[/green]")
+    return meta.get("extra", {})
+
+def store(kind: str, key: str, files: Dict[str, str], params: Dict = None, extra: Dict = None):
+    """Copy `files` ({name: source}) into the cache, then evict old entries past the size limit"""
+    if not enabled():
+        return
+    entry = _entry_dir(kind, key)
+    tmp_entry = f"{entry}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+    for name, src in files.items():
+        shutil.copy2(src, os.path.join(tmp_entry, name))
+    with open(os.path.join(tmp_entry, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"params": params or {}, "extra": extra or {}, "created": time.time(), "last_used": time.time()},
+                  f, indent=4, ensure_ascii=False)
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        # another job stored the same key first, its entry is as good as ours
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    evict()
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def evict(max_bytes: int = None):
+    """Remove least recently used entries until the cache fits in `max_bytes`, entries used within
+    EVICT_GRACE_SECONDS stay even past the limit"""
+    cache_dir, limit = _settings()
+    limit = limit if max_bytes is None else max_bytes
+    entries = []
+    for kind in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        kind_dir = os.path.join(cache_dir, kind)
+        for key in os.listdir(kind_dir):
+            entry = os.path.join(kind_dir, key)
+            meta_path = os.path.join(entry, META_FILE)
+            if not os.path.exists(meta_path):
+                continue  # unfinished store from another process
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    last_used = json.load(f).get("last_used", 0)
+                entries.append((last_used, _dir_size(entry), entry))
+            except (OSError, ValueError):
+                continue  # evicted by another process meanwhile
+
+    total = sum(size for _, size, _ in entries)
+    recent = time.time() - EVICT_GRACE_SECONDS
+    for last_used, size, entry in sorted(entries):
+        if total <= limit or last_used > recent:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        rprint(f"[yellow]🧹 Evicted {entry} from the artifact cache[/yellow]")
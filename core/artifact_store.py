@@ -0,0 +1,116 @@
+import os, sys, ast, glob
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.workspace import out
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rich import print as rprint
+
+# Stage-to-stage tables are Parquet files with a typed schema per artifact, list columns are stored
+# natively (no more str() on write and eval() on read) and files are read through a memory map.
+# `export_xlsx` writes an Excel copy for human editing, and an .xlsx that is newer than its .parquet
+# is imported back on the next read, so hand edits still flow into the pipeline.
+
+_SUBTITLE_PAIR = {"Source": pa.string(), "Translation": pa.string()}
+
+# Keyed by file stem, declared columns are cast to these types and any other column keeps the type Arrow infers
+SCHEMAS = {
+    "cleaned_chunks": {"text": pa.string(), "start": pa.float64(), "end": pa.float64(), "speaker_id": pa.string()},
+    "translation_results": {**_SUBTITLE_PAIR, "timestamp": pa.string(), "duration": pa.float64()},
+    "translation_results_for_subtitles": _SUBTITLE_PAIR,
+    "translation_results_remerged": _SUBTITLE_PAIR,
+    "tts_tasks": {
+        "number": pa.int64(), "start_time": pa.string(), "end_time": pa.string(), "duration": pa.float64(),
+        "text": pa.string(), "origin": pa.string(),
+        "lines": pa.list_(pa.string()), "src_lines": pa.list_(pa.string()),
+        "new_sub_times": pa.list_(pa.list_(pa.float64())),
+    },
+}
+
+def schema_for(path: str) -> dict:
+    return SCHEMAS.get(os.path.splitext(os.path.basename(path))[0], {})
+
+def xlsx_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".xlsx"
+
+def _list_columns(path: str) -> list:
+    return [name for name, dtype in schema_for(path).items() if pa.types.is_list(dtype)]
+
+def write_artifact(df: pd.DataFrame, path: str):
+    """Write `df` as the Parquet artifact at `path`, cast to its declared schema"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name, dtype in schema_for(path).items():
+        if name in table.column_names:
+            index = table.column_names.index(name)
+            table = table.set_column(index, pa.field(name, dtype), table.column(index).cast(dtype))
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def sync_xlsx(path: str):
+    """Import the Excel copy of `path` if it was edited after the artifact was written"""
+    xlsx = xlsx_path(path)
+    if os.path.exists(xlsx) and (not os.path.exists(path) or os.path.getmtime(xlsx) > os.path.getmtime(path)):
+        import_xlsx(xlsx, path)
+
+def read_artifact(path: str) -> pd.DataFrame:
+    """Read the artifact at `path`, memory-mapped, with list columns as plain Python lists"""
+    sync_xlsx(path)
+    table = pq.read_table(path, memory_map=True)
+    df = table.to_pandas()
+    for name in _list_columns(path):
+        if name in table.column_names:
+            df[name] = table.column(name).to_pylist()
+    return df
+
+def artifact_exists(path: str) -> bool:
+    return os.path.exists(path) or os.path.exists(xlsx_path(path))
+
+def remove_artifact(path: str):
+    for file in (path, xlsx_path(path)):
+        if os.path.exists(file):
+            os.remove(file)
+
+def _parse_list(value):
+    """Excel stores lists as their repr, literal_eval only accepts literals so nothing gets executed"""
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return value
+
+def import_xlsx(xlsx: str, path: str = None):
+    """Bring a hand-edited Excel copy back into the artifact store"""
+    path = path or os.path.splitext(xlsx)[0] + ".parquet"
+    df = pd.read_excel(xlsx)
+    for name in _list_columns(path):
+        if name in df.columns:
+            df[name] = df[name].map(_parse_list)
+    write_artifact(df, path)
+    # keep the Excel copy from looking newer than what it was imported into
+    mtime = os.path.getmtime(path)
+    os.utime(xlsx, (mtime, mtime))
+    rprint(f"[blue]📥 Imported edited {xlsx} into {path}[/blue]")
+
+def export_xlsx(path: str) -> str:
+    """Write an Excel copy of an artifact for human editing, edits are picked up on the next read"""
+    xlsx = xlsx_path(path)
+    read_artifact(path).to_excel(xlsx, index=False)
+    # an untouched export must not count as an edit
+    mtime = os.path.getmtime(path)
+    os.utime(xlsx, (mtime, mtime))
+    rprint(f"[green]📤 Exported {path} to {xlsx}[/green]")
+    return xlsx
+
+def export_all(output_dir: str = out()):
+    for path in glob.glob(os.path.join(output_dir, "**", "*.parquet"), recursive=True):
+        export_xlsx(path)
+
+if __name__ == "__main__":
+    # python core/artifact_store.py [artifact.parquet ...], exports every artifact under output/ by default
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            export_xlsx(arg)
+    else:
+        export_all()
@@ -7,8 +7,9 @@ from openai import OpenAI
 import time
 from requests.exceptions import RequestException
 from core.config_utils import load_key
+from core.workspace import out
 
-LOG_FOLDER = 'output/gpt_log'
+LOG_FOLDER = out('gpt_log')
 LOCK = Lock()
 
 def save_log(model, prompt, response, log_title = 'default', message = None):
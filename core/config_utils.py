@@ -1,6 +1,6 @@
 from ruamel.yaml import YAML
 from typing import Any
-import os, sys
+import os, sys, json
 import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -8,13 +8,50 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 CONFIG_PATH = 'config.yaml'
 config_lock = threading.Lock()
 
+# A batch job reads config.yaml through its own overrides file (the task's languages, the language detected
+# on the way), so jobs running side by side neither see nor overwrite each other's settings.
+# Like the workspace it is set per process through an environment variable and inherited by step workers.
+JOB_CONFIG_ENV = "VIDEOLINGO_JOB_CONFIG"
+
 yaml = YAML()
 yaml.preserve_quotes = True
 
+def _load_job_overrides() -> dict:
+    path = os.environ.get(JOB_CONFIG_ENV)
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _save_job_overrides(overrides: dict):
+    path = os.environ[JOB_CONFIG_ENV]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump(overrides, file, indent=4, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def set_job_config(path: str, overrides: dict = None):
+    """Route this process's (and its children's) config updates to `path`, merged with `overrides`"""
+    os.environ[JOB_CONFIG_ENV] = path
+    with config_lock:
+        _save_job_overrides({**_load_job_overrides(), **(overrides or {})})
+
+def _set_nested(data, key: str, value: Any):
+    keys = key.split('.')
+    current = data
+    for k in keys[:-1]:
+        if not (isinstance(current, dict) and k in current):
+            return
+        current = current[k]
+    if isinstance(current, dict) and keys[-1] in current:
+        current[keys[-1]] = value
+
 def load_key(key: str) -> Any:
     with config_lock:
         with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
             data = yaml.load(file)
+        for override_key, override_value in _load_job_overrides().items():
+            _set_nested(data, override_key, override_value)
 
     keys = key.split('.')
     value = data
@@ -39,6 +76,10 @@ def update_key(key: str, new_value: Any) -> bool:
                 return False
 
         if isinstance(current, dict) and keys[-1] in current:
+            if os.environ.get(JOB_CONFIG_ENV):
+                # keep the shared config.yaml untouched while running as a batch job
+                _save_job_overrides({**_load_job_overrides(), key: new_value})
+                return True
             current[keys[-1]] = new_value
             with open(CONFIG_PATH, 'w', encoding='utf-8') as file:
                 yaml.dump(data, file)
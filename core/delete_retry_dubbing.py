@@ -1,11 +1,12 @@
 import os, sys
 import shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.workspace import out
 
 def delete_dubbing_files():
     files_to_delete = [
-        os.path.join("output", "dub.wav"),
-        os.path.join("output", "output_dub.mp4")
+        os.path.join(out(), "dub.wav"),
+        os.path.join(out(), "output_dub.mp4")
     ]
     
     for file_path in files_to_delete:
@@ -18,7 +19,7 @@ def delete_dubbing_files():
         else:
             print(f"File not found: {file_path}")
     
-    segs_folder = os.path.join("output", "audio", "segs")
+    segs_folder = os.path.join(out(), "audio", "segs")
     if os.path.exists(segs_folder):
         try:
             shutil.rmtree(segs_folder)
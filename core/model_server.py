@@ -0,0 +1,166 @@
+import os, sys, json, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gc
+import secrets
+import threading
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from typing import Dict
+from rich import print as rprint
+from core.config_utils import load_key
+
+# One long-lived process owning the WhisperX ASR / alignment models and htdemucs for a whole batch, so a
+# short video does not pay for loading them again. Jobs reach it over a local socket (a named pipe on
+# Windows) whose address the batch runner exports, and send file paths, never audio.
+# ASR and alignment share one lock, separation has its own, so a job can still separate while another
+# one transcribes. Models are dropped when the transcription language changes or memory runs low.
+
+MODEL_SERVER_ENV = "VIDEOLINGO_MODEL_SERVER"
+
+def available() -> bool:
+    return bool(os.environ.get(MODEL_SERVER_ENV))
+
+def request(op: str, **kwargs):
+    """Run `op` in the model server and return its result, file paths in `kwargs` must be absolute"""
+    endpoint = json.loads(os.environ[MODEL_SERVER_ENV])
+    with Client(endpoint["address"], authkey=bytes.fromhex(endpoint["authkey"])) as conn:
+        conn.send((op, kwargs))
+        status, value = conn.recv()
+    if status == "error":
+        raise RuntimeError(f"Model server {op} failed: {value}")
+    return value
+
+class RemoteTranscriber:
+    """WhisperXTranscriber backed by the model server, release() leaves its models loaded for the next job"""
+
+    def __init__(self):
+        self.whisper_language = load_key("whisper.language")
+
+    def asr(self, raw_audio_file: str, start: float, end: float) -> Dict:
+        from core.all_whisper_methods.whisperX_local import accept_language
+        result = request("asr", whisper_language=self.whisper_language, audio_file=os.path.abspath(raw_audio_file), start=start, end=end)
+        # the detected language belongs to this job's config, not the server's
+        accept_language(result['language'], self.whisper_language)
+        return result
+
+    def align(self, result: Dict, vocal_audio_file: str, start: float, end: float) -> Dict:
+        return request("align", whisper_language=self.whisper_language, result=result,
+                       audio_file=os.path.abspath(vocal_audio_file), start=start, end=end)
+
+    def transcribe(self, raw_audio_file: str, vocal_audio_file: str, start: float, end: float) -> Dict:
+        return self.align(self.asr(raw_audio_file, start, end), vocal_audio_file, start, end)
+
+    def release(self):
+        pass
+
+class ModelHost:
+    """The models of the server process, each kind behind its own lock"""
+
+    def __init__(self):
+        self.transcriber = None
+        self.separators = {}
+        self.transcriber_lock = threading.Lock()
+        self.separation_lock = threading.Lock()
+        self.min_free_gb = load_key("model_server.min_free_memory_gb")
+
+    def _transcriber(self, whisper_language: str):
+        from core.all_whisper_methods.whisperX_local import WhisperXTranscriber
+        if self.transcriber is not None and self.transcriber.whisper_language != whisper_language:
+            rprint(f"[yellow]♻️ Transcription language changed to {whisper_language}, reloading WhisperX[/yellow]")
+            self.transcriber.release()
+            self.transcriber = None
+        if self.transcriber is None:
+            self.transcriber = WhisperXTranscriber(whisper_language)
+        return self.transcriber
+
+    def asr(self, whisper_language: str, audio_file: str, start: float, end: float) -> Dict:
+        with self.transcriber_lock:
+            result = self._transcriber(whisper_language).first_pass(audio_file, start, end)
+            self._relieve_memory(self.transcriber.release, "WhisperX")
+        return result
+
+    def align(self, whisper_language: str, result: Dict, audio_file: str, start: float, end: float) -> Dict:
+        with self.transcriber_lock:
+            aligned = self._transcriber(whisper_language).align(result, audio_file, start, end)
+            self._relieve_memory(self.transcriber.release, "WhisperX")
+        return aligned
+
+    def separate(self, tier: str, raw_file: str, output_file: str, chunk_seconds: float, chunk_overlap: float):
+        from core.all_whisper_methods.demucs_vl import load_separator, separate_vocals_chunked
+        from core.all_whisper_methods.pcm_cache import load_pcm
+        with self.separation_lock:
+            if tier not in self.separators:
+                self.separators[tier] = load_separator(tier)
+            separate_vocals_chunked(self.separators[tier], load_pcm(raw_file), output_file, chunk_seconds, chunk_overlap)
+            self._relieve_memory(self.separators.clear, "Demucs")
+
+    def _under_pressure(self) -> bool:
+        from core.all_whisper_methods.whisperX_local import free_ram_gb
+        import torch
+        free_ram = free_ram_gb()
+        # 0 means the platform does not tell, keep the models then
+        if free_ram and free_ram < self.min_free_gb:
+            return True
+        return torch.cuda.is_available() and torch.cuda.mem_get_info()[0] / (1024**3) < self.min_free_gb
+
+    def _relieve_memory(self, release, name: str):
+        if self._under_pressure():
+            rprint(f"[yellow]🧹 Less than {self.min_free_gb} GB memory left, unloading {name} models[/yellow]")
+            release()
+            gc.collect()
+            import torch
+            torch.cuda.empty_cache()
+
+    def handle(self, conn, op: str, kwargs: Dict):
+        began = time.time()
+        try:
+            conn.send(("ok", getattr(self, op)(**kwargs)))
+            rprint(f"[green]🧠 Model server {op} done in {time.time() - began:.1f}s[/green]")
+        except Exception as e:
+            rprint(f"[red]❌ Model server {op} failed: {e}[/red]")
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+
+def _serve(authkey: bytes, ready):
+    settings = load_key("demucs_settings")
+    if settings["cpu_threads"] > 0:
+        import torch
+        torch.set_num_threads(settings["cpu_threads"])
+    host = ModelHost()
+    listener = Listener(authkey=authkey, backlog=16)
+    ready.send(listener.address)
+    rprint(f"[cyan]🧠 Model server listening on {listener.address}[/cyan]")
+    while True:
+        try:
+            conn = listener.accept()
+            op, kwargs = conn.recv()
+        except (EOFError, OSError, multiprocessing.AuthenticationError):
+            continue
+        if op == "shutdown":
+            conn.send(("ok", None))
+            conn.close()
+            break
+        if op not in ("asr", "align", "separate"):
+            conn.send(("error", f"Unknown request {op}"))
+            conn.close()
+            continue
+        threading.Thread(target=host.handle, args=(conn, op, kwargs), daemon=True).start()
+    listener.close()
+
+def start_model_server() -> multiprocessing.Process:
+    """Start the server and export its address, processes started afterwards send their model work to it"""
+    authkey = secrets.token_bytes(16)
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_serve, args=(authkey, sender), name="model-server")
+    process.start()
+    address = receiver.recv()
+    os.environ[MODEL_SERVER_ENV] = json.dumps({"address": address, "authkey": authkey.hex()})
+    return process
+
+def stop_model_server(process: multiprocessing.Process):
+    if available():
+        request("shutdown")
+        del os.environ[MODEL_SERVER_ENV]
+    process.join()
@@ -2,12 +2,13 @@ import os, sys
 import glob
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.step1_ytdlp import find_video_files
+from core.workspace import out
 import shutil
 
 def cleanup(history_dir="history"):
     # Get video file name
     video_file = find_video_files()
-    video_name = video_file.split("/")[1]
+    video_name = os.path.basename(video_file)
     video_name = os.path.splitext(video_name)[0]
     video_name = sanitize_filename(video_name)
     
@@ -20,23 +21,23 @@ def cleanup(history_dir="history"):
     os.makedirs(gpt_log_dir, exist_ok=True)
 
     # Move non-log files
-    for file in glob.glob("output/*"):
+    for file in glob.glob(out("*")):
         if not file.endswith(('log', 'gpt_log')):
             move_file(file, video_history_dir)
 
     # Move log files
-    for file in glob.glob("output/log/*"):
+    for file in glob.glob(out("log/*")):
         move_file(file, log_dir)
 
     # Move gpt_log files
-    for file in glob.glob("output/gpt_log/*"):
+    for file in glob.glob(out("gpt_log/*")):
         move_file(file, gpt_log_dir)
 
     # Delete empty output directories
     try:
-        os.rmdir("output/log")
-        os.rmdir("output/gpt_log")
-        os.rmdir("output")
+        os.rmdir(out("log"))
+        os.rmdir(out("gpt_log"))
+        os.rmdir(out())
     except OSError:
         pass  # Ignore errors when deleting directories
 
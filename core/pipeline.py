@@ -0,0 +1,408 @@
+import os, sys, json, time, shutil, hashlib, importlib, threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from typing import Callable, Dict, List, Optional
+from rich import print as rprint
+from core.config_utils import load_key
+from core.workspace import out
+from core.artifact_store import sync_xlsx
+
+# Every pipeline step declares the files it reads, the files it writes and the config keys it depends on.
+# After a step succeeds its fingerprint (hashes of its inputs and config values) and the hashes of its
+# outputs go into a manifest, and a step only runs again when its fingerprint changes or an output is gone.
+# Inputs produced by an earlier step are fingerprinted with the hash that step recorded, so a step that
+# reruns and produces the same output does not invalidate anything downstream.
+#
+# A few steps update a file in place (tts_tasks.parquet goes through steps 8_1, 8_2 and 10). Before such
+# a step runs, the version it received is kept as a snapshot, a rerun starts again from that snapshot.
+
+MANIFEST_FILE = out("log/step_manifest.json")
+SNAPSHOT_DIR = out("log/step_snapshots")
+HASH_BLOCK = 16 * 1024 * 1024
+
+# Steps started by the scheduler check and record concurrently
+_manifest_lock = threading.RLock()
+
+# Stands for the video in output/, whatever its name
+VIDEO_INPUT = "<video>"
+
+# Settings that only decide how a provider is reached, changing them must not redo any work
+_CREDENTIAL_KEYS = ("api_key", "key", "base_url", "302_api", "whisperX_302_api_key", "elevenlabs_api_key")
+
+def _tts_settings():
+    """Settings section of the selected TTS method without its credentials"""
+    try:
+        section = load_key(load_key("tts_method"))
+    except KeyError:
+        # custom_tts has no section, its name in tts_method is all there is to fingerprint
+        return None
+    if not isinstance(section, dict):
+        return section
+    return {k: v for k, v in section.items() if k not in _CREDENTIAL_KEYS}
+
+LANGUAGE = ["whisper.language", "whisper.detected_language"]
+
+# What a step mostly waits on, the scheduler limits how many steps of each kind run at once:
+# light local work, heavy local models (Demucs, WhisperX), LLM requests, TTS requests and ffmpeg encoding
+CPU, COMPUTE, LLM, TTS, ENCODE = "cpu", "compute", "llm", "tts", "encode"
+RESOURCES = [CPU, COMPUTE, LLM, TTS, ENCODE]
+
+def _step(name: str, func: str, inputs: List[str], outputs: List[str], config: List, resource: str) -> Dict:
+    return {"name": name, "func": func, "inputs": inputs, "outputs": outputs, "config": config, "resource": resource}
+
+STEPS = [
+    _step("transcribe", "core.step2_whisperX:transcribe",
+          [VIDEO_INPUT], [out("log/cleaned_chunks.parquet"), out("audio/raw.npy")],
+          ["whisper.runtime", "whisper.model", "whisper.language", "whisper.vad_trim", "whisper.local_segment_minutes", "demucs",
+           "demucs_settings.chunk_seconds", "demucs_settings.chunk_overlap"], COMPUTE),
+    _step("split_by_spacy", "core.step3_1_spacy_split:split_by_spacy",
+          [out("log/cleaned_chunks.parquet")], [out("log/sentence_splitbynlp.txt")],
+          LANGUAGE + ["spacy_model_map"], CPU),
+    _step("split_by_meaning", "core.step3_2_splitbymeaning:split_sentences_by_meaning",
+          [out("log/sentence_splitbynlp.txt")], [out("log/sentence_splitbymeaning.txt")],
+          LANGUAGE + ["max_split_length", "api.model"], LLM),
+    _step("summarize", "core.step4_1_summarize:get_summary",
+          [out("log/sentence_splitbynlp.txt"), "custom_terms.xlsx"], [out("log/terminology.json")],
+          ["summary_length", "target_language", "api.model"], LLM),
+    _step("translate", "core.step4_2_translate_all:translate_all",
+          [out("log/sentence_splitbymeaning.txt"), out("log/terminology.json"), out("log/cleaned_chunks.parquet")],
+          [out("log/translation_results.parquet")],
+          ["target_language", "reflect_translate", "min_trim_duration", "api.model"], LLM),
+    _step("split_for_sub", "core.step5_splitforsub:split_for_sub_main",
+          [out("log/translation_results.parquet")],
+          [out("log/translation_results_for_subtitles.parquet"), out("log/translation_results_remerged.parquet")],
+          LANGUAGE + ["subtitle", "target_language", "api.model"], LLM),
+    _step("align_timestamp", "core.step6_generate_final_timeline:align_timestamp_main",
+          [out("log/cleaned_chunks.parquet"), out("log/translation_results_for_subtitles.parquet"),
+           out("log/translation_results_remerged.parquet")],
+          [out("src.srt"), out("trans.srt"), out("src_trans.srt"), out("trans_src.srt"),
+           out("audio/src_subs_for_audio.srt"), out("audio/trans_subs_for_audio.srt")],
+          [], CPU),
+    _step("merge_sub_to_vid", "core.step7_merge_sub_to_vid:merge_subtitles_to_video",
+          [VIDEO_INPUT, out("src.srt"), out("trans.srt")], [out("output_sub.mp4")],
+          ["burn_subtitles"], ENCODE),
+    # only needs the decoded audio, runs while the text steps wait on the LLM
+    _step("separate_vocals", "core.all_whisper_methods.demucs_vl:demucs_main",
+          [out("audio/raw.npy")], [out("audio/vocal.npy")],
+          ["demucs", "demucs_settings.chunk_seconds", "demucs_settings.chunk_overlap"], COMPUTE),
+    _step("gen_audio_task", "core.step8_1_gen_audio_task:gen_audio_task_main",
+          [out("audio/src_subs_for_audio.srt"), out("audio/trans_subs_for_audio.srt")],
+          [out("audio/tts_tasks.parquet")],
+          ["tts_method", "speed_factor", "min_subtitle_duration", "target_language", "api.model"], LLM),
+    _step("gen_dub_chunks", "core.step8_2_gen_dub_chunks:gen_dub_chunks",
+          [out("audio/raw.npy"), out("audio/tts_tasks.parquet"), out("src.srt"), out("trans.srt")],
+          [out("audio/tts_tasks.parquet")],
+          ["tts_method", "speed_factor", "tolerance"], CPU),
+    _step("extract_refer_audio", "core.step9_extract_refer_audio:extract_refer_audio_main",
+          [out("audio/vocal.npy"), out("audio/tts_tasks.parquet")], [out("audio/refers")],
+          [], CPU),
+    _step("gen_audio", "core.step10_gen_audio:gen_audio",
+          [out("audio/tts_tasks.parquet"), out("audio/refers")],
+          [out("audio/segs"), out("audio/tmp"), out("audio/tts_tasks.parquet")],
+          ["tts_method", _tts_settings, "speed_factor"], TTS),
+    _step("merge_full_audio", "core.step11_merge_full_audio:merge_full_audio",
+          [out("audio/tts_tasks.parquet"), out("audio/segs")], [out("dub.mp3"), out("dub.srt")],
+          [], ENCODE),
+    _step("merge_dub_to_vid", "core.step12_merge_dub_to_vid:merge_video_audio",
+          [VIDEO_INPUT, out("audio/vocal.npy"), out("dub.mp3"), out("dub.srt")], [out("output_dub.mp4")],
+          ["burn_subtitles"], ENCODE),
+]
+
+TEXT_STEPS = ["transcribe", "split_by_spacy", "split_by_meaning", "summarize", "translate",
+              "split_for_sub", "align_timestamp", "merge_sub_to_vid"]
+DUBBING_STEPS = ["separate_vocals", "gen_audio_task", "gen_dub_chunks", "extract_refer_audio", "gen_audio",
+                 "merge_full_audio", "merge_dub_to_vid"]
+
+STEP_INDEX = {step["name"]: i for i, step in enumerate(STEPS)}
+
+def get_step(name: str) -> Dict:
+    return STEPS[STEP_INDEX[name]]
+
+def producer_of(name: str, path: str) -> Optional[str]:
+    """The last step before `name` that writes `path`, None for files coming from outside the pipeline"""
+    for step in reversed(STEPS[:STEP_INDEX[name]]):
+        if path in step["outputs"]:
+            return step["name"]
+    return None
+
+def in_place_files(step: Dict) -> List[str]:
+    return [path for path in step["outputs"] if path in step["inputs"]]
+
+def _written_later(name: str, path: str) -> bool:
+    return any(path in step["outputs"] for step in STEPS[STEP_INDEX[name] + 1:])
+
+# ------------
+# Hashing
+# ------------
+
+def _load_manifest() -> Dict:
+    if not os.path.exists(MANIFEST_FILE):
+        return {"files": {}, "steps": {}}
+    with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_manifest(manifest: Dict):
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    tmp_file = MANIFEST_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+def _hash_file(path: str, manifest: Dict) -> str:
+    """sha1 of a file, remembered by size and mtime so unchanged files are not read again"""
+    stat = os.stat(path)
+    cached = manifest["files"].get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["sha1"]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    manifest["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest.hexdigest()}
+    return digest.hexdigest()
+
+def hash_path(path: str, manifest: Dict) -> Optional[str]:
+    """Content hash of a file or a whole directory, None when it does not exist"""
+    if path.endswith(".parquet"):
+        sync_xlsx(path)
+    if os.path.isdir(path):
+        digest = hashlib.sha1()
+        for root, _, names in sorted(os.walk(path)):
+            for file_name in sorted(names):
+                file = os.path.join(root, file_name)
+                digest.update(f"{os.path.relpath(file, path)}:{_hash_file(file, manifest)}\n".encode())
+        return digest.hexdigest()
+    if not os.path.exists(path):
+        return None
+    return _hash_file(path, manifest)
+
+def _resolve(path: str) -> str:
+    if path == VIDEO_INPUT:
+        from core.step1_ytdlp import find_video_files
+        return find_video_files()
+    return path
+
+def _config_value(key) -> str:
+    value = key() if callable(key) else load_key(key)
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+def _config_name(key) -> str:
+    return key.__name__.lstrip('_') if callable(key) else key
+
+def step_inputs(step: Dict, manifest: Dict) -> Dict[str, Optional[str]]:
+    """Hash of every input, files from an earlier step count with the hash that step recorded"""
+    hashes = {}
+    for path in step["inputs"]:
+        producer = producer_of(step["name"], path)
+        if producer:
+            hashes[path] = manifest["steps"].get(producer, {}).get("outputs", {}).get(path)
+        else:
+            hashes[path] = hash_path(_resolve(path), manifest)
+    return hashes
+
+def step_fingerprint(step: Dict, manifest: Dict) -> Dict:
+    return {
+        "inputs": step_inputs(step, manifest),
+        "config": {_config_name(key): _config_value(key) for key in step["config"]},
+    }
+
+def _changes(old: Dict, new: Dict) -> List[str]:
+    changed = [f"input {path}" for path, value in new["inputs"].items() if old.get("inputs", {}).get(path) != value]
+    changed += [f"config {key}" for key, value in new["config"].items() if old.get("config", {}).get(key) != value]
+    return changed
+
+# ------------
+# Freshness
+# ------------
+
+def _outputs_present(step: Dict) -> bool:
+    return all(os.path.exists(path) for path in step["outputs"])
+
+def _adoptable(step: Dict) -> bool:
+    """Outputs from before the manifest existed can be trusted when nothing rewrites them afterwards"""
+    return not in_place_files(step) and not any(_written_later(step["name"], path) for path in step["outputs"])
+
+def check_step(name: str, manifest: Dict = None) -> List[str]:
+    """Why `name` has to run, an empty list when it is up to date"""
+    manifest = manifest if manifest is not None else _load_manifest()
+    step = get_step(name)
+    # e.g. terminology.json edited during pause_before_translate
+    for producer in {producer_of(name, path) for path in step["inputs"]} - {None}:
+        if producer in manifest["steps"]:
+            _pick_up_edits(get_step(producer), manifest)
+    record = manifest["steps"].get(name)
+    if record is None:
+        if _outputs_present(step) and _adoptable(step):
+            return []
+        return ["never ran"]
+    missing = [path for path in step["outputs"] if not os.path.exists(path)]
+    if missing:
+        return [f"missing {path}" for path in missing]
+    # a rerun of the producer overwrites what this step added to the file
+    overwritten = []
+    for path in in_place_files(step):
+        versions = [record["outputs"].get(path)] + [manifest["steps"].get(later["name"], {}).get("outputs", {}).get(path)
+                                                    for later in STEPS[STEP_INDEX[name] + 1:] if path in later["outputs"]]
+        if hash_path(path, manifest) not in versions:
+            overwritten.append(f"overwritten {path}")
+    return overwritten + _changes(record["fingerprint"], step_fingerprint(step, manifest))
+
+def _record(step: Dict, manifest: Dict, fingerprint: Dict, duration: float = None):
+    record = {
+        "fingerprint": fingerprint,
+        "outputs": {path: hash_path(path, manifest) for path in step["outputs"]},
+        "finished": time.time(),
+    }
+    if duration is not None:
+        record["duration"] = round(duration, 2)
+    manifest["steps"][step["name"]] = record
+    _save_manifest(manifest)
+
+def _pick_up_edits(step: Dict, manifest: Dict):
+    """Outputs edited by hand since the step ran become the version downstream steps are fingerprinted with"""
+    record = manifest["steps"][step["name"]]
+    for path in step["outputs"]:
+        if _written_later(step["name"], path) or path in step["inputs"] or not os.path.exists(path):
+            continue
+        current = hash_path(path, manifest)
+        if current != record["outputs"].get(path):
+            record["outputs"][path] = current
+            _save_manifest(manifest)
+            rprint(f"[blue]📝 Picked up edits to {path}[/blue]")
+
+# ------------
+# Running
+# ------------
+
+def _snapshot_path(name: str, path: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, name, os.path.basename(path))
+
+def _restore_in_place_inputs(step: Dict, manifest: Dict) -> Optional[str]:
+    """Bring files the step rewrites back to the version their producer made,
+    returns the producer to run again when that version is gone"""
+    for path in in_place_files(step):
+        producer = producer_of(step["name"], path)
+        expected = manifest["steps"].get(producer, {}).get("outputs", {}).get(path)
+        snapshot = _snapshot_path(step["name"], path)
+        if expected and os.path.exists(path) and hash_path(path, manifest) == expected:
+            pass
+        elif expected and os.path.exists(snapshot) and hash_path(snapshot, manifest) == expected:
+            shutil.copy2(snapshot, path)
+        else:
+            return producer
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        if not os.path.exists(snapshot) or hash_path(snapshot, manifest) != expected:
+            shutil.copy2(path, snapshot)
+    return None
+
+def _remove_outputs(step: Dict):
+    """Clear stale outputs so the step's own `already exists` checks do not skip the work"""
+    for path in step["outputs"]:
+        if path in step["inputs"]:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def _load_func(step: Dict) -> Callable:
+    module_name, func_name = step["func"].split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+class ProducerRerunNeeded(Exception):
+    """An in-place input can no longer be restored, `producer` has to run again first"""
+    def __init__(self, name: str, producer: str):
+        super().__init__(f"{name} needs {producer} to run again first")
+        self.producer = producer
+
+# Called with (name, status, seconds=None, error=None) whenever a step is skipped, starts running, is done
+# or failed in this process, e.g. the batch job ledger records per-step status this way
+_step_listeners: List[Callable] = []
+
+def add_step_listener(listener: Callable):
+    _step_listeners.append(listener)
+
+def _notify(name: str, status: str, **info):
+    for listener in _step_listeners:
+        listener(name, status, **info)
+
+def prepare_step(name: str, force: bool = False) -> Optional[Dict]:
+    """Decide whether `name` runs. Returns the fingerprint to record once it succeeded, None when it is up to date."""
+    step = get_step(name)
+    with _manifest_lock:
+        manifest = _load_manifest()
+        reasons = ["forced"] if force else check_step(name, manifest)
+        if not reasons:
+            if name not in manifest["steps"]:
+                _record(step, manifest, step_fingerprint(step, manifest))
+                rprint(f"[blue]📌 Recorded existing outputs of {name}[/blue]")
+            rprint(f"[green]⏭️ {name} is up to date, skipping[/green]")
+            _notify(name, "skipped")
+            return None
+
+        missing_producer = _restore_in_place_inputs(step, manifest)
+        if missing_producer:
+            raise ProducerRerunNeeded(name, missing_producer)
+
+        rprint(f"[cyan]🔁 Running {name} ({', '.join(reasons[:3])}{', ...' if len(reasons) > 3 else ''})[/cyan]")
+        fingerprint = step_fingerprint(step, manifest)
+        _save_manifest(manifest)
+        _remove_outputs(step)
+    _notify(name, "running")
+    return fingerprint
+
+def finish_step(name: str, fingerprint: Dict, duration: float):
+    with _manifest_lock:
+        _record(get_step(name), _load_manifest(), fingerprint, duration)
+    _notify(name, "done", seconds=duration)
+
+def fail_step(name: str, error: Exception, duration: float):
+    _notify(name, "error", seconds=duration, error=f"{type(error).__name__}: {error}")
+
+def call_step(name: str):
+    """Run the step function itself, also the entry point of worker processes"""
+    _load_func(get_step(name))()
+
+def run_step(name: str, force: bool = False) -> bool:
+    """Run `name` unless it is up to date, returns whether it ran"""
+    fingerprint = prepare_step(name, force)
+    if fingerprint is None:
+        return False
+    start = time.time()
+    try:
+        call_step(name)
+    except Exception as e:
+        fail_step(name, e, time.time() - start)
+        raise
+    finish_step(name, fingerprint, time.time() - start)
+    return True
+
+def run_steps(names: List[str], force: bool = False):
+    """Run the steps one after another in pipeline order, each one only if its fingerprint changed"""
+    names = sorted(names, key=STEP_INDEX.get)
+    forced = set(names) if force else set()
+    i = 0
+    while i < len(names):
+        try:
+            run_step(names[i], force=names[i] in forced)
+            i += 1
+        except ProducerRerunNeeded as e:
+            if e.producer not in names:
+                raise
+            rprint(f"[yellow]⚠️ The input {names[i]} rewrites is gone, rerunning from {e.producer}[/yellow]")
+            forced.add(e.producer)
+            i = names.index(e.producer)
+
+def pipeline_status() -> Dict[str, List[str]]:
+    """Reasons every step would run, empty when up to date"""
+    manifest = _load_manifest()
+    status = {}
+    for step in STEPS:
+        try:
+            status[step["name"]] = check_step(step["name"], manifest)
+        except Exception as e:
+            status[step["name"]] = [f"unknown ({e})"]
+    return status
+
+if __name__ == "__main__":
+    for name, reasons in pipeline_status().items():
+        print(f"{'✅' if not reasons else '🔁'} {name}: {', '.join(reasons) or 'up to date'}")
@@ -0,0 +1,219 @@
+import os, sys, json, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Set
+from rich import print as rprint
+from core.config_utils import load_key
+from core.workspace import out
+from core.pipeline import STEPS, STEP_INDEX, RESOURCES, get_step, producer_of, \
+    prepare_step, finish_step, fail_step, call_step, run_steps, ProducerRerunNeeded
+from core.workspace import root
+
+# Runs pipeline steps as a dependency graph: a step starts as soon as the steps it depends on are done
+# and a slot of its resource kind is free, so e.g. burning subtitles into the video (encode) overlaps with
+# generating the dub (TTS) and vocal separation (compute) overlaps with translation (LLM).
+# Skip checks and the manifest stay in this process, step functions run in spawned worker processes
+# so their progress bars, models and module state do not collide.
+# In batch mode the slots are shared by all videos in flight, so one video transcribes while another
+# translates and a third encodes, and every step that ran is reported for the utilization summary.
+
+TIMELINE_FILE = out("log/pipeline_timeline.json")
+TIMELINE_WIDTH = 48
+# How often a step waiting for a slot held by another video checks again
+SLOT_POLL_SECONDS = 1.0
+
+# Set by share_resources in a batch job
+_shared_slots = None
+_usage_log = None
+
+def dependencies(name: str) -> Set[str]:
+    """Steps that must finish before `name`: producers of its inputs, and earlier writers
+    and readers of the files it writes"""
+    step = get_step(name)
+    deps = {producer_of(name, path) for path in step["inputs"]} - {None}
+    for earlier in STEPS[:STEP_INDEX[name]]:
+        if any(path in earlier["outputs"] or path in earlier["inputs"] for path in step["outputs"]):
+            deps.add(earlier["name"])
+    return deps
+
+def resource_limits() -> Dict[str, int]:
+    settings = load_key("pipeline")
+    return {resource: max(1, settings[f"{resource}_steps"]) for resource in RESOURCES}
+
+def max_parallel(names: List[str], deps: Dict[str, Set[str]], limits: Dict[str, int]) -> int:
+    """Most steps of `names` that can ever run at once: none depends on another and each kind stays
+    within its limit. Sizes the worker pool, every worker imports the heavy step modules."""
+    ancestors = {}
+    for name in names:
+        ancestors[name] = set().union(*(ancestors[dep] | {dep} for dep in deps[name]))
+    best = 0
+
+    def extend(chosen: List[str], candidates: List[str]):
+        nonlocal best
+        per_resource = {}
+        for name in chosen:
+            resource = get_step(name)["resource"]
+            per_resource[resource] = per_resource.get(resource, 0) + 1
+        best = max(best, sum(min(count, limits[resource]) for resource, count in per_resource.items()))
+        for i, name in enumerate(candidates):
+            extend(chosen + [name], [other for other in candidates[i + 1:]
+                                     if name not in ancestors[other] and other not in ancestors[name]])
+
+    extend([], names)
+    return max(1, best)
+
+def share_resources(slots: Dict, usage_log=None):
+    """Also hold one of `slots[resource]` (semaphores shared with the other jobs of a batch) while a step runs,
+    and append every step that ran to `usage_log`"""
+    global _shared_slots, _usage_log
+    _shared_slots, _usage_log = slots, usage_log
+
+def _acquire(resource: str) -> bool:
+    return _shared_slots is None or _shared_slots[resource].acquire(False)
+
+def _release(resource: str):
+    if _shared_slots is not None:
+        _shared_slots[resource].release()
+
+def save_timeline(timeline: List[Dict]):
+    os.makedirs(os.path.dirname(TIMELINE_FILE), exist_ok=True)
+    with open(TIMELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(timeline, f, indent=4)
+
+def print_timeline(timeline: List[Dict]):
+    """One bar per step over the wall time of the run, overlapping bars ran in parallel"""
+    ran = [entry for entry in timeline if entry["ran"]]
+    if not ran:
+        return
+    total = max(entry["end"] for entry in ran) or 1e-6
+    busy = sum(entry["end"] - entry["start"] for entry in ran)
+    rprint(f"[bold cyan]📊 Pipeline timeline, {total:.0f}s wall time for {busy:.0f}s of steps ({busy / total:.2f}x)[/bold cyan]")
+    for entry in ran:
+        first = int(entry["start"] / total * TIMELINE_WIDTH)
+        last = max(first + 1, int(entry["end"] / total * TIMELINE_WIDTH))
+        bar = " " * first + "█" * (last - first) + " " * (TIMELINE_WIDTH - last)
+        print(f"  {entry['name']:<20} {entry['resource']:<8} |{bar}| {entry['start']:7.1f}s → {entry['end']:7.1f}s")
+
+def utilization_report(usage: List[Dict], limits: Dict[str, int], start: float, end: float) -> Dict[str, Dict]:
+    """Per resource kind over [start, end]: steps run, seconds busy, share of its slots kept busy and
+    share of the time at least one of its steps was running"""
+    wall = max(end - start, 1e-6)
+    report = {}
+    for resource in RESOURCES:
+        spans = sorted((entry["start"], entry["end"]) for entry in usage if entry["resource"] == resource)
+        busy = sum(last - first for first, last in spans)
+        active, covered_to = 0.0, start
+        for first, last in spans:
+            first = max(first, covered_to)
+            if last > first:
+                active += last - first
+                covered_to = last
+        report[resource] = {"slots": limits[resource], "steps": len(spans), "busy_seconds": round(busy, 1),
+                            "slot_utilization": round(busy / (limits[resource] * wall), 3),
+                            "active_share": round(active / wall, 3)}
+    return report
+
+def print_utilization(report: Dict[str, Dict], wall: float):
+    rprint(f"[bold cyan]📊 Resource utilization over {wall:.0f}s[/bold cyan]")
+    for resource, usage in report.items():
+        print(f"  {resource:<8} {usage['slots']} slot(s) {usage['steps']:>4} steps {usage['busy_seconds']:>9.0f}s busy "
+              f"{usage['slot_utilization']:>7.1%} of slots {usage['active_share']:>7.1%} of the time active")
+
+def run_graph(names: List[str], force: bool = False) -> List[Dict]:
+    """Run `names` as a dependency graph under the resource limits, returns the timeline.
+    Dependencies outside `names` are taken as done."""
+    if not load_key("pipeline.parallel"):
+        run_steps(names, force)
+        return []
+
+    names = sorted(names, key=STEP_INDEX.get)
+    deps = {name: dependencies(name) & set(names) for name in names}
+    limits, in_use = resource_limits(), dict.fromkeys(RESOURCES, 0)
+    pending, done, running = list(names), set(), {}
+    timeline, errors = [], []
+    rerun_from = None
+    t0 = time.time()
+
+    executor = ProcessPoolExecutor(max_workers=max_parallel(names, deps, limits), mp_context=multiprocessing.get_context("spawn"))
+    try:
+        while pending or running:
+            # start every ready step a slot is free for, in pipeline order
+            blocked = skipped = False
+            if not errors and rerun_from is None:
+                for name in list(pending):
+                    resource = get_step(name)["resource"]
+                    if not deps[name] <= done or in_use[resource] >= limits[resource]:
+                        continue
+                    if not _acquire(resource):
+                        # every slot of this kind is taken by other videos
+                        blocked = True
+                        continue
+                    pending.remove(name)
+                    try:
+                        fingerprint = prepare_step(name, force)
+                    except ProducerRerunNeeded as e:
+                        _release(resource)
+                        rerun_from = e
+                        break
+                    if fingerprint is None:
+                        _release(resource)
+                        done.add(name)
+                        skipped = True
+                        timeline.append({"name": name, "resource": resource, "ran": False,
+                                         "start": time.time() - t0, "end": time.time() - t0})
+                        continue
+                    in_use[resource] += 1
+                    running[executor.submit(call_step, name)] = (name, fingerprint, time.time())
+                else:
+                    # skipped steps may have made others ready, look again before waiting
+                    if skipped:
+                        continue
+
+            if not running:
+                if blocked:
+                    time.sleep(SLOT_POLL_SECONDS)
+                    continue
+                break
+            finished, _ = wait(running, timeout=SLOT_POLL_SECONDS if blocked else None, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint, start = running.pop(future)
+                resource = get_step(name)["resource"]
+                in_use[resource] -= 1
+                _release(resource)
+                end = time.time()
+                try:
+                    future.result()
+                except Exception as e:
+                    rprint(f"[red]❌ {name} failed: {e}[/red]")
+                    fail_step(name, e, end - start)
+                    errors.append((name, e))
+                    continue
+                finish_step(name, fingerprint, end - start)
+                done.add(name)
+                timeline.append({"name": name, "resource": resource, "ran": True, "start": start - t0, "end": end - t0})
+                if _usage_log is not None:
+                    _usage_log.append({"job": root(), "name": name, "resource": resource, "start": start, "end": end})
+    finally:
+        executor.shutdown(wait=True)
+        for name, _, _ in running.values():
+            _release(get_step(name)["resource"])
+        timeline.sort(key=lambda entry: entry["start"])
+        save_timeline(timeline)
+        print_timeline(timeline)
+
+    if errors:
+        name, error = errors[0]
+        raise RuntimeError(f"{name}: {error}") from error
+    if rerun_from is not None:
+        # rare, an in-place input is gone: finish the remaining steps in order, which reruns its producer
+        rprint(f"[yellow]⚠️ {rerun_from}, continuing one step at a time[/yellow]")
+        run_steps(names, force)
+    elif pending:
+        raise RuntimeError(f"Steps could not be scheduled: {pending}")
+    return timeline
+
+if __name__ == "__main__":
+    from core.pipeline import TEXT_STEPS, DUBBING_STEPS
+    for name in TEXT_STEPS + DUBBING_STEPS:
+        print(f"{name:<20} {get_step(name)['resource']:<8} after {', '.join(sorted(dependencies(name), key=STEP_INDEX.get)) or '-'}")
@@ -3,7 +3,10 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 import itertools
 import os,sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from load_nlp_model import init_nlp
+from core.transcript_spans import load_spans, save_spans, remove_spans, strip_span
+from core.workspace import out
 from rich import print
 
 def is_valid_phrase(phrase):
@@ -27,9 +30,15 @@ def analyze_comma(start, doc, token):
 
     return suitable_for_splitting
 
-def split_by_comma(text, nlp):
+def _span_text(doc, start, end, base):
+    """Stripped text of doc[start:end] and its span in the transcript"""
+    span = doc[start:end]
+    return strip_span(doc.text, span.start_char, span.end_char, base)
+
+def split_by_comma(text, nlp, base=0, return_spans=False):
     doc = nlp(text)
     sentences = []
+    spans = []
     start = 0
     
     for i, token in enumerate(doc):
@@ -37,35 +46,47 @@ def split_by_comma(text, nlp):
             suitable_for_splitting = analyze_comma(start, doc, token)
             
             if suitable_for_splitting :
-                sentences.append(doc[start:token.i].text.strip())
+                sentence, span = _span_text(doc, start, token.i, base)
+                sentences.append(sentence)
+                spans.append(span)
                 print(f"[yellow]✂️  Split at comma: {doc[start:token.i][-4:]},| {doc[token.i + 1:][:4]}[/yellow]")
                 start = token.i + 1
     
     for i, token in enumerate(doc):
         if token.text == ":": # Split at colon
-            sentences.append(doc[start:token.i].text.strip())
+            sentence, span = _span_text(doc, start, token.i, base)
+            sentences.append(sentence)
+            spans.append(span)
             print(f"[yellow]✂️  Split at colon: {doc[start:token.i][-4:]}:| {doc[token.i + 1:][:4]}[/yellow]")
                 
     
-    sentences.append(doc[start:].text.strip())
-    return sentences
+    sentence, span = _span_text(doc, start, len(doc), base)
+    sentences.append(sentence)
+    spans.append(span)
+    return (sentences, spans) if return_spans else sentences
 
 def split_by_comma_main(nlp):
 
-    with open("output/log/sentence_by_mark.txt", "r", encoding="utf-8") as input_file:
+    with open(out("log/sentence_by_mark.txt"), "r", encoding="utf-8") as input_file:
         sentences = input_file.readlines()
+    input_spans = load_spans(out("log/sentence_by_mark.txt"), len(sentences))
 
     all_split_sentences = []
-    for sentence in sentences:
-        split_sentences = split_by_comma(sentence.strip(), nlp)
+    all_spans = []
+    for i, sentence in enumerate(sentences):
+        base = input_spans[i][0] if input_spans else 0
+        split_sentences, spans = split_by_comma(sentence.strip(), nlp, base, return_spans=True)
         all_split_sentences.extend(split_sentences)
+        all_spans.extend(spans)
 
-    with open("output/log/sentence_by_comma.txt", "w", encoding="utf-8") as output_file:
+    with open(out("log/sentence_by_comma.txt"), "w", encoding="utf-8") as output_file:
         for sentence in all_split_sentences:
             output_file.write(sentence + "\n")
+    save_spans(out("log/sentence_by_comma.txt"), all_spans if input_spans else None)
     
     # delete the original file
-    os.remove("output/log/sentence_by_mark.txt")
+    os.remove(out("log/sentence_by_mark.txt"))
+    remove_spans(out("log/sentence_by_mark.txt"))
     
     print("[green]💾 Sentences split by commas saved to →  `sentences_by_comma.txt`[/green]")
 
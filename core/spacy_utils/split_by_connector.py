@@ -2,7 +2,10 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 import os,sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from load_nlp_model import init_nlp
+from core.transcript_spans import load_spans, save_spans, remove_spans, strip_span
+from core.workspace import out
 from rich import print
 
 def analyze_connectors(doc, token):
@@ -81,17 +84,25 @@ def analyze_connectors(doc, token):
     else:
         return True, False
 
-def split_by_connectors(text, context_words=5, nlp=None):
+def split_by_connectors(text, context_words=5, nlp=None, base=0, return_spans=False):
     doc = nlp(text)
     sentences = [doc.text]  # init
+    bases = [base]  # transcript offset of each sentence
     
     while True:
         # Handle each task with a single cut
         # avoiding the fragmentation of a sentence into multiple parts at the same time.
         split_occurred = False
         new_sentences = []
+        new_bases = []
         
-        for sent in sentences:
+        def add_part(doc, start, end, sent_base):
+            span = doc[start:end]
+            part, (part_start, _) = strip_span(doc.text, span.start_char, span.end_char, sent_base)
+            new_sentences.append(part)
+            new_bases.append(part_start)
+        
+        for sent, sent_base in zip(sentences, bases):
             doc = nlp(sent)
             start = 0
             
@@ -109,42 +120,51 @@ def split_by_connectors(text, context_words=5, nlp=None):
                 
                 if len(left_words) >= context_words and len(right_words) >= context_words and split_before:
                     print(f"[yellow]✂️  Split before '{token.text}': {' '.join(left_words)}| {token.text} {' '.join(right_words)}[/yellow]")
-                    new_sentences.append(doc[start:token.i].text.strip())
+                    add_part(doc, start, token.i, sent_base)
                     start = token.i
                     split_occurred = True
                     break
             
             if start < len(doc):
-                new_sentences.append(doc[start:].text.strip())
+                add_part(doc, start, len(doc), sent_base)
         
         if not split_occurred:
             break
         
         sentences = new_sentences
+        bases = new_bases
     
+    if return_spans:
+        return sentences, [(b, b + len(sent)) for sent, b in zip(sentences, bases)]
     return sentences
 
 def split_sentences_main(nlp):
     # Read input sentences
-    with open("output/log/sentence_by_comma.txt", "r", encoding="utf-8") as input_file:
+    with open(out("log/sentence_by_comma.txt"), "r", encoding="utf-8") as input_file:
         sentences = input_file.readlines()
+    input_spans = load_spans(out("log/sentence_by_comma.txt"), len(sentences))
     
     all_split_sentences = []
+    all_spans = []
     # Process each input sentence
-    for sentence in sentences:
-        split_sentences = split_by_connectors(sentence.strip(), nlp = nlp)
+    for i, sentence in enumerate(sentences):
+        base = input_spans[i][0] if input_spans else 0
+        split_sentences, spans = split_by_connectors(sentence.strip(), nlp = nlp, base = base, return_spans = True)
         all_split_sentences.extend(split_sentences)
+        all_spans.extend(spans)
     
     # output to sentence_splitbyconnector.txt
-    with open("output/log/sentence_splitbyconnector.txt", "w+", encoding="utf-8") as output_file:
+    with open(out("log/sentence_splitbyconnector.txt"), "w+", encoding="utf-8") as output_file:
         for sentence in all_split_sentences:
             output_file.write(sentence + "\n")
         # do not add a newline at the end of the file
         output_file.seek(output_file.tell() - 1, os.SEEK_SET)
         output_file.truncate()
+    save_spans(out("log/sentence_splitbyconnector.txt"), all_spans if input_spans else None)
 
     # delete the original file
-    os.remove("output/log/sentence_by_comma.txt")
+    os.remove(out("log/sentence_by_comma.txt"))
+    remove_spans(out("log/sentence_by_comma.txt"))
     
     print("[green]💾 Sentences split by connectors saved to →  `sentence_splitbyconnector.txt`[/green]")
 
@@ -4,7 +4,10 @@ import os,sys
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.spacy_utils.load_nlp_model import init_nlp
+from core.workspace import out
 from core.config_utils import load_key, get_joiner
+from core.transcript_spans import save_spans, strip_span, word_spans_from_texts
+from core.artifact_store import read_artifact
 from rich import print
 
 def split_by_mark(nlp):
@@ -12,25 +15,32 @@ def split_by_mark(nlp):
     language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language # consider force english case
     joiner = get_joiner(language)
     print(f"[blue]🔍 Using {language} language joiner: '{joiner}'[/blue]")
-    chunks = pd.read_excel("output/log/cleaned_chunks.xlsx")
+    chunks = read_artifact(out("log/cleaned_chunks.parquet"))
     chunks.text = chunks.text.apply(lambda x: x.strip('"').strip(""))
     
     # join with joiner
-    input_text = joiner.join(chunks.text.to_list())
+    words = chunks.text.to_list()
+    input_text = joiner.join(words)
+    # 📍 char offsets of every word, later stages carry spans into this text
+    save_spans(out("log/cleaned_chunks.parquet"), word_spans_from_texts(words, joiner))
 
     doc = nlp(input_text)
     assert doc.has_annotation("SENT_START")
 
     sentences_by_mark = [sent.text for sent in doc.sents]
+    spans = []
 
-    with open("output/log/sentence_by_mark.txt", "w", encoding="utf-8") as output_file:
-        for i, sentence in enumerate(sentences_by_mark):
+    with open(out("log/sentence_by_mark.txt"), "w", encoding="utf-8") as output_file:
+        for i, (sentence, sent) in enumerate(zip(sentences_by_mark, doc.sents)):
             if i > 0 and sentence.strip() in [',', '.', '，', '。', '？', '！']:
                 # ! If the current line contains only punctuation, merge it with the previous line, this happens in Chinese, Japanese, etc.
                 output_file.seek(output_file.tell() - 1, os.SEEK_SET)  # Move to the end of the previous line
                 output_file.write(sentence)  # Add the punctuation
+                spans[-1] = (spans[-1][0], strip_span(input_text, sent.start_char, sent.end_char)[1][1])
             else:
                 output_file.write(sentence + "\n")
+                spans.append(strip_span(input_text, sent.start_char, sent.end_char)[1])
+    save_spans(out("log/sentence_by_mark.txt"), spans)
     
     print("[green]💾 Sentences split by punctuation marks saved to →  `sentences_by_mark.txt`[/green]")
 
@@ -0,0 +1,121 @@
+import warnings
+warnings.filterwarnings("ignore", category=FutureWarning)
+import os,sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from typing import List, Optional, Tuple
+from core.spacy_utils.load_nlp_model import init_nlp
+from core.width_metrics import calc_len, prefix_len
+
+# Punctuation after which a subtitle can be cut without hurting readability
+BREAK_PUNCT = set(',;:，；：、.!?。！？…')
+# Dependencies whose subtree starts a clause, a natural place to start a new line
+CLAUSE_DEPS = {'advcl', 'ccomp', 'relcl', 'xcomp', 'conj', 'parataxis', 'acl'}
+# Penalties added to the distance from the ideal cut, lower is better
+PUNCT_PENALTY = 0.0
+CLAUSE_PENALTY = 0.05
+CONNECTOR_PENALTY = 0.08
+PREP_PENALTY = 0.15
+SPACE_PENALTY = 0.15
+# Each part must hold at least this share of the line, and the cut can drift at most this far from the middle
+MIN_PART_RATIO = 0.2
+MAX_SRC_DEVIATION = 0.3
+MAX_TR_DEVIATION = 0.2
+
+_NLP = None
+
+def get_nlp():
+    global _NLP
+    if _NLP is None:
+        _NLP = init_nlp()
+    return _NLP
+
+def _boundary_penalty(doc, token) -> Optional[float]:
+    """Return the penalty of cutting right before `token`, or None if it is not a boundary."""
+    prev = doc[token.i - 1]
+    if token.is_punct:
+        return None
+    # don't cut inside contractions like "it's" or glued tokens in space-separated languages
+    if not prev.whitespace_ and not prev.is_punct and token.text[:1] in "'’":
+        return None
+    if prev.text[-1:] in BREAK_PUNCT:
+        return PUNCT_PENALTY
+    if token.left_edge == token and token.head != token and token.dep_ in CLAUSE_DEPS:
+        return CLAUSE_PENALTY
+    if any(t.dep_ in CLAUSE_DEPS and t.left_edge == token for t in token.ancestors):
+        return CLAUSE_PENALTY
+    if token.pos_ in ('CCONJ', 'SCONJ') or token.dep_ in ('cc', 'mark'):
+        return CONNECTOR_PENALTY
+    if token.pos_ == 'ADP' or token.dep_ == 'prep':
+        return PREP_PENALTY
+    return None
+
+def split_src_local(src: str, nlp) -> Optional[Tuple[str, str, float]]:
+    """Cut the source at the best syntactic or punctuation boundary near the weighted midpoint.
+    Returns (left, right, left_ratio) or None when no acceptable boundary exists."""
+    doc = nlp(src)
+    total = calc_len(src)
+    if len(doc) < 2 or total == 0:
+        return None
+
+    prefix = prefix_len(src)
+    best = None
+    for token in doc[1:]:
+        penalty = _boundary_penalty(doc, token)
+        if penalty is None:
+            continue
+        left, right = src[:token.idx].strip(), src[token.idx:].strip()
+        ratio = prefix[token.idx] / total
+        if ratio < MIN_PART_RATIO or ratio > 1 - MIN_PART_RATIO or abs(ratio - 0.5) > MAX_SRC_DEVIATION:
+            continue
+        score = abs(ratio - 0.5) + penalty
+        if best is None or score < best[0]:
+            best = (score, left, right, ratio)
+
+    if best is None:
+        return None
+    return best[1], best[2], best[3]
+
+def split_tr_local(tr: str, ratio: float) -> Optional[Tuple[str, str]]:
+    """Cut the translation proportionally to the source cut, at punctuation or word boundaries."""
+    total = calc_len(tr)
+    if total == 0:
+        return None
+
+    prefix = prefix_len(tr)
+    best = None
+    for i in range(1, len(tr)):
+        if tr[i - 1] in BREAK_PUNCT and tr[i] not in BREAK_PUNCT:
+            penalty = PUNCT_PENALTY
+        elif tr[i].isspace() and not tr[i - 1].isspace():
+            penalty = SPACE_PENALTY
+        else:
+            continue
+        left, right = tr[:i].strip(), tr[i:].strip()
+        if not left or not right:
+            continue
+        deviation = abs(prefix[i] / total - ratio)
+        if deviation > MAX_TR_DEVIATION:
+            continue
+        score = deviation + penalty
+        if best is None or score < best[0]:
+            best = (score, left, right)
+
+    if best is None:
+        return None
+    return best[1], best[2]
+
+def split_sub_local(src: str, tr: str, nlp) -> Optional[Tuple[List[str], List[str]]]:
+    """Split a subtitle pair in two without the LLM, None means the caller should fall back to the LLM."""
+    src_split = split_src_local(src, nlp)
+    if src_split is None:
+        return None
+    src_left, src_right, ratio = src_split
+    tr_split = split_tr_local(tr, ratio)
+    if tr_split is None:
+        return None
+    return [src_left, src_right], list(tr_split)
+
+if __name__ == "__main__":
+    nlp = get_nlp()
+    print(split_sub_local("So in the same frame, right there, almost in the exact same spot on the ice, Brown has committed himself, whereas McDavid has not.",
+                          "所以在同一帧里，就在那里，几乎在冰面上完全相同的位置，布朗已经投入了，而麦克戴维还没有。", nlp))
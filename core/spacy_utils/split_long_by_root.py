@@ -3,11 +3,12 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 import os,sys
 sys.path.append(os.path.abspath(os.path.join(__file__, '..', '..', '..')))
 from core.spacy_utils.load_nlp_model import init_nlp
-from core.config_utils import load_key, get_joiner
+from core.workspace import out
+from core.transcript_spans import load_spans, save_spans, remove_spans, strip_span
 from rich import print
 import string
 
-def split_long_sentence(doc):
+def split_long_sentence(doc, base=0):
     tokens = [token.text for token in doc]
     n = len(tokens)
     
@@ -28,71 +29,74 @@ def split_long_sentence(doc):
                         prev[i] = j
     
     # rebuild sentences based on optimal split points
+    # ! use the original text of each token range (not the re-joined tokens) so the parts stay substrings of the transcript
     sentences = []
     i = n
-    whisper_language = load_key("whisper.language")
-    language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language # consider force english case
-    joiner = get_joiner(language)
     while i > 0:
         j = prev[i]
-        sentences.append(joiner.join(tokens[j:i]).strip())
+        sentences.append(doc_part(doc, j, i, base))
         i = j
     
     return sentences[::-1]  # reverse list to keep original order
 
-def split_extremely_long_sentence(doc):
-    tokens = [token.text for token in doc]
-    n = len(tokens)
+def split_extremely_long_sentence(doc, base=0):
+    n = len(doc)
     
     num_parts = (n + 59) // 60  # round up
     
     part_length = n // num_parts
     
     sentences = []
-    whisper_language = load_key("whisper.language")
-    language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language # consider force english case
-    joiner = get_joiner(language)
     for i in range(num_parts):
         start = i * part_length
         end = start + part_length if i < num_parts - 1 else n
-        sentence = joiner.join(tokens[start:end])
-        sentences.append(sentence)
+        sentences.append(doc_part(doc, start, end, base))
     
     return sentences
 
+def doc_part(doc, start, end, base=0):
+    """(text, span) of tokens start..end, span is in transcript offsets"""
+    span = doc[start:end]
+    return strip_span(doc.text, span.start_char, span.end_char, base)
+
 
 
 def split_long_by_root_main(nlp):
 
-    with open("output/log/sentence_splitbyconnector.txt", "r", encoding="utf-8") as input_file:
+    with open(out("log/sentence_splitbyconnector.txt"), "r", encoding="utf-8") as input_file:
         sentences = input_file.readlines()
+    input_spans = load_spans(out("log/sentence_splitbyconnector.txt"), len(sentences))
 
     all_split_sentences = []
-    for sentence in sentences:
-        doc = nlp(sentence.strip())
+    for i, sentence in enumerate(sentences):
+        text = sentence.strip()
+        base = input_spans[i][0] if input_spans else 0
+        doc = nlp(text)
         if len(doc) > 60:
-            split_sentences = split_long_sentence(doc)
-            if any(len(nlp(sent)) > 60 for sent in split_sentences):
-                split_sentences = [subsent for sent in split_sentences for subsent in split_extremely_long_sentence(nlp(sent))]
+            split_sentences = split_long_sentence(doc, base)
+            if any(len(nlp(sent)) > 60 for sent, _ in split_sentences):
+                split_sentences = [subsent for sent, (sent_start, _) in split_sentences for subsent in split_extremely_long_sentence(nlp(sent), sent_start)]
             all_split_sentences.extend(split_sentences)
             print(f"[yellow]✂️  Splitting long sentences by root: {sentence[:30]}...[/yellow]")
         else:
-            all_split_sentences.append(sentence.strip())
+            all_split_sentences.append((text, (base, base + len(text))))
 
     punctuation = string.punctuation + "'" + '"'  # include all punctuation and apostrophe ' and "
 
-    with open("output/log/sentence_splitbynlp.txt", "w", encoding="utf-8") as output_file:
-        for i, sentence in enumerate(all_split_sentences):
+    spans = []
+    with open(out("log/sentence_splitbynlp.txt"), "w", encoding="utf-8") as output_file:
+        for i, (sentence, span) in enumerate(all_split_sentences):
             stripped_sentence = sentence.strip()
             if not stripped_sentence or all(char in punctuation for char in stripped_sentence):
                 print(f"[yellow]⚠️  Warning: Empty or punctuation-only line detected at index {i}[/yellow]")
-                if i > 0:
-                    all_split_sentences[i-1] += sentence
                 continue
             output_file.write(sentence + "\n")
+            spans.append(span)
+    save_spans(out("log/sentence_splitbynlp.txt"), spans if input_spans else None)
 
     # delete the original file
-    os.remove("output/log/sentence_splitbyconnector.txt")   
+    os.remove(out("log/sentence_splitbyconnector.txt"))   
+    remove_spans(out("log/sentence_splitbyconnector.txt"))
 
     print("[green]💾 Long sentences split by root saved to →  `sentence_splitbynlp.txt`[/green]")
 
@@ -6,23 +6,23 @@ from pydub import AudioSegment
 from rich import print as rprint
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from rich.console import Console
+from core.artifact_store import read_artifact
+from core.workspace import out
 console = Console()
 
-INPUT_EXCEL = 'output/audio/tts_tasks.xlsx'
-DUB_VOCAL_FILE = 'output/dub.mp3'
+INPUT_FILE = out('audio/tts_tasks.parquet')
+DUB_VOCAL_FILE = out('dub.mp3')
 
-DUB_SUB_FILE = 'output/dub.srt'
-SEGS_DIR = 'output/audio/segs'
+DUB_SUB_FILE = out('dub.srt')
+SEGS_DIR = out('audio/segs')
 OUTPUT_FILE_TEMPLATE = f"{SEGS_DIR}/{{}}.wav"
 
-def load_and_flatten_data(excel_file):
-    """Load and flatten Excel data"""
-    df = pd.read_excel(excel_file)
-    lines = [eval(line) if isinstance(line, str) else line for line in df['lines'].tolist()]
-    lines = [item for sublist in lines for item in sublist]
+def load_and_flatten_data(tasks_file):
+    """Load the TTS tasks and flatten their lines and timings"""
+    df = read_artifact(tasks_file)
+    lines = [item for sublist in df['lines'].tolist() for item in sublist]
     
-    new_sub_times = [eval(time) if isinstance(time, str) else time for time in df['new_sub_times'].tolist()]
-    new_sub_times = [item for sublist in new_sub_times for item in sublist]
+    new_sub_times = [item for sublist in df['new_sub_times'].tolist() for item in sublist]
     
     return df, lines, new_sub_times
 
@@ -31,7 +31,7 @@ def get_audio_files(df):
     audios = []
     for index, row in df.iterrows():
         number = row['number']
-        line_count = len(eval(row['lines']) if isinstance(row['lines'], str) else row['lines'])
+        line_count = len(row['lines'])
         for line_index in range(line_count):
             temp_file = OUTPUT_FILE_TEMPLATE.format(f"{number}_{line_index}")
             audios.append(temp_file)
@@ -90,7 +90,7 @@ def merge_audio_segments(audios, new_sub_times, sample_rate):
     return merged_audio
 
 def create_srt_subtitle():
-    df, lines, new_sub_times = load_and_flatten_data(INPUT_EXCEL)
+    df, lines, new_sub_times = load_and_flatten_data(INPUT_FILE)
     
     with open(DUB_SUB_FILE, 'w', encoding='utf-8') as f:
         for i, ((start_time, end_time), line) in enumerate(zip(new_sub_times, lines), 1):
@@ -108,7 +108,7 @@ def merge_full_audio():
     console.print("\n[bold cyan]🎬 Starting audio merging process...[/bold cyan]")
     
     with console.status("[bold cyan]📊 Loading data from Excel...[/bold cyan]"):
-        df, lines, new_sub_times = load_and_flatten_data(INPUT_EXCEL)
+        df, lines, new_sub_times = load_and_flatten_data(INPUT_FILE)
     console.print("[bold green]✅ Data loaded successfully[/bold green]")
     
     with console.status("[bold cyan]🔍 Getting audio file list...[/bold cyan]"):
@@ -8,15 +8,16 @@ import cv2
 from rich import print as rprint
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.all_whisper_methods.demucs_vl import BACKGROUND_AUDIO_FILE
+from core.all_whisper_methods.demucs_vl import render_background
+from core.workspace import out
 from core.step7_merge_sub_to_vid import check_gpu_available
 from core.config_utils import load_key
 from core.step1_ytdlp import find_video_files
 from core.all_whisper_methods.audio_preprocess import normalize_audio_volume
 
-DUB_VIDEO = "output/output_dub.mp4"
-DUB_SUB_FILE = 'output/dub.srt'
-DUB_AUDIO = 'output/dub.mp3'
+DUB_VIDEO = out("output_dub.mp4")
+DUB_SUB_FILE = out('dub.srt')
+DUB_AUDIO = out('dub.mp3')
 
 TRANS_FONT_SIZE = 17
 TRANS_FONT_NAME = 'Arial'
@@ -33,7 +34,6 @@ TRANS_BACK_COLOR = '&H33000000'
 def merge_video_audio():
     """Merge video and audio, and reduce video volume"""
     VIDEO_FILE = find_video_files()
-    background_file = BACKGROUND_AUDIO_FILE
     
     if not load_key("burn_subtitles"):
         rprint("[bold yellow]Warning: A 0-second black video will be generated as a placeholder as subtitles are not burned in.[/bold yellow]")
@@ -41,16 +41,19 @@ def merge_video_audio():
         # Create a black frame
         frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(DUB_VIDEO, fourcc, 1, (1920, 1080))
-        out.write(frame)
-        out.release()
+        writer = cv2.VideoWriter(DUB_VIDEO, fourcc, 1, (1920, 1080))
+        writer.write(frame)
+        writer.release()
 
         rprint("[bold green]Placeholder video has been generated.[/bold green]")
         return
 
     # Normalize dub audio
-    normalized_dub_audio = 'output/normalized_dub.wav'
+    normalized_dub_audio = out('normalized_dub.wav')
     normalize_audio_volume(DUB_AUDIO, normalized_dub_audio)
+
+    # Background music is only rendered now that the dub mix needs it
+    background_file = render_background(VIDEO_FILE)
     
     # Merge video and audio with translated subtitles
     video = cv2.VideoCapture(VIDEO_FILE)
@@ -4,6 +4,7 @@ import glob
 import re
 import subprocess
 from core.config_utils import load_key
+from core.workspace import out
 
 def sanitize_filename(filename):
     # Remove or replace illegal characters
@@ -13,7 +14,7 @@ def sanitize_filename(filename):
     # Use default name if filename is empty
     return filename if filename else 'video'
 
-def download_video_ytdlp(url, save_path='output', resolution='1080', cutoff_time=None):
+def download_video_ytdlp(url, save_path=out(), resolution='1080', cutoff_time=None):
     allowed_resolutions = ['360', '1080', 'best']
     if resolution not in allowed_resolutions:
         resolution = '360'
@@ -83,12 +84,12 @@ def download_video_ytdlp(url, save_path='output', resolution='1080', cutoff_time
         else:
             print(f"Video duration ({duration:.2f}s) is not longer than cutoff time. No need to cut.")
 
-def find_video_files(save_path='output'):
+def find_video_files(save_path=out()):
     video_files = [file for file in glob.glob(save_path + "/*") if os.path.splitext(file)[1][1:].lower() in load_key("allowed_video_formats")]
     # change \\ to /, this happen on windows
     if sys.platform.startswith('win'):
         video_files = [file.replace("\\", "/") for file in video_files]
-    video_files = [file for file in video_files if not file.startswith("output/output")]
+    video_files = [file for file in video_files if not file.startswith(out("output"))]
     # if num != 1, raise ValueError
     if len(video_files) != 1:
         raise ValueError(f"Number of videos found is not unique. Please check. Number of videos found: {len(video_files)}")
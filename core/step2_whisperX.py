@@ -1,15 +1,33 @@
 import os,sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import time
 from rich import print as rprint
 
 from core.config_utils import load_key
-from core.all_whisper_methods.demucs_vl import demucs_main, RAW_AUDIO_FILE, VOCAL_AUDIO_FILE
-from core.all_whisper_methods.audio_preprocess import process_transcription, convert_video_to_audio, split_audio, save_results, CLEANED_CHUNKS_EXCEL_PATH, normalize_audio_volume
+from core.all_whisper_methods.demucs_vl import demucs_main, demucs_in_background, get_separation_tier, separation_ready, quick_vocals
+from core.all_whisper_methods.audio_preprocess import process_transcription, convert_video_to_audio, split_audio, save_results, save_language, CLEANED_CHUNKS_PATH
+from core.all_whisper_methods.pcm_cache import RAW_PCM_FILE, VOCAL_PCM_FILE
+from core.all_whisper_methods import speech_trim
+from core.all_whisper_methods.speech_trim import plan_trim, pack_track, remap_result, SPEECH_RAW_FILE, SPEECH_VOCAL_FILE
+from core import artifact_cache, model_server
 from core.step1_ytdlp import find_video_files
 
+def asr_cache_params() -> dict:
+    """Everything besides the audio that changes cleaned_chunks.parquet"""
+    return {
+        "runtime": load_key("whisper.runtime"),
+        "model": load_key("whisper.model"),
+        "language": load_key("whisper.language"),
+        "separation": get_separation_tier(),
+        "demucs_settings": {k: v for k, v in load_key("demucs_settings").items() if k != "cpu_threads"},
+        "vad_trim": load_key("whisper.vad_trim"),
+        "local_segment_minutes": load_key("whisper.local_segment_minutes"),
+        "vad": [speech_trim.SPEECH_DB, speech_trim.MIN_CUT, speech_trim.PAD, speech_trim.PACK_GAP, speech_trim.MIN_SAVED],
+    }
+
 def transcribe():
-    if os.path.exists(CLEANED_CHUNKS_EXCEL_PATH):
+    if os.path.exists(CLEANED_CHUNKS_PATH):
         rprint("[yellow]⚠️ Transcription results already exist, skipping transcription step.[/yellow]")
         return
     
@@ -17,41 +35,102 @@ def transcribe():
     video_file = find_video_files()
     convert_video_to_audio(video_file)
 
+    # Same audio and ASR settings as an earlier job, reuse its transcription
+    cache_key = artifact_cache.cache_key(artifact_cache.audio_fingerprint(RAW_PCM_FILE), asr_cache_params()) if artifact_cache.enabled() else None
+    cached_files = {"cleaned_chunks.parquet": CLEANED_CHUNKS_PATH}
+    if cache_key:
+        extra = artifact_cache.restore("transcription", cache_key, cached_files)
+        if extra is not None:
+            save_language(extra["detected_language"])
+            return
+
     # step1 Demucs vocal separation:
-    if load_key("demucs"):
-        demucs_main()
-        vocal_audio = normalize_audio_volume(VOCAL_AUDIO_FILE, VOCAL_AUDIO_FILE, format="mp3")
-    else:
-        vocal_audio = RAW_AUDIO_FILE
+    runtime = load_key("whisper.runtime")
+    tier = get_separation_tier()
+    vocal_audio = RAW_PCM_FILE
+    separation = None
+    vad_trim = load_key("whisper.vad_trim")
+    if tier != "none":
+        # trimming is planned from vocals, the fast tier is cheap enough to wait for
+        overlap = load_key("demucs_settings.overlap_asr") and not (vad_trim and tier == "fast")
+        if runtime == "local" and overlap and not separation_ready(tier):
+            # local ASR only reads the raw track, separate in another process and join before alignment
+            rprint(f"[cyan]🔀 Separating vocals with <{tier}> in the background while ASR runs on the raw track...[/cyan]")
+            separation = demucs_in_background(tier)
+        else:
+            demucs_main()
+            vocal_audio = VOCAL_PCM_FILE
+    raw_audio = RAW_PCM_FILE
+
+    # step1.5 Skip non-speech regions, ASR only sees the packed speech
+    regions = None
+    if vad_trim:
+        plan_audio = vocal_audio
+        if separation:
+            # the energy VAD would mostly hear the music in the raw mix, plan on a quick spectral-mask pass
+            rprint(f"[cyan]✂️ Planning speech trimming on <fast> vocals while <{tier}> separates...[/cyan]")
+            plan_audio = quick_vocals()
+        regions = plan_trim(plan_audio)
+        if regions:
+            raw_audio = pack_track(RAW_PCM_FILE, regions, SPEECH_RAW_FILE)
+            vocal_audio = raw_audio if vocal_audio == RAW_PCM_FILE else pack_track(vocal_audio, regions, SPEECH_VOCAL_FILE)
 
     # step2 Extract audio
-    segments = split_audio(RAW_AUDIO_FILE)
+    if runtime == "local":
+        # cut at speech pauses from the silence map, the transcriber stays loaded across segments
+        segments = split_audio(raw_audio, target_len=int(load_key("whisper.local_segment_minutes") * 60))
+    else:
+        segments = split_audio(raw_audio)
     
     # step3 Transcribe audio
     all_results = []
-    runtime = load_key("whisper.runtime")
     if runtime == "local":
-        from core.all_whisper_methods.whisperX_local import transcribe_audio as ts
         rprint("[cyan]🎤 Transcribing audio with local model...[/cyan]")
+        if model_server.available():
+            # batch mode, the models are already loaded in the model server
+            transcriber = model_server.RemoteTranscriber()
+        else:
+            from core.all_whisper_methods.whisperX_local import WhisperXTranscriber
+            transcriber = WhisperXTranscriber()
+        try:
+            start_time = time.time()
+            first_pass = [transcriber.asr(raw_audio, start, end) for start, end in segments]
+            if separation:
+                asr_time = time.time() - start_time
+                executor, future = separation
+                future.result()
+                wait_time = time.time() - start_time - asr_time
+                rprint(f"[green]🔀 ASR took {asr_time:.1f}s, then waited {wait_time:.1f}s for the vocals[/green]")
+                vocal_audio = VOCAL_PCM_FILE if not regions else pack_track(VOCAL_PCM_FILE, regions, SPEECH_VOCAL_FILE)
+            all_results = [transcriber.align(result, vocal_audio, start, end) for result, (start, end) in zip(first_pass, segments)]
+        finally:
+            transcriber.release()
+            if separation:
+                separation[0].shutdown(wait=True)
     elif runtime == "cloud":
-        from core.all_whisper_methods.whisperX_302 import transcribe_audio_302 as ts
+        from core.all_whisper_methods.whisperX_302 import transcribe_segments_302
         rprint("[cyan]🎤 Transcribing audio with 302 API...[/cyan]")
+        # segments are uploaded concurrently, results come back in order
+        all_results = transcribe_segments_302(raw_audio, vocal_audio, segments)
     elif runtime == "elevenlabs":
-        from core.all_whisper_methods.elevenlabs_transcribe import transcribe_audio_elevenlabs as ts
+        from core.all_whisper_methods.elevenlabs_transcribe import transcribe_segments_elevenlabs
         rprint("[cyan]🎤 Transcribing audio with ElevenLabs API...[/cyan]")
-
-    for start, end in segments:
-        result = ts(RAW_AUDIO_FILE, vocal_audio, start, end)
-        all_results.append(result)
+        all_results = transcribe_segments_elevenlabs(raw_audio, vocal_audio, segments)
     
     # step4 Combine results
     combined_result = {'segments': []}
     for result in all_results:
         combined_result['segments'].extend(result['segments'])
+    if regions:
+        # back to the timeline of the original video
+        combined_result = remap_result(combined_result, regions)
     
     # step5 Process df
     df = process_transcription(combined_result)
     save_results(df)
+    if cache_key:
+        artifact_cache.store("transcription", cache_key, cached_files, asr_cache_params(),
+                             {"detected_language": load_key("whisper.detected_language")})
         
 if __name__ == "__main__":
     transcribe()
\ No newline at end of file
@@ -2,11 +2,13 @@ import sys,os,math
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import concurrent.futures
 from core.ask_gpt import ask_gpt
+from core.workspace import out
 from core.prompts_storage import get_split_prompt
 from difflib import SequenceMatcher
 import math
 from core.spacy_utils.load_nlp_model import init_nlp
 from core.config_utils import load_key, get_joiner
+from core.transcript_spans import load_spans, save_spans, locate_parts
 from rich.console import Console
 from rich.table import Table
 
@@ -82,47 +84,79 @@ def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0
     
     return best_split
 
-def parallel_split_sentences(sentences, max_length, max_workers, nlp, retry_attempt=0):
-    """Split sentences in parallel using a thread pool."""
-    new_sentences = [None] * len(sentences)
+def find_long_sentences(sentences, indices, max_length, nlp):
+    """Tokenize only the given sentences and return {index: num_parts} for those still too long."""
+    long_sentences = {}
+    for index in indices:
+        # Use tokenizer to split the sentence
+        tokens = tokenize_sentence(sentences[index], nlp)
+        if len(tokens) > max_length:
+            long_sentences[index] = math.ceil(len(tokens) / max_length)
+    return long_sentences
+
+def parallel_split_sentences(sentences, long_sentences, max_length, max_workers, retry_attempt=0, spans=None):
+    """Split the sentences in the worklist in parallel using a thread pool.
+    Returns the flattened sentences, the new indices of every line produced by a split and the updated spans."""
+    new_sentences = [[sentence] for sentence in sentences]
+    new_spans = [[span] for span in spans] if spans is not None else None
     futures = []
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for index, sentence in enumerate(sentences):
-            # Use tokenizer to split the sentence
-            tokens = tokenize_sentence(sentence, nlp)
-            # print("Tokenization result:", tokens)
-            num_parts = math.ceil(len(tokens) / max_length)
-            if len(tokens) > max_length:
-                future = executor.submit(split_sentence, sentence, num_parts, max_length, index=index, retry_attempt=retry_attempt)
-                futures.append((future, index, num_parts, sentence))
-            else:
-                new_sentences[index] = [sentence]
-
-        for future, index, num_parts, sentence in futures:
+        for index, num_parts in long_sentences.items():
+            future = executor.submit(split_sentence, sentences[index], num_parts, max_length, index=index, retry_attempt=retry_attempt)
+            futures.append((future, index))
+
+        for future, index in futures:
             split_result = future.result()
             if split_result:
                 split_lines = split_result.strip().split('\n')
                 new_sentences[index] = [line.strip() for line in split_lines]
-            else:
-                new_sentences[index] = [sentence]
-
-    return [sentence for sublist in new_sentences for sentence in sublist]
+                if new_spans is not None:
+                    # split points come from the original sentence, so each part is a substring of it
+                    part_spans = locate_parts(sentences[index], spans[index][0], new_sentences[index])
+                    if part_spans is None:
+                        console.print(f'[yellow]⚠️ Sentence {index} parts no longer match the original, dropping char offsets[/yellow]')
+                        new_spans = None
+                    else:
+                        new_spans[index] = part_spans
+
+    # flatten and remember where the split products landed, only they need re-checking
+    flat_sentences, touched = [], []
+    for index, parts in enumerate(new_sentences):
+        if index in long_sentences:
+            touched.extend(range(len(flat_sentences), len(flat_sentences) + len(parts)))
+        flat_sentences.extend(parts)
+    flat_spans = [span for parts in new_spans for span in parts] if new_spans is not None else None
+    return flat_sentences, touched, flat_spans
 
 def split_sentences_by_meaning():
     """The main function to split sentences by meaning."""
     # read input sentences
-    with open('output/log/sentence_splitbynlp.txt', 'r', encoding='utf-8') as f:
+    with open(out('log/sentence_splitbynlp.txt'), 'r', encoding='utf-8') as f:
         sentences = [line.strip() for line in f.readlines()]
+    spans = load_spans(out('log/sentence_splitbynlp.txt'), len(sentences))
 
     nlp = init_nlp()
+    max_length = load_key("max_split_length")
+    max_workers = load_key("max_workers")
+    # 📋 worklist of sentences that still exceed the limit, only the first pass tokenizes everything
+    long_sentences = find_long_sentences(sentences, range(len(sentences)), max_length, nlp)
     # 🔄 process sentences multiple times to ensure all are split
     for retry_attempt in range(3):
-        sentences = parallel_split_sentences(sentences, max_length=load_key("max_split_length"), max_workers=load_key("max_workers"), nlp=nlp, retry_attempt=retry_attempt)
+        if not long_sentences:
+            break
+        console.print(f'[cyan]🔄 Pass {retry_attempt + 1}: {len(long_sentences)}/{len(sentences)} sentences exceed {max_length} words[/cyan]')
+        sentences, touched, spans = parallel_split_sentences(sentences, long_sentences, max_length, max_workers, retry_attempt=retry_attempt, spans=spans)
+        long_sentences = find_long_sentences(sentences, touched, max_length, nlp)
+        console.print(f'[cyan]📊 Pass {retry_attempt + 1}: {len(long_sentences)} sentences remain too long[/cyan]')
+
+    if long_sentences:
+        console.print(f'[yellow]⚠️ {len(long_sentences)} sentences are still longer than {max_length} words after all passes[/yellow]')
 
     # 💾 save results
-    with open('output/log/sentence_splitbymeaning.txt', 'w', encoding='utf-8') as f:
+    with open(out('log/sentence_splitbymeaning.txt'), 'w', encoding='utf-8') as f:
         f.write('\n'.join(sentences))
+    save_spans(out('log/sentence_splitbymeaning.txt'), spans)
     console.print('[green]✅ All sentences have been successfully split![/green]')
 
 if __name__ == '__main__':
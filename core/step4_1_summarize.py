@@ -1,12 +1,14 @@
 import os, sys, json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.ask_gpt import ask_gpt
+from core.workspace import out
 from core.prompts_storage import get_summary_prompt
 from core.config_utils import load_key
 import pandas as pd
 
-TERMINOLOGY_JSON_PATH = 'output/log/terminology.json'
-SENTENCE_TXT_PATH = 'output/log/sentence_splitbymeaning.txt'
+TERMINOLOGY_JSON_PATH = out('log/terminology.json')
+# the same text as sentence_splitbymeaning.txt with fewer line breaks, reading it lets the summary run alongside the LLM split
+SENTENCE_TXT_PATH = out('log/sentence_splitbynlp.txt')
 CUSTOM_TERMS_PATH = 'custom_terms.xlsx'
 
 def combine_chunks():
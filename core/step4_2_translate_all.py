@@ -4,10 +4,13 @@ import pandas as pd
 import json
 import concurrent.futures
 from core.translate_once import translate_lines
+from core.workspace import out
 from core.step4_1_summarize import search_things_to_note_in_prompt
 from core.step8_1_gen_audio_task import check_len_then_trim
 from core.step6_generate_final_timeline import align_timestamp
 from core.config_utils import load_key
+from core.transcript_spans import load_spans, save_spans
+from core.artifact_store import read_artifact, write_artifact
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
@@ -15,10 +18,10 @@ from difflib import SequenceMatcher
 
 console = Console()
 
-SENTENCE_SPLIT_FILE = "output/log/sentence_splitbymeaning.txt"
-TRANSLATION_RESULTS_FILE = "output/log/translation_results.xlsx"
-TERMINOLOGY_FILE = "output/log/terminology.json"
-CLEANED_CHUNKS_FILE = "output/log/cleaned_chunks.xlsx"
+SENTENCE_SPLIT_FILE = out("log/sentence_splitbymeaning.txt")
+TRANSLATION_RESULTS_FILE = out("log/translation_results.parquet")
+TERMINOLOGY_FILE = out("log/terminology.json")
+CLEANED_CHUNKS_FILE = out("log/cleaned_chunks.parquet")
 
 # Function to split text into chunks
 def split_chunks_by_chars(chunk_size=400, max_i=8): 
@@ -62,7 +65,7 @@ def similar(a, b):
 def translate_all():
     # Check if the file exists
     if os.path.exists(TRANSLATION_RESULTS_FILE):
-        console.print(Panel("🚨 File `translation_results.xlsx` already exists, skipping TRANSLATE ALL.", title="Warning", border_style="yellow"))
+        console.print(Panel("🚨 File `translation_results.parquet` already exists, skipping TRANSLATE ALL.", title="Warning", border_style="yellow"))
         return
     
     console.print("[bold green]Start Translating All...[/bold green]")
@@ -112,17 +115,19 @@ def translate_all():
         trans_text.extend(best_match[0][2].split('\n'))
     
     # Trim long translation text
-    df_text = pd.read_excel(CLEANED_CHUNKS_FILE)
+    df_text = read_artifact(CLEANED_CHUNKS_FILE)
     df_text['text'] = df_text['text'].str.strip('"').str.strip()
     df_translate = pd.DataFrame({'Source': src_text, 'Translation': trans_text})
     subtitle_output_configs = [('trans_subs_for_audio.srt', ['Translation'])]
-    df_time = align_timestamp(df_text, df_translate, subtitle_output_configs, output_dir=None, for_display=False)
+    spans = load_spans(SENTENCE_SPLIT_FILE, len(src_text))
+    df_time = align_timestamp(df_text, df_translate, subtitle_output_configs, output_dir=None, for_display=False, spans=spans)
     console.print(df_time)
     # apply check_len_then_trim to df_time['Translation'], only when duration > MIN_TRIM_DURATION.
     df_time['Translation'] = df_time.apply(lambda x: check_len_then_trim(x['Translation'], x['duration']) if x['duration'] > load_key("min_trim_duration") else x['Translation'], axis=1)
     console.print(df_time)
     
-    df_time.to_excel(TRANSLATION_RESULTS_FILE, index=False)
+    write_artifact(df_time, TRANSLATION_RESULTS_FILE)
+    save_spans(TRANSLATION_RESULTS_FILE, spans)
     console.print("[bold green]✅ Translation completed and results saved.[/bold green]")
 
 if __name__ == '__main__':
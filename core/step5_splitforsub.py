@@ -1,13 +1,17 @@
-import sys, os
+import sys, os, time
 import pandas as pd
 from typing import List, Tuple
 import concurrent.futures
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.step3_2_splitbymeaning import split_sentence
+from core.workspace import out
 from core.ask_gpt import ask_gpt
 from core.prompts_storage import get_align_prompt
 from core.config_utils import load_key, get_joiner
+from core.width_metrics import calc_len, calc_len_batch
+from core.transcript_spans import load_spans, save_spans, locate_parts
+from core.artifact_store import read_artifact, write_artifact
 from rich.panel import Panel
 from rich.console import Console
 from rich.table import Table
@@ -15,28 +19,9 @@ from rich.table import Table
 console = Console()
 
 # Constants
-INPUT_FILE = "output/log/translation_results.xlsx"
-OUTPUT_SPLIT_FILE = "output/log/translation_results_for_subtitles.xlsx"
-OUTPUT_REMERGED_FILE = "output/log/translation_results_remerged.xlsx"
-
-# ! You can modify your own weights here
-# Chinese and Japanese 2.5 characters, Korean 2 characters, Thai 1.5 characters, full-width symbols 2 characters, other English-based and half-width symbols 1 character
-def calc_len(text: str) -> float:
-    text = str(text) # force convert
-    def char_weight(char):
-        code = ord(char)
-        if 0x4E00 <= code <= 0x9FFF or 0x3040 <= code <= 0x30FF:  # Chinese and Japanese
-            return 1.75
-        elif 0xAC00 <= code <= 0xD7A3 or 0x1100 <= code <= 0x11FF:  # Korean
-            return 1.5
-        elif 0x0E00 <= code <= 0x0E7F:  # Thai
-            return 1
-        elif 0xFF01 <= code <= 0xFF5E:  # full-width symbols
-            return 1.75
-        else:  # other characters (e.g. English and half-width symbols)
-            return 1
-
-    return sum(char_weight(char) for char in text)
+INPUT_FILE = out("log/translation_results.parquet")
+OUTPUT_SPLIT_FILE = out("log/translation_results_for_subtitles.parquet")
+OUTPUT_REMERGED_FILE = out("log/translation_results_remerged.parquet")
 
 def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], List[str], str]:
     align_prompt = get_align_prompt(src_sub, tr_sub, src_part)
@@ -69,63 +54,113 @@ def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], Lis
     
     return src_parts, tr_parts, tr_remerged
 
-def split_align_subs(src_lines: List[str], tr_lines: List[str]) -> Tuple[List[str], List[str], List[str]]:
+def needs_split(src: str, tr: str, max_length: int, target_multiplier: float) -> bool:
+    return len(str(src)) > max_length or calc_len(tr) * target_multiplier > max_length
+
+def split_align_subs(src_lines: List[str], tr_lines: List[str], to_split: List[int] = None, spans: list = None) -> Tuple[List[str], List[str], List[str], List[int], list]:
+    """Split and align the lines in `to_split` (all too-long lines when None).
+    Returns the flattened lines, the remerged translations, the new worklist of lines still too long
+    and the transcript spans of the flattened source lines (None if they could not be kept)."""
     subtitle_set = load_key("subtitle")
     MAX_SUB_LENGTH = subtitle_set["max_length"]
     TARGET_SUB_MULTIPLIER = subtitle_set["target_multiplier"]
     remerged_tr_lines = tr_lines.copy()
+    span_parts = [[span] for span in spans] if spans is not None else None
     
-    to_split = []
-    for i, (src, tr) in enumerate(zip(src_lines, tr_lines)):
-        src, tr = str(src), str(tr)
-        if len(src) > MAX_SUB_LENGTH or calc_len(tr) * TARGET_SUB_MULTIPLIER > MAX_SUB_LENGTH:
-            to_split.append(i)
-            table = Table(title=f"📏 Line {i} needs to be split")
-            table.add_column("Type", style="cyan")
-            table.add_column("Content", style="magenta")
-            table.add_row("Source Line", src)
-            table.add_row("Target Line", tr)
-            console.print(table)
+    def set_src_parts(i, src_parts):
+        # every part is cut out of the original line, so its span is found by an exact substring search
+        if span_parts is not None:
+            span_parts[i] = locate_parts(str(src_lines[i]), spans[i][0], src_parts)
+        src_lines[i] = src_parts
+    
+    if to_split is None:
+        # first pass: measure the whole table at once
+        tr_lens = calc_len_batch(tr_lines) * TARGET_SUB_MULTIPLIER
+        to_split = [i for i, (src, tr_len) in enumerate(zip(src_lines, tr_lens)) if len(str(src)) > MAX_SUB_LENGTH or tr_len > MAX_SUB_LENGTH]
+    for i in to_split:
+        table = Table(title=f"📏 Line {i} needs to be split")
+        table.add_column("Type", style="cyan")
+        table.add_column("Content", style="magenta")
+        table.add_row("Source Line", str(src_lines[i]))
+        table.add_row("Target Line", str(tr_lines[i]))
+        console.print(table)
     
     def process(i):
         split_src = split_sentence(src_lines[i], num_parts=2).strip()
         src_parts, tr_parts, tr_remerged = align_subs(src_lines[i], tr_lines[i], split_src)
-        src_lines[i] = src_parts
+        set_src_parts(i, src_parts)
         tr_lines[i] = tr_parts
         remerged_tr_lines[i] = tr_remerged
     
+    # ✂️ Local mode: cut at syntax/punctuation boundaries first, only unsplittable lines go to the LLM
+    llm_to_split = to_split
+    if subtitle_set["split_method"] == "local" and to_split:
+        from core.spacy_utils.split_for_sub_local import split_sub_local, get_nlp
+        nlp = get_nlp()
+        start_time = time.time()
+        llm_to_split = []
+        for i in to_split:
+            local_result = split_sub_local(str(src_lines[i]), str(tr_lines[i]), nlp)
+            if local_result is None:
+                llm_to_split.append(i)
+                continue
+            set_src_parts(i, local_result[0])
+            tr_lines[i] = local_result[1]
+        local_count = len(to_split) - len(llm_to_split)
+        console.print(f"[cyan]✂️ Local split: {local_count} lines in {time.time() - start_time:.2f}s, "
+                      f"🤖 LLM fallback: {len(llm_to_split)} lines ({len(llm_to_split) / len(to_split):.0%})[/cyan]")
+    
+    start_time = time.time()
     with concurrent.futures.ThreadPoolExecutor(max_workers=load_key("max_workers")) as executor:
-        executor.map(process, to_split)
+        executor.map(process, llm_to_split)
+    if llm_to_split:
+        console.print(f"[cyan]🤖 LLM split: {len(llm_to_split)} lines in {time.time() - start_time:.2f}s[/cyan]")
+    
+    # Flatten `src_lines` and `tr_lines`, remembering where the lines of each split landed
+    to_split_set = set(to_split)
+    def flatten(lines):
+        flat, touched = [], set()
+        for i, item in enumerate(lines):
+            parts = item if isinstance(item, list) else [item]
+            if i in to_split_set:
+                touched.update(range(len(flat), len(flat) + len(parts)))
+            flat.extend(parts)
+        return flat, touched
+    src_lines, src_touched = flatten(src_lines)
+    tr_lines, tr_touched = flatten(tr_lines)
+    if span_parts is not None and all(parts is not None for parts in span_parts):
+        new_spans = [span for parts in span_parts for span in parts]
+    else:
+        new_spans = None
     
-    # Flatten `src_lines` and `tr_lines`
-    src_lines = [item for sublist in src_lines for item in (sublist if isinstance(sublist, list) else [sublist])]
-    tr_lines = [item for sublist in tr_lines for item in (sublist if isinstance(sublist, list) else [sublist])]
+    # Only lines produced by this pass can still be too long, the rest were already checked
+    touched = sorted(i for i in src_touched | tr_touched if i < min(len(src_lines), len(tr_lines)))
+    still_long = [i for i in touched if needs_split(src_lines[i], tr_lines[i], MAX_SUB_LENGTH, TARGET_SUB_MULTIPLIER)]
     
-    return src_lines, tr_lines, remerged_tr_lines
+    return src_lines, tr_lines, remerged_tr_lines, still_long, new_spans
 
 def split_for_sub_main():
     console.print("[bold green]🚀 Start splitting subtitles...[/bold green]")
     
-    df = pd.read_excel(INPUT_FILE)
+    df = read_artifact(INPUT_FILE)
     src = df['Source'].tolist()
     trans = df['Translation'].tolist()
+    spans = load_spans(INPUT_FILE, len(src))
     
-    subtitle_set = load_key("subtitle")
-    MAX_SUB_LENGTH = subtitle_set["max_length"]
-    TARGET_SUB_MULTIPLIER = subtitle_set["target_multiplier"]
-    
+    to_split = None
     for attempt in range(3):  # 使用固定的3次重试
         console.print(Panel(f"🔄 Split attempt {attempt + 1}", expand=False))
-        split_src, split_trans, remerged = split_align_subs(src.copy(), trans)
+        split_src, split_trans, remerged, to_split, split_spans = split_align_subs(src.copy(), trans.copy(), to_split, spans)
+        console.print(f"[cyan]📊 Attempt {attempt + 1}: {len(to_split)}/{len(split_src)} lines still exceed the length limit[/cyan]")
         
         # 检查是否所有字幕都符合长度要求
-        if all(len(src) <= MAX_SUB_LENGTH for src in split_src) and \
-           all(calc_len(tr) * TARGET_SUB_MULTIPLIER <= MAX_SUB_LENGTH for tr in split_trans):
+        if not to_split:
             break
         
         # 更新源数据继续下一轮分割
         src = split_src
         trans = split_trans
+        spans = split_spans
 
     # Make sure that the src and the remerged have the same length
     # 确保二者有相同的长度，防止报错
@@ -134,8 +169,11 @@ def split_for_sub_main():
     elif len(remerged) > len(src):
         src += [None] * (len(remerged) - len(src))
     
-    pd.DataFrame({'Source': split_src, 'Translation': split_trans}).to_excel(OUTPUT_SPLIT_FILE, index=False)
-    pd.DataFrame({'Source': src, 'Translation': remerged}).to_excel(OUTPUT_REMERGED_FILE, index=False)
+    write_artifact(pd.DataFrame({'Source': split_src, 'Translation': split_trans}), OUTPUT_SPLIT_FILE)
+    write_artifact(pd.DataFrame({'Source': src, 'Translation': remerged}), OUTPUT_REMERGED_FILE)
+    # 📍 keep transcript offsets next to both files so step6 can look timestamps up directly
+    save_spans(OUTPUT_SPLIT_FILE, split_spans if split_spans is not None and len(split_spans) == len(split_src) else None)
+    save_spans(OUTPUT_REMERGED_FILE, spans if spans is not None and len(spans) == len(src) else None)
 
 if __name__ == '__main__':
     split_for_sub_main()
@@ -1,19 +1,23 @@
 import pandas as pd
+import numpy as np
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import re
 from rich.panel import Panel
 from rich.console import Console
 import autocorrect_py as autocorrect
+from core.transcript_spans import load_spans, spans_to_word_indices
+from core.workspace import out
+from core.artifact_store import read_artifact
 
 console = Console()
 
-CLEANED_CHUNKS_FILE = 'output/log/cleaned_chunks.xlsx'
-TRANSLATION_RESULTS_FOR_SUBTITLES_FILE = 'output/log/translation_results_for_subtitles.xlsx'
-TRANSLATION_RESULTS_REMERGED_FILE = 'output/log/translation_results_remerged.xlsx'
+CLEANED_CHUNKS_FILE = out('log/cleaned_chunks.parquet')
+TRANSLATION_RESULTS_FOR_SUBTITLES_FILE = out('log/translation_results_for_subtitles.parquet')
+TRANSLATION_RESULTS_REMERGED_FILE = out('log/translation_results_remerged.parquet')
 
-OUTPUT_DIR = 'output'
-AUDIO_OUTPUT_DIR = 'output/audio'
+OUTPUT_DIR = out()
+AUDIO_OUTPUT_DIR = out('audio')
 
 SUBTITLE_OUTPUT_CONFIGS = [ 
     ('src.srt', ['Source']),
@@ -27,19 +31,6 @@ AUDIO_SUBTITLE_OUTPUT_CONFIGS = [
     ('trans_subs_for_audio.srt', ['Translation'])
 ]
 
-def convert_to_srt_format(start_time, end_time):
-    """Convert time (in seconds) to the format: hours:minutes:seconds,milliseconds"""
-    def seconds_to_hmsm(seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        seconds = seconds % 60
-        milliseconds = int(seconds * 1000) % 1000
-        return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
-
-    start_srt = seconds_to_hmsm(start_time)
-    end_srt = seconds_to_hmsm(end_time)
-    return f"{start_srt} --> {end_srt}"
-
 def remove_punctuation(text):
     text = re.sub(r'\s+', ' ', text)
     text = re.sub(r'[^\w\s]', '', text)
@@ -63,85 +54,102 @@ def show_difference(str1, str2):
     print("Position markers: " + "".join("^" if i in diff_positions else " " for i in range(max(len(str1), len(str2)))))
     print(f"Difference indices: {diff_positions}")
 
-def get_sentence_timestamps(df_words, df_sentences):
+def build_word_index(df_words):
+    """Concatenate the cleaned words once, word_ends[i] is the exclusive char offset where word i ends"""
+    clean_words = [remove_punctuation(word.lower()) for word in df_words['text']]
+    full_words_str = ''.join(clean_words)
+    word_ends = np.cumsum(np.fromiter((len(word) for word in clean_words), dtype=np.int64, count=len(clean_words)))
+    return full_words_str, word_ends
+
+def get_sentence_timestamps(df_words, df_sentences, word_index=None, spans=None, word_spans=None):
+    # 📍 Lines carrying transcript char offsets map straight to their words
+    if spans is not None and word_spans is None:
+        word_spans = load_spans(CLEANED_CHUNKS_FILE, len(df_words))
+    if spans is not None and word_spans is not None:
+        first, last = spans_to_word_indices(spans, word_spans)
+        starts = df_words['start'].to_numpy(dtype=float)[first]
+        ends = df_words['end'].to_numpy(dtype=float)[last]
+        return list(zip(starts, ends))
+
+    # Otherwise (older outputs or hand-edited files) match the text against the word stream
     time_stamp_list = []
     
-    # Build complete string and position mapping
-    full_words_str = ''
-    position_to_word_idx = {}
-    
-    for idx, word in enumerate(df_words['text']):
-        clean_word = remove_punctuation(word.lower())
-        start_pos = len(full_words_str)
-        full_words_str += clean_word
-        for pos in range(start_pos, len(full_words_str)):
-            position_to_word_idx[pos] = idx
+    # Build complete string and char offset -> word index mapping
+    full_words_str, word_ends = word_index if word_index is not None else build_word_index(df_words)
+    starts = df_words['start'].to_numpy(dtype=float)
+    ends = df_words['end'].to_numpy(dtype=float)
     
     current_pos = 0
     for idx, sentence in df_sentences['Source'].items():
         clean_sentence = remove_punctuation(sentence.lower()).replace(" ", "")
         sentence_len = len(clean_sentence)
         
-        match_found = False
-        while current_pos <= len(full_words_str) - sentence_len:
-            if full_words_str[current_pos:current_pos+sentence_len] == clean_sentence:
-                start_word_idx = position_to_word_idx[current_pos]
-                end_word_idx = position_to_word_idx[current_pos + sentence_len - 1]
-                
-                time_stamp_list.append((
-                    float(df_words['start'][start_word_idx]),
-                    float(df_words['end'][end_word_idx])
-                ))
-                
-                current_pos += sentence_len
-                match_found = True
-                break
-            current_pos += 1
-            
-        if not match_found:
+        match_pos = full_words_str.find(clean_sentence, current_pos)
+        if match_pos == -1:
             print(f"\n⚠️ Warning: No exact match found for sentence: {sentence}")
             show_difference(clean_sentence, 
                           full_words_str[current_pos:current_pos+len(clean_sentence)])
             print("\nOriginal sentence:", df_sentences['Source'][idx])
             raise ValueError("❎ No match found for sentence.")
+        
+        # the word owning char offset p is the first one ending after p
+        start_word_idx, end_word_idx = np.searchsorted(word_ends, [match_pos, match_pos + sentence_len - 1], side='right')
+        time_stamp_list.append((starts[start_word_idx], ends[end_word_idx]))
+        current_pos = match_pos + sentence_len
     
     return time_stamp_list
 
-def align_timestamp(df_text, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True):
+def format_srt_times(seconds: np.ndarray) -> list:
+    """Vectorized seconds -> `hours:minutes:seconds,milliseconds` strings"""
+    hours = (seconds // 3600).astype(int)
+    minutes = ((seconds % 3600) // 60).astype(int)
+    secs = seconds % 60
+    milliseconds = (secs * 1000).astype(int) % 1000
+    return [f"{h:02d}:{m:02d}:{s:02d},{ms:03d}" for h, m, s, ms in zip(hours, minutes, secs.astype(int), milliseconds)]
+
+def generate_subtitle_strings(timestamps: list, df, subtitle_output_configs: list) -> dict:
+    """Build every configured SRT from the same preformatted blocks, {filename: srt_string}"""
+    columns = {col for _, cols in subtitle_output_configs for col in cols}
+    texts = {col: [str(x).strip() for x in df[col].tolist()] for col in columns}
+    headers = [f"{i}\n{timestamp}\n" for i, timestamp in enumerate(timestamps, 1)]
+    empty = [''] * len(headers)
+
+    subtitle_strings = {}
+    for filename, cols in subtitle_output_configs:
+        first = texts[cols[0]]
+        second = texts[cols[1]] if len(cols) > 1 else empty
+        subtitle_strings[filename] = ''.join(f"{header}{a}\n{b}\n\n" for header, a, b in zip(headers, first, second)).strip()
+    return subtitle_strings
+
+def align_timestamp(df_text, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True, word_index=None, spans=None, word_spans=None):
     """Align timestamps and add a new timestamp column to df_translate"""
     df_trans_time = df_translate.copy()
 
-    # Assign an ID to each word in df_text['text'] and create a new DataFrame
-    words = df_text['text'].str.split(expand=True).stack().reset_index(level=1, drop=True).reset_index()
-    words.columns = ['id', 'word']
-    words['id'] = words['id'].astype(int)
-
     # Process timestamps ⏰
-    time_stamp_list = get_sentence_timestamps(df_text, df_translate)
-    df_trans_time['timestamp'] = time_stamp_list
-    df_trans_time['duration'] = df_trans_time['timestamp'].apply(lambda x: x[1] - x[0])
+    time_stamp_list = get_sentence_timestamps(df_text, df_translate, word_index, spans, word_spans)
+    times = np.array(time_stamp_list, dtype=float).reshape(-1, 2)
+    starts, ends = times[:, 0], times[:, 1].copy()
+    durations = ends - starts
 
-    # Remove gaps 🕳️
-    for i in range(len(df_trans_time)-1):
-        delta_time = df_trans_time.loc[i+1, 'timestamp'][0] - df_trans_time.loc[i, 'timestamp'][1]
-        if 0 < delta_time < 1:
-            df_trans_time.at[i, 'timestamp'] = (df_trans_time.loc[i, 'timestamp'][0], df_trans_time.loc[i+1, 'timestamp'][0])
+    # Remove gaps 🕳️ shorter than 1s by stretching each line to the start of the next one
+    gaps = starts[1:] - ends[:-1]
+    close = (gaps > 0) & (gaps < 1)
+    ends[:-1][close] = starts[1:][close]
 
     # Convert start and end timestamps to SRT format
-    df_trans_time['timestamp'] = df_trans_time['timestamp'].apply(lambda x: convert_to_srt_format(x[0], x[1]))
+    start_strs, end_strs = format_srt_times(starts), format_srt_times(ends)
+    df_trans_time['timestamp'] = [f"{start} --> {end}" for start, end in zip(start_strs, end_strs)]
+    df_trans_time['duration'] = durations
 
     # Polish subtitles: replace punctuation in Translation if for_display
     if for_display:
-        df_trans_time['Translation'] = df_trans_time['Translation'].apply(lambda x: re.sub(r'[，。]', ' ', x).strip())
+        df_trans_time['Translation'] = df_trans_time['Translation'].str.replace(r'[，。]', ' ', regex=True).str.strip()
 
     # Output subtitles 📜
-    def generate_subtitle_string(df, columns):
-        return ''.join([f"{i+1}\n{row['timestamp']}\n{row[columns[0]].strip()}\n{row[columns[1]].strip() if len(columns) > 1 else ''}\n\n" for i, row in df.iterrows()]).strip()
-
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
-        for filename, columns in subtitle_output_configs:
-            subtitle_str = generate_subtitle_string(df_trans_time, columns)
+        subtitle_strings = generate_subtitle_strings(df_trans_time['timestamp'].tolist(), df_trans_time, subtitle_output_configs)
+        for filename, subtitle_str in subtitle_strings.items():
             with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(subtitle_str)
     
@@ -155,21 +163,49 @@ def clean_translation(x):
     return autocorrect.format(cleaned)
 
 def align_timestamp_main():
-    df_text = pd.read_excel(CLEANED_CHUNKS_FILE)
+    df_text = read_artifact(CLEANED_CHUNKS_FILE)
     df_text['text'] = df_text['text'].str.strip('"').str.strip()
-    df_translate = pd.read_excel(TRANSLATION_RESULTS_FOR_SUBTITLES_FILE)
+    df_translate = read_artifact(TRANSLATION_RESULTS_FOR_SUBTITLES_FILE)
     df_translate['Translation'] = df_translate['Translation'].apply(clean_translation)
+    # the word stream is shared by both alignments, index it and load its spans once
+    word_index = build_word_index(df_text)
+    word_spans = load_spans(CLEANED_CHUNKS_FILE, len(df_text))
     
-    align_timestamp(df_text, df_translate, SUBTITLE_OUTPUT_CONFIGS, OUTPUT_DIR)
+    spans = load_spans(TRANSLATION_RESULTS_FOR_SUBTITLES_FILE, len(df_translate))
+    align_timestamp(df_text, df_translate, SUBTITLE_OUTPUT_CONFIGS, OUTPUT_DIR, word_index=word_index, spans=spans, word_spans=word_spans)
     console.print(Panel("[bold green]🎉📝 Subtitles generation completed! Please check in the `output` folder 👀[/bold green]"))
 
     # for audio
-    df_translate_for_audio = pd.read_excel(TRANSLATION_RESULTS_REMERGED_FILE) # use remerged file to avoid unmatched lines when dubbing
+    df_translate_for_audio = read_artifact(TRANSLATION_RESULTS_REMERGED_FILE) # use remerged file to avoid unmatched lines when dubbing
     df_translate_for_audio['Translation'] = df_translate_for_audio['Translation'].apply(clean_translation)
     
-    align_timestamp(df_text, df_translate_for_audio, AUDIO_SUBTITLE_OUTPUT_CONFIGS, AUDIO_OUTPUT_DIR)
+    spans = load_spans(TRANSLATION_RESULTS_REMERGED_FILE, len(df_translate_for_audio))
+    align_timestamp(df_text, df_translate_for_audio, AUDIO_SUBTITLE_OUTPUT_CONFIGS, AUDIO_OUTPUT_DIR, word_index=word_index, spans=spans, word_spans=word_spans)
     console.print(Panel("[bold green]🎉📝 Audio subtitles generation completed! Please check in the `output/audio` folder 👀[/bold green]"))
     
 
+def benchmark_sentence_timestamps(num_words: int = 50000, words_per_sentence: int = 12):
+    """Time get_sentence_timestamps on a synthetic transcript"""
+    import random, time
+    random.seed(0)
+    vocab = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "it's", "well,", "video", "lingo"]
+    words = [random.choice(vocab) for _ in range(num_words)]
+    df_words = pd.DataFrame({'text': words, 'start': np.arange(num_words) * 0.4, 'end': np.arange(num_words) * 0.4 + 0.3})
+    sentences = [' '.join(words[i:i + words_per_sentence]) for i in range(0, num_words, words_per_sentence)]
+    df_sentences = pd.DataFrame({'Source': sentences})
+
+    start = time.time()
+    word_index = build_word_index(df_words)
+    index_time = time.time() - start
+    start = time.time()
+    timestamps = get_sentence_timestamps(df_words, df_sentences, word_index)
+    match_time = time.time() - start
+    assert len(timestamps) == len(sentences)
+    print(f"⏱️ {num_words} words / {len(sentences)} sentences: index {index_time:.3f}s, match {match_time:.3f}s")
+
 if __name__ == '__main__':
-    align_timestamp_main()
\ No newline at end of file
+    # python core/step6_generate_final_timeline.py [--benchmark]
+    if "--benchmark" in sys.argv[1:]:
+        benchmark_sentence_timestamps()
+    else:
+        align_timestamp_main()
\ No newline at end of file
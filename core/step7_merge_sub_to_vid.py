@@ -1,6 +1,7 @@
 import os, subprocess, time, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
+from core.workspace import out
 from core.step1_ytdlp import find_video_files
 from rich import print as rprint
 import cv2
@@ -30,7 +31,7 @@ TRANS_OUTLINE_COLOR = '&H000000'
 TRANS_OUTLINE_WIDTH = 1 
 TRANS_BACK_COLOR = '&H33000000'
 
-OUTPUT_DIR = "output"
+OUTPUT_DIR = out()
 OUTPUT_VIDEO = f"{OUTPUT_DIR}/output_sub.mp4"
 SRC_SRT = f"{OUTPUT_DIR}/src.srt"
 TRANS_SRT = f"{OUTPUT_DIR}/trans.srt"
@@ -53,15 +54,15 @@ def merge_subtitles_to_video():
         # Create a black frame
         frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, 1, (1920, 1080))
-        out.write(frame)
-        out.release()
+        writer = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, 1, (1920, 1080))
+        writer.write(frame)
+        writer.release()
 
         rprint("[bold green]Placeholder video has been generated.[/bold green]")
         return
 
     if not os.path.exists(SRC_SRT) or not os.path.exists(TRANS_SRT):
-        print("Subtitle files not found in the 'output' directory.")
+        print("Subtitle files not found in the output directory.")
         exit(1)
 
     video = cv2.VideoCapture(video_file)
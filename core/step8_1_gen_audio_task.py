@@ -4,19 +4,21 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import re
 from core.ask_gpt import ask_gpt
+from core.workspace import out
 from core.prompts_storage import get_subtitle_trim_prompt
 from rich import print as rprint
 from rich.panel import Panel
 from rich.console import Console
 from core.config_utils import load_key  
 from core.all_tts_functions.estimate_duration import init_estimator, estimate_duration
+from core.artifact_store import write_artifact
 
 console = Console()
 speed_factor = load_key("speed_factor")
 
-TRANS_SUBS_FOR_AUDIO_FILE = 'output/audio/trans_subs_for_audio.srt'
-SRC_SUBS_FOR_AUDIO_FILE = 'output/audio/src_subs_for_audio.srt'
-SOVITS_TASKS_FILE = 'output/audio/tts_tasks.xlsx'
+TRANS_SUBS_FOR_AUDIO_FILE = out('audio/trans_subs_for_audio.srt')
+SRC_SUBS_FOR_AUDIO_FILE = out('audio/src_subs_for_audio.srt')
+SOVITS_TASKS_FILE = out('audio/tts_tasks.parquet')
 ESTIMATOR = None
 
 def check_len_then_trim(text, duration):
@@ -142,7 +144,7 @@ def gen_audio_task_main():
     else:
         df = process_srt()
         console.print(df)
-        df.to_excel(SOVITS_TASKS_FILE, index=False)
+        write_artifact(df, SOVITS_TASKS_FILE)
 
         rprint(Panel(f"Successfully generated {SOVITS_TASKS_FILE}", title="Success", border_style="green"))
 
@@ -2,19 +2,21 @@ import pandas as pd
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
-from core.all_whisper_methods.audio_preprocess import get_audio_duration
+from core.workspace import out
+from core.all_whisper_methods.pcm_cache import RAW_PCM_FILE, pcm_duration
 from core.step8_1_gen_audio_task import time_diff_seconds
+from core.artifact_store import read_artifact, write_artifact
 import datetime
 import re
 from core.all_tts_functions.estimate_duration import init_estimator, estimate_duration
 from rich import print as rprint
 
-INPUT_EXCEL = "output/audio/tts_tasks.xlsx"
-OUTPUT_EXCEL = "output/audio/tts_tasks.xlsx"
-SRC_SRT = "output/src.srt"
-TRANS_SRT = "output/trans.srt"
+INPUT_FILE = out("audio/tts_tasks.parquet")
+OUTPUT_FILE = out("audio/tts_tasks.parquet")
+SRC_SRT = out("src.srt")
+TRANS_SRT = out("trans.srt")
 MAX_MERGE_COUNT = 5
-AUDIO_FILE = 'output/audio/raw.mp3'
+AUDIO_FILE = RAW_PCM_FILE
 ESTIMATOR = None
 
 def calc_if_too_fast(est_dur, tol_dur, duration, tolerance):
@@ -66,7 +68,7 @@ def analyze_subtitle_timing_and_speed(df):
     if ESTIMATOR is None:
         ESTIMATOR = init_estimator()
     TOLERANCE = load_key("tolerance")
-    whole_dur = get_audio_duration(AUDIO_FILE)
+    whole_dur = pcm_duration(AUDIO_FILE)
     df['gap'] = 0.0  # Initialize gap column
     for i in range(len(df) - 1):
         current_end = datetime.datetime.strptime(df.loc[i, 'end_time'], '%H:%M:%S.%f').time()
@@ -136,7 +138,7 @@ def process_cutoffs(df):
 
 def gen_dub_chunks():
     rprint("[🎬 Starting] Generating dubbing chunks...")
-    df = pd.read_excel(INPUT_EXCEL)
+    df = read_artifact(INPUT_FILE)
     
     rprint("[📊 Processing] Analyzing timing and speed...")
     df = analyze_subtitle_timing_and_speed(df)
@@ -204,7 +206,7 @@ def gen_dub_chunks():
             raise ValueError("Matching failed")
 
     # Save results
-    df.to_excel(OUTPUT_EXCEL, index=False)
+    write_artifact(df, OUTPUT_FILE)
     rprint("[✅ Complete] Matching completed successfully!")
 
 if __name__ == "__main__":
@@ -7,12 +7,15 @@ from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 import pandas as pd
 import soundfile as sf
 console = Console()
-from core.all_whisper_methods.demucs_vl import demucs_main, VOCAL_AUDIO_FILE
+from core.all_whisper_methods.demucs_vl import demucs_main
+from core.workspace import out
+from core.all_whisper_methods.pcm_cache import VOCAL_PCM_FILE, SAMPLE_RATE, load_pcm
+from core.artifact_store import read_artifact
 
 # Simplified path definitions
-REF_DIR = 'output/audio/refers'
-SEG_DIR = 'output/audio/segs'
-TASKS_FILE = 'output/audio/tts_tasks.xlsx'
+REF_DIR = out('audio/refers')
+SEG_DIR = out('audio/segs')
+TASKS_FILE = out('audio/tts_tasks.parquet')
 
 def time_to_samples(time_str, sr):
     """Unified time conversion function"""
@@ -29,16 +32,16 @@ def extract_audio(audio_data, sr, start_time, end_time, out_file):
 
 def extract_refer_audio_main():
     demucs_main() #!!! in case demucs is not run
-    if os.path.exists(os.path.join(SEG_DIR, '1.wav')):
-        rprint(Panel("Audio segments already exist, skipping extraction", title="Info", border_style="blue"))
+    if os.path.exists(os.path.join(REF_DIR, '1.wav')):
+        rprint(Panel("Reference audio segments already exist, skipping extraction", title="Info", border_style="blue"))
         return
 
     # Create output directory
     os.makedirs(REF_DIR, exist_ok=True)
     
     # Read task file and audio data
-    df = pd.read_excel(TASKS_FILE)
-    data, sr = sf.read(VOCAL_AUDIO_FILE)
+    df = read_artifact(TASKS_FILE)
+    data, sr = load_pcm(VOCAL_PCM_FILE), SAMPLE_RATE
     
     with Progress(
         SpinnerColumn(),
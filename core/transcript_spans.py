@@ -0,0 +1,83 @@
+import os, sys, json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from typing import List, Optional, Tuple
+import numpy as np
+from rich import print as rprint
+
+# Every sentence / subtitle file in output/log gets a `<name>_spans.json` sidecar holding one
+# [start_char, end_char) pair per line. Offsets point into the transcript text that split_by_mark
+# builds by joining the words of cleaned_chunks.parquet (whose own sidecar holds the word spans),
+# so timestamps become a direct lookup.
+
+Span = Tuple[int, int]
+
+def spans_file(path: str) -> str:
+    return os.path.splitext(path)[0] + '_spans.json'
+
+def save_spans(path: str, spans: Optional[List[Span]]):
+    """Save the spans for the lines of `path`, None removes a stale sidecar"""
+    sidecar = spans_file(path)
+    if spans is None:
+        remove_spans(path)
+        return
+    with open(sidecar, 'w', encoding='utf-8') as f:
+        json.dump([[int(start), int(end)] for start, end in spans], f)
+
+def load_spans(path: str, expected_len: int = None) -> Optional[List[Span]]:
+    """Load the spans for the lines of `path`, None if missing or out of sync with the file"""
+    sidecar = spans_file(path)
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar, 'r', encoding='utf-8') as f:
+        spans = [tuple(span) for span in json.load(f)]
+    if expected_len is not None and len(spans) != expected_len:
+        rprint(f"[yellow]⚠️ {sidecar} has {len(spans)} spans for {expected_len} lines, ignoring it[/yellow]")
+        return None
+    return spans
+
+def remove_spans(path: str):
+    sidecar = spans_file(path)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+
+def strip_span(text: str, start: int, end: int, base: int = 0) -> Tuple[str, Span]:
+    """Strip text[start:end] and return it with its span shifted by `base`"""
+    part = text[start:end]
+    stripped = part.strip()
+    if not stripped:
+        return stripped, (base + start, base + start)
+    offset = start + len(part) - len(part.lstrip())
+    return stripped, (base + offset, base + offset + len(stripped))
+
+def locate_parts(text: str, base: int, parts: List[str]) -> Optional[List[Span]]:
+    """Locate consecutive substrings of `text` (which starts at `base`), None if a part is not a substring"""
+    spans = []
+    pos = 0
+    for part in parts:
+        part = part.strip()
+        found = text.find(part, pos)
+        if found == -1:
+            return None
+        spans.append((base + found, base + found + len(part)))
+        pos = found + len(part)
+    return spans
+
+def word_spans_from_texts(texts: List[str], joiner: str) -> List[Span]:
+    """Spans of each word inside joiner.join(texts)"""
+    spans = []
+    pos = 0
+    for text in texts:
+        spans.append((pos, pos + len(text)))
+        pos += len(text) + len(joiner)
+    return spans
+
+def spans_to_word_indices(line_spans: List[Span], word_spans: List[Span]) -> Tuple[np.ndarray, np.ndarray]:
+    """First and last word index overlapped by each line span"""
+    word_arr = np.asarray(word_spans, dtype=np.int64).reshape(-1, 2)
+    line_arr = np.asarray(line_spans, dtype=np.int64).reshape(-1, 2)
+    # first word ending after the line starts, last word starting before the line ends
+    first = np.searchsorted(word_arr[:, 1], line_arr[:, 0], side='right')
+    last = np.searchsorted(word_arr[:, 0], line_arr[:, 1], side='left') - 1
+    first = np.clip(first, 0, len(word_arr) - 1)
+    last = np.clip(np.maximum(last, first), 0, len(word_arr) - 1)
+    return first, last
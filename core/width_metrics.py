@@ -0,0 +1,73 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functools import lru_cache
+from typing import Iterable
+import numpy as np
+
+# ! You can modify your own weights here
+# Chinese and Japanese 1.75 characters, Korean 1.5 characters, Thai 1 character, full-width symbols 1.75 characters, other English-based and half-width symbols 1 character
+WEIGHT_RANGES = [
+    (0x4E00, 0x9FFF, 1.75),  # Chinese
+    (0x3040, 0x30FF, 1.75),  # Japanese
+    (0xAC00, 0xD7A3, 1.5),   # Korean
+    (0x1100, 0x11FF, 1.5),   # Korean Jamo
+    (0x0E00, 0x0E7F, 1.0),   # Thai
+    (0xFF01, 0xFF5E, 1.75),  # full-width symbols
+]
+DEFAULT_WEIGHT = 1.0
+# Every weighted range lives in the BMP, anything above it gets the default weight
+TABLE_SIZE = 0x10000
+
+def _build_weight_table() -> np.ndarray:
+    table = np.full(TABLE_SIZE + 1, DEFAULT_WEIGHT, dtype=np.float32)
+    for start, end, weight in WEIGHT_RANGES:
+        table[start:end + 1] = weight
+    return table
+
+WEIGHT_TABLE = _build_weight_table()
+
+def _codepoints(text: str) -> np.ndarray:
+    codes = np.frombuffer(text.encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+    # fold everything outside the table onto the trailing default slot
+    return np.minimum(codes, TABLE_SIZE)
+
+def char_weights(text: str) -> np.ndarray:
+    """Weight of every character of `text`"""
+    return WEIGHT_TABLE[_codepoints(str(text))]
+
+def prefix_len(text: str) -> np.ndarray:
+    """prefix_len(text)[i] is the weighted length of text[:i], handy to score many cut points at once"""
+    weights = char_weights(text).astype(np.float64)
+    return np.concatenate(([0.0], np.cumsum(weights)))
+
+@lru_cache(maxsize=65536)
+def _calc_len_cached(text: str) -> float:
+    return float(char_weights(text).sum(dtype=np.float64))
+
+def calc_len(text) -> float:
+    """Weighted display length of a subtitle line"""
+    return _calc_len_cached(str(text))  # force convert
+
+def calc_len_batch(texts: Iterable) -> np.ndarray:
+    """Weighted length of a whole column in one pass"""
+    texts = [str(text) for text in texts]
+    if not texts:
+        return np.zeros(0, dtype=np.float64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    weights = char_weights(''.join(texts)).astype(np.float64)
+    # reduceat needs valid offsets, so sum over a cumulative array instead to handle empty strings
+    cumsum = np.concatenate(([0.0], np.cumsum(weights)))
+    ends = np.cumsum(lengths)
+    return cumsum[ends] - cumsum[ends - lengths]
+
+if __name__ == "__main__":
+    import time
+    samples = ["Hello world, this is a subtitle line.", "这是一个测试字幕。", "가을 나뭇잎", "ทดสอบ", "ＡＢＣ！", ""] * 20000
+    start = time.time()
+    batch = calc_len_batch(samples)
+    print(f"calc_len_batch: {len(samples)} lines in {time.time() - start:.3f}s")
+    start = time.time()
+    single = [calc_len(text) for text in samples]
+    print(f"calc_len (cached): {len(samples)} lines in {time.time() - start:.3f}s")
+    assert np.allclose(batch, single)
+    print(batch[:6])
@@ -0,0 +1,21 @@
+import os
+
+# Every artifact of a job lives under its workspace root, `output/` unless the job got its own.
+# The root is fixed per process through an environment variable: module-level paths resolve once at
+# import, and the step workers a job spawns inherit it. The batch runner starts every job in a fresh
+# process pointed at its own workspace, so several videos can be processed side by side.
+
+WORKSPACE_ENV = "VIDEOLINGO_WORKSPACE"
+DEFAULT_ROOT = "output"
+
+def root() -> str:
+    return os.environ.get(WORKSPACE_ENV, DEFAULT_ROOT).replace("\\", "/").rstrip("/")
+
+def out(relative: str = "") -> str:
+    """Path of an artifact in the current workspace, out('log/terminology.json') -> output/log/terminology.json"""
+    return f"{root()}/{relative}" if relative else root()
+
+def set_workspace(path: str):
+    """Point this process and the processes it spawns at `path`, before any pipeline module is imported"""
+    os.makedirs(path, exist_ok=True)
+    os.environ[WORKSPACE_ENV] = path
@@ -2,6 +2,8 @@ import streamlit as st
 import os, sys
 from st_components.imports_and_utils import *
 from core.config_utils import load_key
+from core.workspace import out
+from core.pipeline_scheduler import run_graph
 
 # SET PATH
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,8 +12,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 st.set_page_config(page_title="VideoLingo", page_icon="docs/logo.svg")
 
-SUB_VIDEO = "output/output_sub.mp4"
-DUB_VIDEO = "output/output_dub.mp4"
+SUB_VIDEO = out("output_sub.mp4")
+DUB_VIDEO = out("output_dub.mp4")
 
 def text_processing_section():
     st.header(t("b. Translate and Generate Subtitles"))
@@ -44,20 +46,18 @@ def text_processing_section():
 
 def process_text():
     with st.spinner(t("Using Whisper for transcription...")):
-        step2_whisperX.transcribe()
+        run_graph(["transcribe"])
     with st.spinner(t("Splitting long sentences...")):  
-        step3_1_spacy_split.split_by_spacy()
-        step3_2_splitbymeaning.split_sentences_by_meaning()
+        # the summary only needs the NLP split, it runs alongside the LLM split
+        run_graph(["split_by_spacy", "split_by_meaning", "summarize"])
     with st.spinner(t("Summarizing and translating...")):
-        step4_1_summarize.get_summary()
         if load_key("pause_before_translate"):
             input(t("⚠️ PAUSE_BEFORE_TRANSLATE. Go to `output/log/terminology.json` to edit terminology. Then press ENTER to continue..."))
-        step4_2_translate_all.translate_all()
+        run_graph(["translate"])
     with st.spinner(t("Processing and aligning subtitles...")): 
-        step5_splitforsub.split_for_sub_main()
-        step6_generate_final_timeline.align_timestamp_main()
+        run_graph(["split_for_sub", "align_timestamp"])
     with st.spinner(t("Merging subtitles to video...")):
-        step7_merge_sub_to_vid.merge_subtitles_to_video()
+        run_graph(["merge_sub_to_vid"])
     
     st.success(t("Subtitle processing complete! 🎉"))
     st.balloons()
@@ -91,16 +91,16 @@ def audio_processing_section():
 
 def process_audio():
     with st.spinner(t("Generate audio tasks")): 
-        step8_1_gen_audio_task.gen_audio_task_main()
-        step8_2_gen_dub_chunks.gen_dub_chunks()
+        # vocal separation for the reference clips runs while the tasks are generated
+        run_graph(["separate_vocals", "gen_audio_task", "gen_dub_chunks"])
     with st.spinner(t("Extract refer audio")):
-        step9_extract_refer_audio.extract_refer_audio_main()
+        run_graph(["extract_refer_audio"])
     with st.spinner(t("Generate all audio")):
-        step10_gen_audio.gen_audio()
+        run_graph(["gen_audio"])
     with st.spinner(t("Merge full audio")):
-        step11_merge_full_audio.merge_full_audio()
+        run_graph(["merge_full_audio"])
     with st.spinner(t("Merge dubbing to the video")):
-        step12_merge_dub_to_vid.merge_video_audio()
+        run_graph(["merge_dub_to_vid"])
     
     st.success(t("Audio processing complete! 🎇"))
     st.balloons()
@@ -2,13 +2,14 @@ import streamlit as st
 import os, sys, shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
+from core.workspace import out
 from core.step1_ytdlp import download_video_ytdlp, find_video_files
 from time import sleep
 import re
 import subprocess
 from translations.translations import translate as t
 
-OUTPUT_DIR = "output"
+OUTPUT_DIR = out()
 
 def download_video_section():
     st.header(t("a. Download or Upload Video"))
@@ -29,6 +29,7 @@ from core import (
 from core.onekeycleanup import cleanup  
 from core.delete_retry_dubbing import delete_dubbing_files
 from core.ask_gpt import ask_gpt
+from core.workspace import out
 import streamlit as st
 import io, zipfile
 from st_components.download_video_section import download_video_section
@@ -37,7 +38,7 @@ from translations.translations import translate as t
 
 def download_subtitle_zip_button(text: str):
     zip_buffer = io.BytesIO()
-    output_dir = "output"
+    output_dir = out()
     
     with zipfile.ZipFile(zip_buffer, "w") as zip_file:
         for file_name in os.listdir(output_dir):
@@ -74,7 +74,11 @@ def page_setting():
                 update_key("target_language", target_language)
                 st.rerun()
 
-        demucs = st.toggle(t("Vocal separation enhance"), value=load_key("demucs"), help=t("Recommended for videos with loud background noise, but will increase processing time"))
+        demucs_tiers = ["none", "fast", "htdemucs"]
+        current_tier = load_key("demucs")
+        if isinstance(current_tier, bool):
+            current_tier = "htdemucs" if current_tier else "none"
+        demucs = st.selectbox(t("Vocal separation enhance"), options=demucs_tiers, index=demucs_tiers.index(current_tier), help=t("Recommended for videos with loud background noise, but will increase processing time"))
         if demucs != load_key("demucs"):
             update_key("demucs", demucs)
             st.rerun()